@@ -0,0 +1,18 @@
+"""
+Micro-benchmarks for the cryptographic primitives behind Thanos' user-visible latency:
+Argon2id key derivation, bcrypt, single-shot and batched AES-GCM, and the segmented
+stream format used for backups and photos.
+
+Usage:
+  python -m benchmarks                          # quick profile, JSON on stdout
+  python -m benchmarks --profile full -o out.json   # includes the 500 MiB backup cases
+  python -m benchmarks --save-baseline base.json
+  python -m benchmarks --baseline base.json --tolerance 0.25
+
+Each case runs in its own interpreter so that its peak RSS is measured in isolation.
+No baseline is committed: the numbers depend on the machine. To check a change, save a
+baseline from the reference commit, then run the change with --baseline on the same
+machine; the exit status is 1 when any case regresses past the tolerance. A baseline
+whose recorded environment (platform, machine, cpu_count) differs from the current one
+is still compared, but its regressions are only reported and do not fail the run.
+"""
@@ -0,0 +1,81 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import sys
+
+from .cases import PROFILES, cases_for
+from .runner import compare, environment, environment_mismatch, run_suite, run_worker
+
+
+def _log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Thanos crypto, KDF and search micro-benchmarks.")
+    parser.add_argument("--profile", choices=PROFILES, default="quick",
+                        help="quick (default) or full (adds the 128 MiB / 500 MiB payloads and KDF calibration)")
+    parser.add_argument("-k", "--filter", dest="name_filter", help="only run cases whose name contains this string")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against; exit status 1 on regression "
+                                           "when it was recorded on a matching machine")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown / memory growth over the baseline, as a fraction (default 0.25)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also store this run as a baseline")
+    parser.add_argument("--list", action="store_true", help="list the cases of the selected profile and exit")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args.worker)
+
+    cases = cases_for(args.profile, args.name_filter)
+    if args.list:
+        for case in cases:
+            print(case["name"])
+        return 0
+    if not cases:
+        _log("No benchmark matches the selection.")
+        return 2
+
+    baseline, mismatch = None, []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("profile") != args.profile:
+            _log(f"Baseline {args.baseline} is a {baseline.get('profile')} run: only the cases it shares are compared.")
+        mismatch = environment_mismatch(environment(), baseline.get("environment", {}))
+        if mismatch:
+            _log(f"Baseline {args.baseline} was recorded on another machine ({', '.join(mismatch)} differ): "
+                 "regressions are reported but do not fail the run.")
+
+    report = run_suite(cases, args.profile, log=_log)
+    if baseline is not None:
+        report["regressions"] = compare(report, baseline, args.tolerance)
+        report["tolerance"] = args.tolerance
+        report["environment_mismatch"] = mismatch
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({key: report[key] for key in ("profile", "environment", "results")}, f, indent=2)
+            f.write("\n")
+
+    if baseline is not None:
+        for regression in report["regressions"]:
+            _log(f"REGRESSION {regression['name']} {regression['metric']}: "
+                 f"{regression['baseline']:.3f} -> {regression['current']:.3f} (+{regression['change']:.0%})")
+        if not report["regressions"]:
+            _log(f"No regression beyond {args.tolerance:.0%} of the baseline.")
+        elif not mismatch:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
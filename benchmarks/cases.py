@@ -0,0 +1,256 @@
+# benchmarks/cases.py
+"""
+Benchmark case registry. A case's setup builds its inputs outside the timed region
+and returns (operation, payload bytes per operation, cleanup callable or None).
+"""
+import os
+import random
+import string
+import tempfile
+
+from thanos_app.core import crypto
+from thanos_app.core.search_index import AccountSearchIndex, url_host
+
+KIB = 1024
+MIB = 1024 * KIB
+
+PROFILES = ("quick", "full")
+QUICK_AND_FULL = ("quick", "full")
+FULL_ONLY = ("full",)
+
+CASES = {}
+
+
+def _register(name: str, group: str, setup, iterations: int, params: dict, profiles: tuple = QUICK_AND_FULL):
+    CASES[name] = {
+        "name": name,
+        "group": group,
+        "setup": setup,
+        "iterations": iterations,
+        "params": params,
+        "profiles": profiles,
+    }
+
+
+def cases_for(profile: str, name_filter: str | None = None) -> list[dict]:
+    return [case for case in CASES.values()
+            if profile in case["profiles"] and (not name_filter or name_filter in case["name"])]
+
+
+class _PatternReader:
+    """Readable file-like object producing `size` bytes without holding them in memory."""
+    def __init__(self, size: int):
+        self._remaining = size
+        self._block = os.urandom(MIB)
+
+    def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            n = self._remaining
+        n = min(n, self._remaining)
+        self._remaining -= n
+        if n <= len(self._block):
+            return self._block[:n]
+        return (self._block * (n // len(self._block) + 1))[:n]
+
+
+class _NullWriter:
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+# --- Key derivation ---
+
+# Parallelism is fixed rather than taken from the host (as calibrate_kdf and the legacy
+# parameters do), so that each case derives with the same parameters on every machine.
+KDF_PARAM_SETS = {
+    "minimum": {"algorithm": "argon2id", "time_cost": crypto.ARGON2_MIN_TIME_COST,
+                "memory_cost": crypto.ARGON2_MIN_MEMORY_COST, "parallelism": 1},
+    "calibrated-cap": {"algorithm": "argon2id", "time_cost": crypto.ARGON2_MIN_TIME_COST,
+                       "memory_cost": 262144, "parallelism": crypto.ARGON2_MAX_PARALLELISM},
+    "legacy": dict(crypto.legacy_kdf_params(), parallelism=crypto.ARGON2_MAX_PARALLELISM),
+}
+
+
+def _setup_derive_key(params: dict):
+    def setup():
+        salt = os.urandom(crypto.ARGON2_SALT_BYTES)
+        return (lambda: crypto.derive_key("correct horse battery staple", salt, params)), 0, None
+    return setup
+
+
+for _label, _params in KDF_PARAM_SETS.items():
+    _register(f"kdf.derive_key[{_label}]", "kdf", _setup_derive_key(_params), 5, dict(_params))
+
+
+def _setup_calibrate():
+    return (lambda: crypto.calibrate_kdf(1.0, 262144)), 0, None
+
+
+_register("kdf.calibrate_kdf[1s]", "kdf", _setup_calibrate, 3,
+          {"target_seconds": 1.0, "max_memory_kib": 262144}, FULL_ONLY)
+
+
+# --- bcrypt (recovery key hash, format 1 vaults) ---
+
+def _setup_hash_password():
+    return (lambda: crypto.hash_password("correct horse battery staple")), 0, None
+
+
+def _setup_verify_password():
+    hashed = crypto.hash_password("correct horse battery staple")
+    return (lambda: crypto.verify_password("correct horse battery staple", hashed)), 0, None
+
+
+_register("bcrypt.hash_password", "bcrypt", _setup_hash_password, 5, {})
+_register("bcrypt.verify_password", "bcrypt", _setup_verify_password, 5, {})
+
+
+# --- Single-shot AES-GCM ---
+
+def _setup_encrypt_data(size: int):
+    def setup():
+        key, data = crypto.generate_data_key(), os.urandom(size)
+        return (lambda: crypto.encrypt_data(key, data)), size, None
+    return setup
+
+
+def _setup_decrypt_data(size: int):
+    def setup():
+        key = crypto.generate_data_key()
+        blob = crypto.encrypt_data(key, os.urandom(size))
+        return (lambda: crypto.decrypt_data(key, blob, decode_to_str=False)), size, None
+    return setup
+
+
+for _size, _iterations in ((32, 2000), (KIB, 2000), (64 * KIB, 500)):
+    _register(f"aead.encrypt_data[{_size}B]", "aead", _setup_encrypt_data(_size), _iterations, {"payload_bytes": _size})
+    _register(f"aead.decrypt_data[{_size}B]", "aead", _setup_decrypt_data(_size), _iterations, {"payload_bytes": _size})
+
+
+def _setup_encrypt_binary(size: int):
+    def setup():
+        key, data = crypto.generate_data_key(), os.urandom(size)
+        return (lambda: crypto.encrypt_binary(key, data)), size, None
+    return setup
+
+
+def _setup_decrypt_binary(size: int):
+    def setup():
+        key = crypto.generate_data_key()
+        blob = crypto.encrypt_binary(key, os.urandom(size))
+        return (lambda: crypto.decrypt_binary(key, blob)), size, None
+    return setup
+
+
+for _size, _iterations, _profiles in ((MIB, 50, QUICK_AND_FULL), (16 * MIB, 10, QUICK_AND_FULL), (128 * MIB, 3, FULL_ONLY)):
+    _label = f"{_size // MIB}MiB"
+    _register(f"aead.encrypt_binary[{_label}]", "aead", _setup_encrypt_binary(_size), _iterations,
+              {"payload_bytes": _size}, _profiles)
+    _register(f"aead.decrypt_binary[{_label}]", "aead", _setup_decrypt_binary(_size), _iterations,
+              {"payload_bytes": _size}, _profiles)
+
+
+# --- Batched AES-GCM (account and log rows) ---
+
+def _setup_encrypt_many(count: int, size: int):
+    def setup():
+        cipher = crypto.CipherContext(crypto.generate_data_key())
+        items = [os.urandom(size) for _ in range(count)]
+        return (lambda: cipher.encrypt_many(items)), count * size, None
+    return setup
+
+
+def _setup_decrypt_many(count: int, size: int):
+    def setup():
+        cipher = crypto.CipherContext(crypto.generate_data_key())
+        blobs = [blob for blob, _ in cipher.encrypt_many(os.urandom(size) for _ in range(count))]
+        return (lambda: cipher.decrypt_many(blobs, decode_to_str=False)), count * size, None
+    return setup
+
+
+for _count, _iterations in ((100, 200), (10000, 20)):
+    _params = {"items": _count, "item_bytes": 64}
+    _register(f"aead.encrypt_many[{_count}x64B]", "aead-batch", _setup_encrypt_many(_count, 64), _iterations, _params)
+    _register(f"aead.decrypt_many[{_count}x64B]", "aead-batch", _setup_decrypt_many(_count, 64), _iterations, _params)
+
+
+# --- Segmented stream (backups, security photos) ---
+
+def _setup_encrypt_stream(size: int):
+    def setup():
+        key = crypto.generate_data_key()
+        return (lambda: crypto.encrypt_stream(key, _PatternReader(size), _NullWriter())), size, None
+    return setup
+
+
+def _setup_decrypt_stream(size: int):
+    def setup():
+        key = crypto.generate_data_key()
+        fd, path = tempfile.mkstemp(prefix="thanos-bench-", suffix=".enc")
+        with os.fdopen(fd, "wb") as f:
+            crypto.encrypt_stream(key, _PatternReader(size), f)
+
+        def run():
+            with open(path, "rb") as src:
+                crypto.decrypt_stream(key, src, _NullWriter())
+        return run, size, lambda: os.remove(path)
+    return setup
+
+
+for _size, _iterations, _profiles in ((8 * MIB, 10, QUICK_AND_FULL), (64 * MIB, 5, QUICK_AND_FULL), (500 * MIB, 3, FULL_ONLY)):
+    _label = f"{_size // MIB}MiB"
+    _register(f"stream.encrypt_stream[{_label}]", "stream", _setup_encrypt_stream(_size), _iterations,
+              {"payload_bytes": _size, "chunk_bytes": crypto.STREAM_CHUNK_SIZE}, _profiles)
+    _register(f"stream.decrypt_stream[{_label}]", "stream", _setup_decrypt_stream(_size), _iterations,
+              {"payload_bytes": _size, "chunk_bytes": crypto.STREAM_CHUNK_SIZE}, _profiles)
+
+
+# --- Fuzzy account search (in-memory trigram index) ---
+
+def _synthetic_accounts(count: int) -> list[dict]:
+    """Deterministic account metadata: two-word names, webmail usernames, one host and two tags each."""
+    rng = random.Random(count)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(20000)]
+    tags = ["pro", "perso", "code", "banque", "mail", "jeux", "admin", "cloud"]
+    return [{"id": account_id, "name": f"{rng.choice(words).capitalize()} {rng.choice(words)}",
+             "username": f"{rng.choice(words)}@{rng.choice(['gmail', 'proton', 'outlook'])}.com",
+             "url": f"https://www.{rng.choice(words)}.{rng.choice(['com', 'fr', 'io', 'org'])}/login",
+             "tags": ", ".join(rng.sample(tags, 2)), "category": rng.choice(["Travail", "Sensible", "Autre"])}
+            for account_id in range(1, count + 1)]
+
+
+def _setup_trigram_build(count: int):
+    def setup():
+        accounts = _synthetic_accounts(count)
+        return (lambda: AccountSearchIndex().add_many(accounts)), 0, None
+    return setup
+
+
+def _setup_trigram_query(count: int, make_query):
+    """`make_query` derives the query from a known account (typo in its name, part of its host)."""
+    def setup():
+        accounts = _synthetic_accounts(count)
+        index = AccountSearchIndex()
+        index.add_many(accounts)
+        text = make_query(accounts[count // 2])
+        return (lambda: index.search(text)), 0, None
+    return setup
+
+
+# Target: sub-millisecond queries at 100k accounts. Measured p50: typo about 0.4 ms,
+# partial-host about 0.9 ms, but its p95 is above 1 ms, so that case only just meets it.
+# Not met for queries whose trigrams sit in a large share of the accounts, such as a
+# short host fragment ending in ".org" (2 to 4 ms): the ranking is exact, so every
+# candidate that could still tie the k-th result on similarity is checked one by one.
+# Peak RSS includes the 100k synthetic accounts (about 60 MiB); the index itself
+# takes about 55 MiB.
+TRIGRAM_QUERIES = {
+    "typo": lambda account: account["name"][1] + account["name"][0] + account["name"][2:],
+    "partial-host": lambda account: url_host(account["url"])[2:9],
+}
+
+_register("search.trigram_build[10k]", "search", _setup_trigram_build(10_000), 5, {"accounts": 10_000})
+_register("search.trigram_build[100k]", "search", _setup_trigram_build(100_000), 3, {"accounts": 100_000}, FULL_ONLY)
+for _label, _make_query in TRIGRAM_QUERIES.items():
+    _register(f"search.trigram_query[{_label},100k]", "search", _setup_trigram_query(100_000, _make_query), 200,
+              {"accounts": 100_000, "query": _label})
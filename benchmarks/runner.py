@@ -0,0 +1,131 @@
+# benchmarks/runner.py
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from .cases import CASES
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics compared against the baseline; higher is worse for all of them.
+COMPARED_METRICS = ("p50_ms", "p95_ms", "peak_rss_kib")
+# Timings from a baseline only mean something on the machine that recorded it.
+ENVIRONMENT_KEYS = ("platform", "machine", "cpu_count")
+
+
+def _percentile(sorted_samples: list[float], percent: float) -> float:
+    """Nearest-rank percentile."""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def _max_rss_kib() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # bytes on macOS, KiB on Linux
+
+
+def measure(case: dict) -> dict:
+    """Runs one case in the current process (one warm-up, then `iterations` timed calls)."""
+    operation, payload_bytes, cleanup = case["setup"]()
+    try:
+        setup_rss = _max_rss_kib()
+        operation()
+        samples = []
+        for _ in range(case["iterations"]):
+            start = time.perf_counter()
+            operation()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if cleanup:
+            cleanup()
+
+    samples.sort()
+    p50 = _percentile(samples, 50)
+    mean = sum(samples) / len(samples)
+    return {
+        "name": case["name"],
+        "group": case["group"],
+        "params": case["params"],
+        "iterations": len(samples),
+        "min_ms": samples[0] * 1000,
+        "p50_ms": p50 * 1000,
+        "p95_ms": _percentile(samples, 95) * 1000,
+        "mean_ms": mean * 1000,
+        "ops_per_s": 1 / mean if mean else None,
+        "throughput_mib_s": payload_bytes / p50 / (1024 * 1024) if payload_bytes and p50 else None,
+        "setup_rss_kib": setup_rss,
+        "peak_rss_kib": _max_rss_kib(),
+    }
+
+
+def run_isolated(name: str) -> dict:
+    """Runs one case in a fresh interpreter so that ru_maxrss reflects that case alone."""
+    proc = subprocess.run([sys.executable, "-m", "benchmarks", "--worker", name],
+                          cwd=ROOT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark '{name}' failed:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout)
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run_suite(cases: list[dict], profile: str, log=None) -> dict:
+    results = []
+    for case in cases:
+        if log:
+            log(f"{case['name']} ...")
+        result = run_isolated(case["name"])
+        results.append(result)
+        if log:
+            log(f"  p50 {result['p50_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms, peak RSS {result['peak_rss_kib'] // 1024} MiB")
+    return {"profile": profile, "environment": environment(), "results": results}
+
+
+def environment_mismatch(current: dict, recorded: dict) -> list[str]:
+    """Returns the ENVIRONMENT_KEYS on which the baseline machine differs from this one."""
+    return [key for key in ENVIRONMENT_KEYS if current.get(key) != recorded.get(key)]
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Returns the regressions: metrics more than `tolerance` (a fraction) above the baseline.
+    Cases absent from the baseline are not compared.
+    """
+    baseline_results = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        reference = baseline_results.get(result["name"])
+        if not reference:
+            continue
+        for metric in COMPARED_METRICS:
+            previous, current = reference.get(metric), result.get(metric)
+            if previous and current is not None and current > previous * (1 + tolerance):
+                regressions.append({
+                    "name": result["name"],
+                    "metric": metric,
+                    "baseline": previous,
+                    "current": current,
+                    "change": current / previous - 1,
+                })
+    return regressions
+
+
+def run_worker(name: str) -> int:
+    if name not in CASES:
+        print(f"Unknown benchmark: {name}", file=sys.stderr)
+        return 2
+    json.dump(measure(CASES[name]), sys.stdout)
+    return 0
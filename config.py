@@ -10,6 +10,17 @@ SETTINGS_FILE = os.path.join(APP_DATA_DIR, "settings.json")
 MAX_INCORRECT_ATTEMPTS_BEFORE_SECURITY_EVENTS = 5
 LOGIN_BLOCK_DELAY_SECONDS = 5
 
+# --- Dérivation de clé (Argon2id) ---
+# Paramètres calibrés à la création du coffre puis stockés dans vault_config
+KDF_TARGET_UNLOCK_SECONDS = 1.0
+KDF_MAX_MEMORY_KIB = 262144  # 256 MiB
+
+# --- Agent de déverrouillage (optionnel, comme ssh-agent) ---
+# Garde la clé du coffre en mémoire verrouillée tant qu'elle sert, puis l'oublie après ce délai d'inactivité
+UNLOCK_AGENT_ENABLED = False
+UNLOCK_AGENT_TTL_SECONDS = 900
+UNLOCK_AGENT_SOCKET = os.path.join(APP_DATA_DIR, "agent.sock")
+
 # --- Capture Photo ---
 SECURITY_PHOTO_ENABLED = True
 SECURITY_PHOTO_DIR = os.path.join(APP_DATA_DIR, "security_photos")
@@ -23,6 +34,10 @@ SMTP_PORT = 587
 SMTP_USERNAME = os.getenv("THANOS_SMTP_USERNAME", "apikey")
 SMTP_PASSWORD = os.getenv("THANOS_SMTP_PASSWORD", "")
 
+# --- Débogage ---
+# Vérifie à l'ouverture que chaque requête de l'application est servie par un index (EXPLAIN QUERY PLAN)
+DEBUG_QUERY_PLANS = os.getenv("THANOS_DEBUG_QUERY_PLANS") == "1"
+
 # --- Apparence ---
 THEME = 'dark'
 
@@ -51,6 +66,16 @@ def load_settings():
                     globals()['SECURITY_PHOTO_ENABLED'] = bool(data.get("security_photo_enabled", SECURITY_PHOTO_ENABLED))
                 except Exception:
                     pass
+                try:
+                    globals()['KDF_TARGET_UNLOCK_SECONDS'] = float(data.get("kdf_target_unlock_seconds", KDF_TARGET_UNLOCK_SECONDS))
+                    globals()['KDF_MAX_MEMORY_KIB'] = int(data.get("kdf_max_memory_kib", KDF_MAX_MEMORY_KIB))
+                except Exception:
+                    pass
+                try:
+                    globals()['UNLOCK_AGENT_ENABLED'] = bool(data.get("unlock_agent_enabled", UNLOCK_AGENT_ENABLED))
+                    globals()['UNLOCK_AGENT_TTL_SECONDS'] = int(data.get("unlock_agent_ttl_seconds", UNLOCK_AGENT_TTL_SECONDS))
+                except Exception:
+                    pass
                 try:
                     globals()['EMAIL_ALERTS_ENABLED'] = bool(data.get("email_alerts_enabled", EMAIL_ALERTS_ENABLED))
                 except Exception:
@@ -0,0 +1,98 @@
+# tests/test_account_filter_proxy.py
+import pytest
+
+pytest.importorskip("PySide6")
+
+from thanos_app.gui.account_filter_proxy import AccountFilterProxy, normalized_search_terms, refines
+from thanos_app.gui.account_table_model import AccountTableModel
+
+ACCOUNTS = [
+    {"id": 1, "name": "GitHub", "username": "dev", "url": "https://github.com", "tags": "code"},
+    {"id": 2, "name": "GitLab", "username": "Équipe", "url": "https://gitlab.com", "tags": "code"},
+    {"id": 3, "name": "Gitea", "username": "", "url": "", "tags": "perso"},
+    {"id": 4, "name": "Banque", "username": "git", "url": "", "tags": ""},
+]
+
+
+@pytest.fixture
+def proxy():
+    model = AccountTableModel([dict(account, importance=1, category="Autre") for account in ACCOUNTS])
+    proxy = AccountFilterProxy()
+    proxy.setSourceModel(model)
+    proxy.set_search_terms(["git"])  # Résultats de la recherche plein texte pour « git »
+    return proxy
+
+
+def _shown(proxy: AccountFilterProxy) -> list:
+    source = proxy.sourceModel()
+    return sorted(source.account_at(proxy.mapToSource(proxy.index(row, 0)).row())["id"]
+                  for row in range(proxy.rowCount()))
+
+
+def _examined(proxy: AccountFilterProxy, monkeypatch) -> list:
+    """
+    IDs des lignes du modèle source lues par les prochains affinements pour choisir les comptes
+    acceptés (les lectures du filtrage Qt qui suit, une par ligne, ne sont pas comptées).
+    """
+    examined, filtering = [], []
+    source = proxy.sourceModel()
+    account_at, begin_filter_change, narrow_search = source.account_at, proxy.beginFilterChange, proxy.narrow_search
+
+    def spy(row):
+        if not filtering:
+            examined.append(account_at(row)["id"])
+        return account_at(row)
+
+    def narrow(terms):
+        filtering.clear()
+        narrow_search(terms)
+
+    monkeypatch.setattr(source, "account_at", spy)
+    monkeypatch.setattr(proxy, "beginFilterChange", lambda: filtering.append(True) or begin_filter_change())
+    monkeypatch.setattr(proxy, "narrow_search", narrow)
+    return examined
+
+
+def test_refines():
+    assert refines(["git"], ["gith"])
+    assert refines(["git"], ["gith", "dev"])
+    assert not refines(["gith"], ["git"])
+    assert not refines(["git", "dev"], ["gith"])
+    assert not refines([], ["git"])
+
+
+def test_narrowing_keeps_the_matching_rows(proxy):
+    assert _shown(proxy) == [1, 2, 3, 4]
+    proxy.narrow_search(["gitl"])
+    assert _shown(proxy) == [2]
+    proxy.narrow_search(normalized_search_terms("gitl equipe"))  # Diacritiques ignorés
+    assert _shown(proxy) == [2]
+    proxy.narrow_search(["gitla", "equipes"])
+    assert _shown(proxy) == []
+
+
+def test_only_accepted_rows_are_examined_again(proxy, monkeypatch):
+    examined = _examined(proxy, monkeypatch)
+    proxy.narrow_search(["gith"])
+    assert sorted(examined) == [1, 2, 3, 4]  # Premier affinement : toutes les lignes
+    examined.clear()
+    proxy.narrow_search(["githu"])
+    assert examined == [1]
+    assert _shown(proxy) == [1]
+
+
+def test_removed_account_is_ignored(proxy, monkeypatch):
+    proxy.narrow_search(["code"])
+    assert _shown(proxy) == [1, 2]
+    proxy.sourceModel().remove_account(2)
+    examined = _examined(proxy, monkeypatch)
+    proxy.narrow_search(["code", "gi"])
+    assert examined == [1]
+    assert _shown(proxy) == [1]
+
+
+def test_new_results_show_every_row(proxy):
+    proxy.narrow_search(["gith"])
+    proxy.set_search_terms(["ban"])
+    assert _shown(proxy) == [1, 2, 3, 4]
+    assert proxy.search_terms() == ["ban"]
@@ -0,0 +1,104 @@
+# tests/test_account_table_model.py
+import random
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from thanos_app.core.database import account_sort_key
+from thanos_app.gui.account_table_model import AccountTableModel, _increasing_subsequence
+
+
+def _is_increasing_subsequence(values: list, indices: set) -> bool:
+    picked = [values[i] for i in sorted(indices)]
+    return all(a < b for a, b in zip(picked, picked[1:]))
+
+
+def _longest_length(values: list) -> int:
+    """Longueur de référence, en O(n²)."""
+    best = [1] * len(values)
+    for i in range(len(values)):
+        for j in range(i):
+            if values[j] < values[i]:
+                best[i] = max(best[i], best[j] + 1)
+    return max(best, default=0)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_increasing_subsequence_is_longest(seed):
+    rng = random.Random(seed)
+    values = rng.sample(range(100), rng.randint(0, 40))
+    indices = _increasing_subsequence(values)
+    assert _is_increasing_subsequence(values, indices)
+    assert len(indices) == _longest_length(values)
+
+
+def _account(account_id: int, name: str | None = None, importance: int = 1) -> dict:
+    return {"id": account_id, "name": name or f"service{account_id:03}", "importance": importance,
+            "category": "Autre", "username": "", "tags": ""}
+
+
+class _Recorder:
+    """Signaux de structure émis par le modèle : (type, première ligne, dernière ligne)."""
+    def __init__(self, model: AccountTableModel):
+        self.events = []
+        model.rowsRemoved.connect(lambda parent, first, last: self.events.append(("removed", first, last)))
+        model.rowsInserted.connect(lambda parent, first, last: self.events.append(("inserted", first, last)))
+        model.dataChanged.connect(lambda top, bottom, roles: self.events.append(("changed", top.row(), bottom.row())))
+        model.modelReset.connect(lambda: self.events.append(("reset", 0, 0)))
+
+
+def _rows(model: AccountTableModel) -> list:
+    return [model.account_at(row) for row in range(model.rowCount())]
+
+
+def test_moving_one_row_removes_and_inserts_only_that_row():
+    rows = [_account(i) for i in range(10)]
+    model = AccountTableModel(list(rows))
+    recorder = _Recorder(model)
+    moved = rows[:2] + rows[3:8] + [rows[2]] + rows[8:]
+    model.refresh_data(moved)
+    assert _rows(model) == moved
+    assert recorder.events == [("removed", 2, 2), ("inserted", 7, 7)]
+
+
+def test_edited_rows_are_signalled_in_place():
+    rows = [_account(i) for i in range(6)]
+    model = AccountTableModel(list(rows))
+    recorder = _Recorder(model)
+    edited = list(rows)
+    edited[1] = dict(rows[1], username="dev")
+    edited[2] = dict(rows[2], username="dev")
+    edited[4] = dict(rows[4], tags="code")
+    model.refresh_data(edited)
+    assert _rows(model) == edited
+    assert recorder.events == [("changed", 1, 2), ("changed", 4, 4)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_diff_reaches_the_new_content(seed):
+    rng = random.Random(seed)
+    old = [_account(i, importance=rng.randint(1, 3)) for i in rng.sample(range(200), 60)]
+    new = [dict(account, username="edited") if rng.random() < 0.2 else account
+           for account in rng.sample(old, 40)]
+    new += [_account(i, importance=rng.randint(1, 3)) for i in range(200, 215)]
+    rng.shuffle(new)
+    model = AccountTableModel(list(old))
+    recorder = _Recorder(model)
+    model.refresh_data(new)
+    assert _rows(model) == new
+    assert ("reset", 0, 0) not in recorder.events
+    for account in new:
+        assert model.row_for_account(account["id"]) == new.index(account)
+
+
+def test_upsert_keeps_the_sorted_order():
+    rows = sorted((_account(i, importance=1 + i % 3) for i in range(20)), key=account_sort_key)
+    model = AccountTableModel()
+    model.set_source(iter(rows), fetch_size=100)
+    model.upsert_sorted(_account(5, name="aaa", importance=3))
+    model.upsert_sorted(_account(50, name="zzz", importance=1))
+    assert _rows(model) == sorted(_rows(model), key=account_sort_key)
+    assert model.row_for_account(5) == 0
+    assert model.row_for_account(50) == model.rowCount() - 1
+    assert model.remove_account(50) and model.row_for_account(50) is None
@@ -0,0 +1,62 @@
+# tests/test_crypto_batch.py
+import os
+
+import pytest
+
+from thanos_app.core import crypto
+
+KEY = bytes(range(32))
+
+
+@pytest.fixture(params=[1, 4])
+def workers(request, monkeypatch):
+    """Slice count of the parallel path: one slice, or several slices of uneven length."""
+    monkeypatch.setattr(crypto, "AEAD_MAX_WORKERS", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("size", [0, 1, crypto.AEAD_PARALLEL_THRESHOLD - 1, crypto.AEAD_PARALLEL_THRESHOLD,
+                                  crypto.AEAD_PARALLEL_THRESHOLD + 1, 1001])
+def test_round_trip_keeps_the_input_order(size, workers):
+    cipher = crypto.CipherContext(KEY)
+    plaintexts = [f"item {i}" for i in range(size)]
+    encrypted = cipher.encrypt_many(plaintexts)
+    assert all(error is None for _, error in encrypted)
+    decrypted = cipher.decrypt_many(ciphertext for ciphertext, _ in encrypted)
+    assert decrypted == [(plaintext, None) for plaintext in plaintexts]
+    if size:
+        # Same wire format as the single-item functions
+        assert crypto.decrypt_data(KEY, encrypted[-1][0]) == plaintexts[-1]
+
+
+@pytest.mark.parametrize("size", [10, 1000])
+def test_corrupt_items_fail_alone(size, workers):
+    cipher = crypto.CipherContext(KEY)
+    ciphertexts = [ciphertext for ciphertext, _ in cipher.encrypt_many(os.urandom(16) for _ in range(size))]
+    corrupt = {0, size // 2, size - 1}
+    for i in corrupt:
+        tampered = bytearray(ciphertexts[i])
+        tampered[-1] ^= 1
+        ciphertexts[i] = bytes(tampered)
+    ciphertexts[size // 3] = b"short"  # Shorter than a nonce
+    corrupt.add(size // 3)
+
+    results = cipher.decrypt_many(ciphertexts, decode_to_str=False)
+    assert len(results) == size
+    for i, (plaintext, error) in enumerate(results):
+        if i in corrupt:
+            assert plaintext is None and isinstance(error, ValueError), i
+        else:
+            assert error is None and len(plaintext) == 16, i
+
+
+def test_bad_input_type_is_reported_per_item():
+    results = crypto.encrypt_many(KEY, ["text", b"bytes", None])
+    assert [error is None for _, error in results] == [True, True, False]
+    assert crypto.decrypt_many(KEY, [results[0][0], results[1][0]]) == [("text", None), ("bytes", None)]
+
+
+def test_wrong_key_fails_every_item():
+    ciphertexts = [ciphertext for ciphertext, _ in crypto.encrypt_many(KEY, ["a"] * 300)]
+    results = crypto.decrypt_many(os.urandom(32), ciphertexts)
+    assert all(plaintext is None and isinstance(error, ValueError) for plaintext, error in results)
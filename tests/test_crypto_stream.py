@@ -0,0 +1,98 @@
+# tests/test_crypto_stream.py
+import io
+import os
+import struct
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from thanos_app.core import crypto
+
+KEY = bytes(range(32))
+CHUNK = 64
+RECORD = CHUNK + crypto.STREAM_TAG_BYTES
+
+
+def _encrypt(plaintext: bytes) -> bytes:
+    out = io.BytesIO()
+    crypto.encrypt_stream(KEY, io.BytesIO(plaintext), out, chunk_size=CHUNK)
+    return out.getvalue()
+
+
+def _decrypt(data: bytes) -> bytes:
+    out = io.BytesIO()
+    crypto.decrypt_stream(KEY, io.BytesIO(data), out)
+    return out.getvalue()
+
+
+def _split(data: bytes) -> tuple[bytes, list]:
+    body = data[crypto.STREAM_HEADER_BYTES:]
+    return data[:crypto.STREAM_HEADER_BYTES], [body[i:i + RECORD] for i in range(0, len(body), RECORD)]
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK - 1, CHUNK, CHUNK + 1, 5 * CHUNK])
+def test_round_trip(size):
+    plaintext = os.urandom(size)
+    assert _decrypt(_encrypt(plaintext)) == plaintext
+    assert crypto.decrypt_blob(KEY, _encrypt(plaintext)) == plaintext
+
+
+def test_truncation_at_a_chunk_boundary_is_detected():
+    header, chunks = _split(_encrypt(os.urandom(5 * CHUNK)))
+    with pytest.raises(ValueError):
+        _decrypt(header + b"".join(chunks[:3]))
+
+
+def test_truncation_inside_a_chunk_is_detected():
+    data = _encrypt(os.urandom(5 * CHUNK))
+    with pytest.raises(ValueError):
+        _decrypt(data[:-5])
+
+
+def test_empty_body_is_detected():
+    with pytest.raises(ValueError):
+        _decrypt(_encrypt(b"data")[:crypto.STREAM_HEADER_BYTES])
+
+
+def test_reordered_chunks_are_detected():
+    header, chunks = _split(_encrypt(os.urandom(5 * CHUNK)))
+    chunks[1], chunks[2] = chunks[2], chunks[1]
+    with pytest.raises(ValueError):
+        _decrypt(header + b"".join(chunks))
+
+
+def test_dropped_middle_chunk_is_detected():
+    header, chunks = _split(_encrypt(os.urandom(5 * CHUNK)))
+    with pytest.raises(ValueError):
+        _decrypt(header + b"".join(chunks[:2] + chunks[3:]))
+
+
+def test_altered_header_is_detected():
+    data = bytearray(_encrypt(os.urandom(3 * CHUNK)))
+    data[crypto.STREAM_HEADER_BYTES - 1] ^= 1  # Nonce prefix
+    with pytest.raises(ValueError):
+        _decrypt(bytes(data))
+
+
+@pytest.mark.parametrize("chunk_size", [0, crypto.STREAM_MAX_CHUNK_SIZE + 1, 2 ** 32 - 1])
+def test_out_of_range_chunk_size_is_rejected_before_reading(chunk_size):
+    header = crypto.STREAM_MAGIC + bytes([crypto.STREAM_FORMAT_VERSION]) + struct.pack(">I", chunk_size) + bytes(7)
+    src = io.BytesIO(header + b"x" * 100)
+    with pytest.raises(ValueError, match="segment"):
+        crypto.decrypt_stream(KEY, src, io.BytesIO())
+    assert src.tell() == crypto.STREAM_HEADER_BYTES
+    with pytest.raises(ValueError):
+        crypto.encrypt_stream(KEY, io.BytesIO(b"data"), io.BytesIO(), chunk_size=chunk_size)
+
+
+def test_blob_with_a_tampered_stream_is_not_read_as_a_single_message():
+    header, chunks = _split(_encrypt(os.urandom(3 * CHUNK)))
+    with pytest.raises(ValueError, match="segment 1"):
+        crypto.decrypt_blob(KEY, header + chunks[0] + chunks[2])
+
+
+def test_single_message_whose_nonce_starts_with_the_magic():
+    nonce = crypto.STREAM_MAGIC + b"\x00" * 8  # Version 0: not a stream header
+    data = nonce + AESGCM(KEY).encrypt(nonce, b"photo", None)
+    assert crypto.decrypt_blob(KEY, data) == b"photo"
+    assert crypto.decrypt_blob(KEY, crypto.encrypt_binary(KEY, b"photo")) == b"photo"
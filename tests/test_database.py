@@ -0,0 +1,340 @@
+# tests/test_database.py
+import sqlite3
+
+import pytest
+
+from thanos_app.core import database
+from thanos_app.core.database import FTS5_AVAILABLE, SCHEMA_VERSION, DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "vault.db"))
+    manager.create_tables()
+    yield manager
+    manager.close()
+
+
+def _legacy_db(path: str):
+    """Base d'avant le registre des migrations (user_version = 0) : comptes sans category, importance ni tags."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE vault_config (key TEXT PRIMARY KEY, value BLOB NOT NULL);
+        CREATE TABLE accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, username TEXT,
+            encrypted_password BLOB NOT NULL, url TEXT, notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE security_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            encrypted_log_data BLOB NOT NULL);
+        INSERT INTO accounts (name, username, encrypted_password, url, notes)
+            VALUES ('GitHub', 'dev', x'00', 'https://github.com', 'forge');
+        INSERT INTO security_logs (encrypted_log_data) VALUES (x'00');
+    """)
+    conn.commit()
+    conn.close()
+
+
+def _schema(db: DatabaseManager) -> list:
+    return db.conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY name").fetchall()
+
+
+# --- Migrations (PRAGMA user_version) ---
+
+def test_legacy_database_is_migrated_to_the_current_schema(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    with DatabaseManager(path) as db:
+        report = db.migrate_database()
+        assert [step["version"] for step in report] == list(range(1, SCHEMA_VERSION + 1))
+        assert db.schema_version() == SCHEMA_VERSION
+
+        account = db.get_all_accounts()[0]
+        assert (account["category"], account["importance"], account["tags"]) == ("Autre", 1, "")
+        columns = {row["name"] for row in db.conn.execute("PRAGMA table_info(security_logs)")}
+        assert {"event_type_hmac", "status_hmac"} <= columns
+        if FTS5_AVAILABLE:
+            # L'index plein texte est reconstruit pour les comptes existants
+            assert [row["name"] for row in db.search_accounts("forg")] == ["GitHub"]
+
+        # Base à jour : aucune étape
+        assert db.migrate_database() == []
+
+
+def test_migrated_schema_matches_a_new_database(tmp_path, db):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    with DatabaseManager(path) as legacy:
+        legacy.create_logs_table()
+        legacy.migrate_database()
+        db.create_logs_table()
+        assert {row[:2] for row in _schema(legacy)} == {row[:2] for row in _schema(db)}
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    with DatabaseManager(path) as db:
+        before = _schema(db)
+        report = db.migrate_database(dry_run=True)
+        assert [step["version"] for step in report] == list(range(1, SCHEMA_VERSION + 1))
+        assert all(step["seconds"] >= 0 for step in report)
+        assert db.schema_version() == 0
+        assert _schema(db) == before
+        # La vraie migration reste possible ensuite
+        assert len(db.migrate_database()) == SCHEMA_VERSION
+
+
+def test_interrupted_migration_resumes_at_the_failed_step(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    migrations = database.MIGRATIONS
+
+    def fail(db, cursor):
+        cursor.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("coupure")
+
+    monkeypatch.setattr(database, "MIGRATIONS", migrations[:2] + ((3, "échec", fail),) + migrations[3:])
+    with DatabaseManager(path) as db:
+        with pytest.raises(RuntimeError):
+            db.migrate_database()
+        # Les étapes validées restent acquises, l'étape en échec est annulée en entier
+        assert db.schema_version() == 2
+        assert not db.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone()
+
+        monkeypatch.setattr(database, "MIGRATIONS", migrations)
+        assert [step["version"] for step in db.migrate_database()] == list(range(3, SCHEMA_VERSION + 1))
+        assert db.schema_version() == SCHEMA_VERSION
+
+
+def test_command_line_dry_run(tmp_path, capsys):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    assert database.main([path, "--dry-run"]) == 0
+    assert "simulation" in capsys.readouterr().out
+    with DatabaseManager(path) as db:
+        assert db.schema_version() == 0
+
+
+# --- Transactions ---
+
+def _names(db: DatabaseManager) -> list:
+    return [row["name"] for row in db.conn.execute("SELECT name FROM accounts ORDER BY id")]
+
+
+def _insert(cursor, name: str):
+    cursor.execute("INSERT INTO accounts (name, encrypted_password) VALUES (?, x'00')", (name,))
+
+
+def test_failed_inner_block_rolls_back_only_its_savepoint(db):
+    with db.transaction() as cursor:
+        _insert(cursor, "outer")
+        with pytest.raises(RuntimeError):
+            with db.transaction() as inner:
+                _insert(inner, "inner")
+                raise RuntimeError()
+        _insert(cursor, "after")
+    assert _names(db) == ["outer", "after"]
+
+
+def test_failed_outer_block_rolls_back_committed_savepoints(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as cursor:
+            _insert(cursor, "outer")
+            with db.transaction() as inner:
+                _insert(inner, "inner")
+            raise RuntimeError()
+    assert _names(db) == []
+    assert not db.conn.in_transaction
+
+
+def test_savepoints_nest_on_several_levels(db):
+    with db.transaction() as cursor:
+        _insert(cursor, "1")
+        with db.transaction():
+            _insert(cursor, "2")
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    _insert(cursor, "3")
+                    raise RuntimeError()
+            with db.transaction():
+                _insert(cursor, "4")
+    assert _names(db) == ["1", "2", "4"]
+
+
+def test_writes_in_a_transaction_are_committed_once(db):
+    with db.transaction():
+        db.add_account("GitHub", "dev", b"\x00", "", "", "Autre", 1, "code")
+        db.write_config({"key": b"value"})
+        assert db.conn.in_transaction
+    assert not db.conn.in_transaction
+    assert _names(db) == ["GitHub"]
+    assert db.read_config()["key"] == b"value"
+
+
+def test_config_read_in_a_transaction_sees_its_own_writes(db):
+    db.write_config({"key": b"old"})
+    assert db.read_config()["key"] == b"old"  # Mise en cache
+    with db.transaction():
+        db.write_config({"key": b"new"})
+        assert db.read_config()["key"] == b"new"
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.write_config({"key": b"discarded"}, delete=["other"])
+                assert db.read_config()["key"] == b"discarded"
+                raise RuntimeError()
+        assert db.read_config()["key"] == b"new"
+    assert db.read_config()["key"] == b"new"
+
+
+def test_rolled_back_config_write_is_not_cached(db):
+    db.write_config({"key": b"old"})
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.write_config({"key": b"new"})
+            db.read_config()
+            raise RuntimeError()
+    assert db.read_config()["key"] == b"old"
+
+
+# --- Pagination par clé ---
+
+def _add_accounts(db: DatabaseManager, accounts: list) -> list:
+    return db.add_accounts([{"encrypted_password": b"\x00", **account} for account in accounts])
+
+
+@pytest.fixture
+def listed(db):
+    """Noms répétés sur plusieurs niveaux d'importance : chaque page coupe au milieu de doublons."""
+    _add_accounts(db, [{"name": f"service{i % 4}", "importance": 1 + i % 3,
+                        "category": "Travail" if i % 2 else "Autre"} for i in range(23)])
+    return db
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 8, 23, 24, 100])
+def test_pages_cover_the_list_exactly_once(listed, page_size):
+    expected = sorted(listed.get_all_accounts(), key=database.account_sort_key)
+    pages = list(listed.iter_account_summaries(page_size=page_size))
+    assert [row["id"] for row in pages] == [row["id"] for row in expected]
+
+
+@pytest.mark.parametrize("page_size", [1, 4, 11, 12])
+def test_category_pages_cover_the_category(listed, page_size):
+    expected = [row["id"] for row in sorted(listed.get_all_accounts("Travail"), key=database.account_sort_key)]
+    assert [row["id"] for row in listed.iter_account_summaries("Travail", page_size=page_size)] == expected
+
+
+def test_page_after_the_last_row_is_empty(listed):
+    last = sorted(listed.get_all_accounts(), key=database.account_sort_key)[-1]
+    assert listed.get_account_summaries(after=(last["importance"], last["name"], last["id"])) == []
+
+
+def test_empty_list(db):
+    assert db.get_account_summaries() == []
+    assert list(db.iter_account_summaries(page_size=1)) == []
+
+
+# --- Index plein texte ---
+
+def _found(db: DatabaseManager, text: str) -> list:
+    return sorted(row["name"] for row in db.search_accounts(text))
+
+
+def test_search_index_follows_inserts_updates_and_deletes(db):
+    github, gitlab = _add_accounts(db, [{"name": "GitHub", "url": "https://github.com", "notes": "forge publique"},
+                                        {"name": "GitLab", "username": "équipe"}])
+    assert _found(db, "git") == ["GitHub", "GitLab"]
+    assert _found(db, "forg pub") == ["GitHub"]
+    assert _found(db, "equipe") == ["GitLab"]  # Diacritiques ignorés
+
+    db.update_account(github, "Codeberg", "", b"\x00", "https://codeberg.org", "", "Autre", 1, "")
+    assert _found(db, "git") == ["GitLab"]
+    assert _found(db, "codeb") == ["Codeberg"]
+    assert _found(db, "forge") == []
+
+    db.delete_account(gitlab)
+    assert _found(db, "git") == []
+    assert _found(db, "equipe") == []
+
+
+def test_search_by_category(db):
+    _add_accounts(db, [{"name": "Banque pro", "category": "Travail"}, {"name": "Banque perso"}])
+    assert [row["name"] for row in db.search_accounts("banque", "Travail")] == ["Banque pro"]
+
+
+@pytest.mark.skipif(not FTS5_AVAILABLE, reason="index FTS5 indisponible")
+def test_password_change_leaves_the_index_alone(db):
+    (account_id,) = _add_accounts(db, [{"name": "GitHub"}])
+    changes = db.conn.total_changes
+    db.conn.execute("UPDATE accounts SET encrypted_password = x'01' WHERE id = ?", (account_id,))
+    assert db.conn.total_changes - changes == 1  # Aucune ligne écrite par le déclencheur
+    assert _found(db, "github") == ["GitHub"]
+
+
+# --- Tags normalisés ---
+
+def _facets(db: DatabaseManager) -> dict:
+    return {facet["name"]: facet["count"] for facet in db.get_tag_facets()}
+
+
+def test_tag_counts_follow_account_writes(db):
+    first, second = _add_accounts(db, [{"name": "A", "tags": "code, Perso"}, {"name": "B", "tags": "code"}])
+    assert _facets(db) == {"code": 2, "Perso": 1}
+    assert db.get_account_ids_with_tags(["CODE"]) == {first, second}
+    assert db.get_account_ids_with_tags(["code", "perso"]) == {first}
+
+    db.update_account(first, "A", "", b"\x00", "", "", "Autre", 1, "code, banque")
+    assert _facets(db) == {"code": 2, "banque": 1}  # Un tag sans compte disparaît
+
+    db.delete_account(second)
+    assert _facets(db) == {"code": 1, "banque": 1}
+    db.delete_accounts([first])
+    assert _facets(db) == {}
+
+
+def test_duplicate_tags_count_once(db):
+    _add_accounts(db, [{"name": "A", "tags": "Code, code ,CODE,, perso"}])
+    assert _facets(db) == {"Code": 1, "perso": 1}
+    assert [tag["name"] for tag in db.find_tags("co")] == ["Code"]
+
+
+def test_migration_normalizes_existing_tags(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    with DatabaseManager(path) as db:
+        db.migrate_database()
+        assert _facets(db) == {}
+        db.conn.execute("UPDATE accounts SET tags = 'code, perso'")
+        db.conn.execute("PRAGMA user_version = 3")  # Étape des tags normalisés rejouée
+        assert [step["version"] for step in db.migrate_database()] == list(range(4, SCHEMA_VERSION + 1))
+        assert _facets(db) == {"code": 1, "perso": 1}
+
+
+# --- Plans de requête ---
+
+def _fill(db: DatabaseManager, accounts: int = 500, logs: int = 2000):
+    _add_accounts(db, [{"name": f"service{i}", "importance": 1 + i % 3, "category": ("Autre", "Travail", "Sensible")[i % 3],
+                        "tags": f"tag{i % 7}, tag{i % 11}"} for i in range(accounts)])
+    db.add_log_entries((b"\x00", f"2024-01-{1 + i % 28:02} {i % 24:02}:00:00", bytes([i % 5]), bytes([i % 2]))
+                       for i in range(logs))
+
+
+def test_query_plans_use_indexes_on_a_new_database(db):
+    db.create_logs_table()
+    db.check_query_plans()
+
+
+def test_query_plans_use_indexes_after_analyze(db):
+    db.create_logs_table()
+    _fill(db)
+    db.conn.execute("ANALYZE")
+    analyzed = {row[0] for row in db.conn.execute("SELECT tbl FROM sqlite_stat1")}
+    assert {"accounts", "security_logs", "account_tags"} <= analyzed
+    db.check_query_plans()
+
+
+def test_missing_index_is_reported(db):
+    db.create_logs_table()
+    db.conn.execute("DROP INDEX idx_security_logs_event_type")
+    with pytest.raises(AssertionError, match="sans index"):
+        db.check_query_plans()
@@ -0,0 +1,15 @@
+# tests/test_kdf.py
+import pytest
+
+from thanos_app.core import crypto
+
+
+def test_calibration_stays_within_the_memory_budget():
+    params = crypto.calibrate_kdf(0.05, crypto.ARGON2_MIN_MEMORY_COST)
+    assert params["memory_cost"] == crypto.ARGON2_MIN_MEMORY_COST
+    assert crypto.ARGON2_MIN_TIME_COST <= params["time_cost"] <= crypto.ARGON2_MAX_TIME_COST
+
+
+def test_budget_below_the_floor_is_refused():
+    with pytest.raises(ValueError, match="Budget mémoire"):
+        crypto.calibrate_kdf(0.05, crypto.ARGON2_MIN_MEMORY_COST - 1)
@@ -0,0 +1,112 @@
+# tests/test_search_index.py
+import random
+import string
+
+from thanos_app.core.search_index import AccountSearchIndex, account_words, normalized_words, trigrams, url_host
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+
+def _index_with_frequent_name(count: int, every: int) -> AccountSearchIndex:
+    """Un compte sur `every` est un GitHub : ses trigrammes sont parmi les plus fréquents de l'index."""
+    rng = random.Random(count)
+    index = AccountSearchIndex()
+    for account_id in range(count):
+        if account_id % every == 0:
+            index.add(account_id, {"name": "GitHub", "username": _word(rng), "url": "https://github.com",
+                                   "tags": "code", "category": "Travail"})
+        else:
+            index.add(account_id, {"name": f"{_word(rng)} {_word(rng)}", "username": f"{_word(rng)}@gmail.com",
+                                   "url": f"https://{_word(rng)}.com", "tags": "pro", "category": "Autre"})
+    return index
+
+
+def test_typo_finds_small_index():
+    index = AccountSearchIndex()
+    index.add(1, {"name": "GitHub", "url": "https://www.github.com/login", "tags": "code"})
+    index.add(2, {"name": "Crédit Agricole", "url": "credit-agricole.fr", "category": "Sensible"})
+    assert index.search("githbu")[0][0] == 1
+    assert index.search("hub.co")[0][0] == 1
+    assert index.search("agricol", "Sensible")[0][0] == 2
+    assert index.search("agricol", "Travail") == []
+
+
+def test_typo_on_frequent_name_in_large_index():
+    index = _index_with_frequent_name(20000, 10)
+    for query in ("githbu", "gihub", "hub.co"):
+        results = index.search(query)
+        assert results, query
+        assert all(account_id % 10 == 0 for account_id, _ in results[:10]), query
+
+
+def test_similarity_counts_every_query_trigram():
+    index = _index_with_frequent_name(5000, 10)
+    account_id, similarity = index.search("github")[0]
+    assert account_id % 10 == 0 and similarity == 1.0
+
+
+def test_updates_match_a_fresh_build():
+    rng = random.Random(3)
+    live, accounts = AccountSearchIndex(), {}
+    for step in range(500):
+        if accounts and rng.random() < 0.3:
+            account_id = rng.choice(sorted(accounts))
+            live.remove(account_id)
+            del accounts[account_id]
+        else:
+            account_id = rng.randint(1, 200)
+            accounts[account_id] = {"name": _word(rng), "url": f"{_word(rng)}.org", "category": "Autre"}
+            live.add(account_id, accounts[account_id])
+    fresh = AccountSearchIndex()
+    fresh.add_many({**account, "id": account_id} for account_id, account in accounts.items())
+    for query in ("abc", "xyz", "org", _word(rng)):
+        assert live.search(query) == fresh.search(query)
+
+
+def _brute_force(accounts: dict, text: str, limit: int, min_similarity: float = 0.3, category: str | None = None) -> list:
+    query = trigrams(normalized_words(text))
+    scored = []
+    for account_id, account in accounts.items():
+        if category and account.get("category") != category:
+            continue
+        words = account_words(account)
+        shared = len(query & trigrams(words))
+        if shared and shared >= max(1, -(-min_similarity * len(query) // 1)):
+            scored.append((-shared, len(words), account_id))
+    return [(account_id, -shared / len(query)) for shared, _, account_id in sorted(scored)[:limit]]
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(11)
+    hosts = ["github.com", "gitlab.com", "google.com", "bank.fr", "mail.proton.me"]
+    accounts = {account_id: {"name": f"{_word(rng)} {rng.choice(['git', 'hub', 'mail', ''])}",
+                             "username": _word(rng), "url": f"https://{rng.choice(hosts)}"}
+                for account_id in range(3000)}
+    index = AccountSearchIndex()
+    index.add_many({**account, "id": account_id} for account_id, account in accounts.items())
+    for text in ("githbu", "hub.co", "gmail", "proton me", "bnk", accounts[42]["name"][:-1]):
+        for limit in (1, 5, 50):
+            assert index.search(text, limit=limit) == _brute_force(accounts, text, limit), (text, limit)
+
+
+def test_partial_hosts_match_brute_force():
+    """Fragments d'hôte : beaucoup de candidats à égalité, départagés par la longueur du texte."""
+    rng = random.Random(5)
+    accounts = {account_id: {"name": _word(rng), "username": f"{_word(rng)}@gmail.com",
+                             "url": f"https://{_word(rng)}.{rng.choice(['com', 'org', 'fr'])}",
+                             "category": rng.choice(["Travail", "Autre"])}
+                for account_id in range(4000)}
+    index = AccountSearchIndex()
+    index.add_many({**account, "id": account_id} for account_id, account in accounts.items())
+    for account_id in rng.sample(sorted(accounts), 15):
+        text = url_host(accounts[account_id]["url"])[2:9]
+        for limit, category in ((1, None), (10, None), (50, None), (50, "Travail")):
+            assert index.search(text, category, limit) == _brute_force(accounts, text, limit, category=category), text
+
+
+def test_url_host():
+    assert url_host("https://www.github.com/login") == "github.com"
+    assert url_host("credit-agricole.fr/x") == "credit-agricole.fr"
+    assert url_host("") == ""
@@ -0,0 +1,79 @@
+# tests/test_security_log_writer.py
+import os
+import sqlite3
+
+import pytest
+
+from thanos_app.core import security_manager
+from thanos_app.core.database import DatabaseManager
+from thanos_app.core.security_manager import SecurityLogWriter
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(security_manager, "LOG_WRITER_RETRY_DELAY", 0)
+    manager = DatabaseManager(str(tmp_path / "vault.db"))
+    manager.create_logs_table()
+    yield manager
+    manager.close()
+
+
+def _writer(db) -> SecurityLogWriter:
+    return SecurityLogWriter(db, os.urandom(32), os.urandom(32), flush_interval=10)  # Batches end on flush() or close()
+
+
+def _count(db) -> int:
+    return db.conn.execute("SELECT COUNT(*) FROM security_logs").fetchone()[0]
+
+
+def _fail_commits(db, monkeypatch, failures: int) -> list:
+    """The next `failures` commits raise as if another connection held the write lock."""
+    add_log_entries = db.add_log_entries
+    remaining = [failures]
+
+    def flaky(rows):
+        if remaining[0]:
+            remaining[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return add_log_entries(rows)
+    monkeypatch.setattr(db, "add_log_entries", flaky)
+    return remaining
+
+
+def test_transient_failure_is_retried(db, monkeypatch):
+    _fail_commits(db, monkeypatch, security_manager.LOG_WRITER_MAX_ATTEMPTS - 1)
+    writer = _writer(db)
+    for i in range(10):
+        writer.submit({"event_type": "TEST", "details": {"i": i}}, None)
+    assert writer.flush(5)
+    assert _count(db) == 10
+    assert writer.close()
+
+
+def test_failed_batch_is_held_and_reported(db, monkeypatch):
+    _fail_commits(db, monkeypatch, security_manager.LOG_WRITER_MAX_ATTEMPTS)
+    writer = _writer(db)
+    for i in range(5):
+        writer.submit({"event_type": "TEST", "details": {"i": i}}, None)
+    assert not writer.flush(5)
+    assert isinstance(writer.last_error, sqlite3.OperationalError)
+    assert _count(db) == 0
+    # The held batch goes out with the next one
+    writer.submit({"event_type": "TEST", "details": {"i": 5}}, None)
+    assert writer.flush(5)
+    assert _count(db) == 6
+    assert writer.close()
+
+
+def test_overflow_drops_oldest_and_close_reports_it(db, monkeypatch):
+    monkeypatch.setattr(security_manager, "LOG_WRITER_MAX_HELD", 3)
+    remaining = _fail_commits(db, monkeypatch, 1000)
+    writer = _writer(db)
+    for i in range(5):
+        writer.submit({"event_type": "TEST", "details": {"i": i}}, None)
+    assert not writer.close()
+    # After close, events are written synchronously, after the held ones
+    remaining[0] = 0
+    writer.submit({"event_type": "TEST", "details": {"i": 5}}, None)
+    assert _count(db) == 4
+    assert writer.flush()
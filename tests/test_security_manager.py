@@ -0,0 +1,193 @@
+# tests/test_security_manager.py
+import datetime
+import json
+import os
+
+import pytest
+
+import config
+from thanos_app.core import crypto, security_manager
+from thanos_app.core.database import DatabaseManager
+from thanos_app.core.security_manager import LOG_EVENT_UNREADABLE, SecurityManager
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SECURITY_PHOTO_DIR", str(tmp_path / "photos"))
+    manager = DatabaseManager(str(tmp_path / "vault.db"))
+    manager.create_tables()
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def security(db):
+    manager = SecurityManager(db, os.urandom(crypto.DATA_KEY_BYTES))
+    yield manager
+    manager.close()
+
+
+def _log_sample(security: SecurityManager):
+    security.log_events([("LOGIN_FAILED", {"status": "failure"}),
+                         ("LOGIN_FAILED", {"status": "failure"}),
+                         ("PHOTO", {"status": "success"}),
+                         ("PHOTO", {"status": "failure"}),
+                         ("EMAIL", {})])
+
+
+def test_counts_by_type_and_status(security):
+    _log_sample(security)
+    assert security.count_events(["LOGIN_FAILED"]) == 2
+    assert security.count_events(["LOGIN_FAILED", "PHOTO"]) == 4
+    assert security.count_events(["PHOTO"], status="success") == 1
+    assert security.count_events(["PHOTO", "EMAIL"], status="failure") == 1
+    assert security.count_events(["UNKNOWN"]) == 0
+    assert security.count_events([]) == 0
+
+
+def test_counts_by_period(security):
+    _log_sample(security)
+    now = datetime.datetime.now()
+    hour = datetime.timedelta(hours=1)
+    assert security.count_events(["LOGIN_FAILED"], since=now - hour) == 2
+    assert security.count_events(["LOGIN_FAILED"], since=now + hour) == 0
+    assert security.count_events(["LOGIN_FAILED"], until=now - hour) == 0
+    assert security.count_events(["LOGIN_FAILED"], since=now - hour, until=now + hour) == 2
+
+
+def test_tags_depend_on_the_vault_key(db, security):
+    _log_sample(security)
+    security.flush()
+    other = SecurityManager(db, os.urandom(crypto.DATA_KEY_BYTES))
+    assert other.count_events(["LOGIN_FAILED"]) == 0
+    other.close()
+
+
+def test_entries_written_before_the_index_are_indexed_once(db, security):
+    cipher = crypto.CipherContext(security.log_key)
+    for event_type, status in (("LOGIN_FAILED", "failure"), ("PHOTO", "success")):
+        db.add_log_entry(cipher.encrypt(json.dumps({"event_type": event_type, "details": {"status": status}})))
+    db.add_log_entry(crypto.encrypt_data(os.urandom(32), "{}"))  # Another vault's key
+    assert security.count_events(["LOGIN_FAILED", "PHOTO"]) == 0
+
+    assert security.index_logs(batch_size=2) == 3
+    assert security.count_events(["LOGIN_FAILED", "PHOTO"]) == 2
+    assert security.count_events(["PHOTO"], status="success") == 1
+    assert security.count_events([LOG_EVENT_UNREADABLE]) == 1
+    assert security.index_logs() == 0
+
+
+# --- Photos adressées par leur contenu ---
+
+@pytest.fixture
+def thumbnails(monkeypatch):
+    """Miniature factice : OpenCV n'est pas nécessaire pour tester le stockage."""
+    monkeypatch.setattr(security_manager, "_make_thumbnail", lambda data: (b"thumbnail", 640, 480))
+
+
+def _photo_dir() -> list:
+    return sorted(os.listdir(config.SECURITY_PHOTO_DIR))
+
+
+def test_same_capture_is_stored_once(security, thumbnails):
+    first = security.save_encrypted_photo(b"raw image")
+    assert security.save_encrypted_photo(b"raw image") == first
+    assert _photo_dir() == sorted([first, first.removesuffix(".enc") + security_manager.PHOTO_THUMBNAIL_SUFFIX])
+    assert security.save_encrypted_photo(b"other image") != first
+    assert len(_photo_dir()) == 4
+
+
+def test_address_depends_on_the_vault_key(db, security):
+    other = SecurityManager(db, os.urandom(crypto.DATA_KEY_BYTES))
+    assert other.save_encrypted_photo(b"raw image") != security.save_encrypted_photo(b"raw image")
+    other.close()
+
+
+def test_thumbnail_is_read_without_the_full_image(security, thumbnails):
+    captured_at = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    filename = security.save_encrypted_photo(b"raw image", captured_at)
+    os.remove(os.path.join(config.SECURITY_PHOTO_DIR, filename))
+    thumbnail, metadata = security.get_photo_thumbnail(filename)
+    assert thumbnail == b"thumbnail"
+    assert metadata == {"size": len(b"raw image"), "width": 640, "height": 480,
+                        "captured_at": "2026-01-02T03:04:05"}
+
+
+def test_thumbnails_use_the_stream_format(security, thumbnails):
+    filename = security.save_encrypted_photo(b"raw image")
+    path = os.path.join(config.SECURITY_PHOTO_DIR, filename.removesuffix(".enc") + security_manager.PHOTO_THUMBNAIL_SUFFIX)
+    with open(path, "rb") as f:
+        assert f.read().startswith(crypto.STREAM_MAGIC)
+    # Miniature d'avant le format segmenté : toujours lisible
+    with open(path, "wb") as f:
+        f.write(crypto.encrypt_binary(security.photo_key, b"\x00\x00\x00\x02{}old"))
+    assert security.get_photo_thumbnail(filename) == (b"old", {})
+
+
+# --- Lecture du journal par pages ---
+
+START = datetime.datetime(2024, 3, 1, 12, 0, 0)
+EVENT_TYPES = ("LOGIN_FAILED", "PHOTO", "EMAIL")
+
+
+def _write_journal(db, security: SecurityManager, count: int = 25) -> list:
+    """
+    `count` événements sur des secondes partagées deux à deux (le tri se départage alors par ID),
+    dans le désordre des horodatages. Retourne les (type, statut, instant) dans l'ordre d'écriture.
+    """
+    cipher = crypto.CipherContext(security.log_key)
+    events = [(EVENT_TYPES[i % 3], ("success", "failure")[i % 2], START + datetime.timedelta(seconds=(i * 7 % count) // 2))
+              for i in range(count)]
+    rows = []
+    for event_type, status, moment in events:
+        entry = {"timestamp": moment.isoformat(), "event_type": event_type, "details": {"status": status}}
+        type_hmac, status_hmac = security_manager._log_index_tags(security.log_index_key, entry)
+        rows.append((cipher.encrypt(json.dumps(entry)), security_manager._sql_timestamp(moment), type_hmac, status_hmac))
+    db.add_log_entries(rows)
+    return events
+
+
+def _newest_first(db) -> list:
+    return [row["id"] for row in db.conn.execute("SELECT id FROM security_logs ORDER BY timestamp DESC, id DESC")]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 12, 24, 25, 26, 100])
+def test_journal_pages_cover_it_once_newest_first(db, security, page_size):
+    _write_journal(db, security)
+    logs = list(security.iter_decrypted_logs(page_size=page_size))
+    assert [log["id"] for log in logs] == _newest_first(db)
+    assert all(log["event_type"] in EVENT_TYPES for log in logs)
+
+
+@pytest.mark.parametrize("page_size", [1, 4, 100])
+def test_journal_period_and_type_filters(db, security, page_size):
+    events = _write_journal(db, security)
+    since, until = START + datetime.timedelta(seconds=3), START + datetime.timedelta(seconds=9)
+    logs = list(security.iter_decrypted_logs(since, until, page_size=page_size, event_type="PHOTO"))
+    expected = sorted((moment, i) for i, (event_type, _, moment) in enumerate(events)
+                      if event_type == "PHOTO" and since <= moment < until)
+    assert logs and [datetime.datetime.fromisoformat(log["timestamp"]) for log in logs] == [m for m, _ in reversed(expected)]
+    assert len(logs) == security.count_events(["PHOTO"], since, until)
+
+
+def test_only_consumed_entries_are_decrypted(db, security, monkeypatch):
+    _write_journal(db, security)
+    decrypted = []
+    decrypt = security._decrypt_log_entry
+    monkeypatch.setattr(security, "_decrypt_log_entry", lambda log: decrypted.append(log["id"]) or decrypt(log))
+    logs = security.iter_decrypted_logs(page_size=4)
+    first = [next(logs)["id"] for _ in range(5)]
+    assert decrypted == first == _newest_first(db)[:5]
+
+
+def test_counts_match_the_decrypted_journal(db, security):
+    events = _write_journal(db, security, count=40)
+    since = START + datetime.timedelta(seconds=5)
+    for types in (["LOGIN_FAILED"], ["PHOTO", "EMAIL"], list(EVENT_TYPES)):
+        for status in (None, "success", "failure"):
+            expected = sum(1 for event_type, event_status, moment in events
+                           if event_type in types and (status is None or event_status == status) and moment >= since)
+            assert security.count_events(types, since, status=status) == expected, (types, status)
+            decrypted = [log for log in security.iter_decrypted_logs(since, page_size=7)
+                         if log["event_type"] in types and (status is None or log["details"]["status"] == status)]
+            assert len(decrypted) == expected
@@ -0,0 +1,123 @@
+# tests/test_unlock_agent.py
+import os
+import threading
+import time
+import types
+
+import pytest
+
+import config
+from thanos_app.core import unlock_agent
+from thanos_app.core.unlock_agent import AgentError, UnlockAgent
+
+pytestmark = pytest.mark.skipif(not unlock_agent.is_supported(), reason="sockets Unix et SO_PEERCRED requis")
+
+KEY = bytes(range(32))
+TTL = 60
+
+
+class _Clock:
+    """Horloge monotone de l'agent, avancée à la main."""
+    def __init__(self):
+        self.now = time.monotonic()
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(unlock_agent, "time", types.SimpleNamespace(monotonic=fake.monotonic, sleep=time.sleep))
+    return fake
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch, clock):
+    """Agent servi dans un thread du processus de test, sur une socket du dossier temporaire."""
+    path = str(tmp_path / "agent" / "agent.sock")
+    monkeypatch.setattr(config, "UNLOCK_AGENT_SOCKET", path)
+    server = UnlockAgent(path, TTL)
+    thread = threading.Thread(target=server.serve, name="unlock-agent", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + unlock_agent.AGENT_START_TIMEOUT_SECONDS
+    while not unlock_agent.is_running():
+        assert time.monotonic() < deadline, "agent injoignable"
+        time.sleep(0.01)
+    yield thread
+    unlock_agent.stop()
+    thread.join(unlock_agent.AGENT_TIMEOUT_SECONDS)
+    assert not thread.is_alive()
+    assert not os.path.exists(path)
+
+
+def _status() -> dict:
+    return unlock_agent._request({"command": "status"})
+
+
+def test_socket_is_private(agent):
+    assert os.stat(config.UNLOCK_AGENT_SOCKET).st_mode & 0o777 == 0o600
+    assert os.stat(os.path.dirname(config.UNLOCK_AGENT_SOCKET)).st_mode & 0o777 == 0o700
+
+
+def test_key_is_returned_only_for_its_identifier(agent):
+    assert unlock_agent.fetch_key("vault-a") is None
+    unlock_agent.store_key("vault-a", KEY)
+    assert unlock_agent.fetch_key("vault-a") == KEY
+    assert unlock_agent.fetch_key("vault-b") is None
+    assert _status()["keys"] == 1
+
+
+def test_key_is_forgotten_after_inactivity(agent, clock):
+    unlock_agent.store_key("vault-a", KEY, ttl=10)
+    clock.now += 9
+    assert unlock_agent.fetch_key("vault-a") == KEY  # Chaque lecture repousse l'échéance
+    clock.now += 9
+    assert unlock_agent.fetch_key("vault-a") == KEY
+    clock.now += 10
+    assert unlock_agent.fetch_key("vault-a") is None
+    assert _status()["keys"] == 0
+
+
+def test_lock_forgets_one_key_and_flush_all(agent):
+    unlock_agent.store_key("vault-a", KEY)
+    unlock_agent.store_key("vault-b", KEY[::-1])
+    unlock_agent.lock("vault-a")
+    assert unlock_agent.fetch_key("vault-a") is None
+    assert unlock_agent.fetch_key("vault-b") == KEY[::-1]
+    unlock_agent.flush()
+    assert unlock_agent.fetch_key("vault-b") is None
+    assert _status()["keys"] == 0
+
+
+def test_store_replaces_the_previous_key(agent):
+    unlock_agent.store_key("vault-a", KEY)
+    unlock_agent.store_key("vault-a", KEY[::-1])
+    assert unlock_agent.fetch_key("vault-a") == KEY[::-1]
+    assert _status()["keys"] == 1
+
+
+def test_agent_refuses_a_peer_of_another_user(agent, monkeypatch):
+    unlock_agent.store_key("vault-a", KEY)
+    uid = os.getuid()
+    with monkeypatch.context() as patch:
+        # Vu du serveur seulement, le client appartient à un autre utilisateur
+        patch.setattr(unlock_agent, "_peer_uid", lambda conn: uid + 1 if threading.current_thread() is agent else uid)
+        assert unlock_agent.fetch_key("vault-a") is None
+        # Refus envoyé sans lire la requête : le client voit le refus ou la connexion fermée
+        with pytest.raises((AgentError, OSError)):
+            unlock_agent.store_key("vault-b", KEY)
+    assert _status()["keys"] == 1
+
+
+def test_client_refuses_an_agent_of_another_user(agent, monkeypatch):
+    unlock_agent.store_key("vault-a", KEY)
+    uid = os.getuid()
+    with monkeypatch.context() as patch:
+        # Vu du client seulement, l'agent appartient à un autre utilisateur
+        patch.setattr(unlock_agent, "_peer_uid", lambda conn: uid if threading.current_thread() is agent else uid + 1)
+        with pytest.raises(AgentError, match="utilisateur"):
+            unlock_agent.store_key("vault-b", KEY)
+        assert unlock_agent.fetch_key("vault-a") is None
+        assert not unlock_agent.is_running()
+    assert _status()["keys"] == 1
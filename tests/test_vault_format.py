@@ -0,0 +1,333 @@
+# tests/test_vault_format.py
+import json
+import os
+import sqlite3
+import struct
+
+import pytest
+
+import config
+from thanos_app.core import crypto, device_binding
+from thanos_app.core.database import DatabaseManager
+from thanos_app.core.security_manager import SecurityManager
+from thanos_app.core.vault import (BACKUP_FORMAT_VERSION, BACKUP_MAGIC, VAULT_FORMAT_VERSION, KEY_CHECK_PLAINTEXT,
+                                   VaultHeader, VaultManager)
+
+PASSWORD = "Correct-Horse-9"
+# Paramètres Argon2id minimaux : les tests portent sur le format, pas sur le coût
+FAST_KDF = {"algorithm": "argon2id", "time_cost": 1, "memory_cost": 1024, "parallelism": 1}
+
+
+@pytest.fixture(autouse=True)
+def fast_kdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(crypto, "calibrate_kdf", lambda *args: dict(FAST_KDF))
+    monkeypatch.setattr(crypto, "ARGON2_TIME_COST", 1)
+    monkeypatch.setattr(crypto, "ARGON2_MEMORY_COST", 1024)
+    monkeypatch.setattr(crypto, "ARGON2_PARALLELISM", 1)
+    monkeypatch.setattr(config, "SECURITY_PHOTO_DIR", str(tmp_path / "photos"))
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return str(tmp_path / "vault.db")
+
+
+def _legacy_vault(db_path: str, format_version: int) -> bytes:
+    """
+    Coffre aux formats 1 à 3 (empreinte d'appareil dans le secret dérivé, paramètres KDF
+    historiques non stockés), avec un compte et une entrée de journal. Retourne la clé
+    qui chiffre les données : clé dérivée (formats 1 et 2) ou clé de données (format 3).
+    """
+    salt = os.urandom(crypto.ARGON2_SALT_BYTES)
+    fingerprint = device_binding.get_device_fingerprint()
+    legacy_key = crypto.derive_key(PASSWORD + fingerprint, salt)
+    values = {"kdf_salt": salt, "device_fingerprint": fingerprint,
+              "recovery_key_hash": crypto.hash_password("recovery")}
+    if format_version == 1:
+        values["master_password_hash"] = crypto.hash_password(PASSWORD)
+        data_key = legacy_key
+        accounts_key = logs_key = legacy_key
+    elif format_version == 2:
+        values["key_check"] = crypto.encrypt_data(legacy_key, KEY_CHECK_PLAINTEXT)
+        data_key = legacy_key
+        accounts_key = logs_key = legacy_key
+    else:
+        data_key = crypto.generate_data_key()
+        values["wrapped_data_key"] = crypto.encrypt_data(legacy_key, data_key)
+        values["format_version"] = 3
+        accounts_key = crypto.derive_subkey(data_key, crypto.SUBKEY_ACCOUNTS)
+        logs_key = crypto.derive_subkey(data_key, crypto.SUBKEY_LOGS)
+    with DatabaseManager(db_path) as db:
+        db.create_tables()
+        db.create_logs_table()
+        db.write_config(values)
+        db.add_account("GitHub", "dev", crypto.encrypt_data(accounts_key, "s3cret"), "", "", "Autre", 1, "")
+        db.add_log_entry(crypto.encrypt_data(logs_key, '{"event_type": "TEST"}'))
+    return data_key
+
+
+def _header(db_path: str) -> VaultHeader:
+    with DatabaseManager(db_path) as db:
+        return VaultHeader.load(db)
+
+
+def _ciphertexts(db_path: str) -> tuple[bytes, bytes]:
+    with DatabaseManager(db_path) as db:
+        return (db.conn.execute("SELECT encrypted_password FROM accounts").fetchone()[0],
+                db.conn.execute("SELECT encrypted_log_data FROM security_logs").fetchone()[0])
+
+
+def _ciphertexts_accounts(db_path: str) -> list:
+    with DatabaseManager(db_path) as db:
+        return [row[0] for row in db.conn.execute("SELECT encrypted_password FROM accounts ORDER BY id")]
+
+
+@pytest.mark.parametrize("format_version", [1, 2, 3])
+def test_legacy_vault_is_upgraded_to_the_current_format(db_path, format_version):
+    data_key = _legacy_vault(db_path, format_version)
+    before = _ciphertexts(db_path)
+
+    vault = VaultManager.open_vault(db_path, PASSWORD)
+    account_id = vault.get_all_accounts()[0]["id"]
+    assert vault.get_decrypted_password(account_id) == "s3cret"
+    log = vault.db.get_all_logs()[0]["encrypted_log_data"]
+    assert crypto.decrypt_data(crypto.derive_subkey(vault.key, crypto.SUBKEY_LOGS), log) == '{"event_type": "TEST"}'
+    vault.close()
+
+    header = _header(db_path)
+    assert header.format_version == VAULT_FORMAT_VERSION
+    assert header.wrapped_data_key and not header.master_password_hash and not header.key_check
+    assert header.kdf_params == crypto.legacy_kdf_params()
+    if format_version == 3:
+        # La clé de données existait déjà : seule son enveloppe change
+        assert vault.key == data_key
+        assert _ciphertexts(db_path) == before
+    else:
+        assert _ciphertexts(db_path) != before
+
+    # Le coffre mis à niveau se rouvre sans nouvelle réécriture
+    reopened = VaultManager.open_vault(db_path, PASSWORD)
+    assert reopened.key == vault.key
+    reopened.close()
+    assert _header(db_path).wrapped_data_key == header.wrapped_data_key
+
+
+@pytest.mark.parametrize("format_version", [1, 2, 3])
+def test_wrong_password_leaves_a_legacy_vault_untouched(db_path, format_version):
+    _legacy_vault(db_path, format_version)
+    before = _ciphertexts(db_path), _header(db_path).values
+    with pytest.raises(ValueError, match="incorrect"):
+        VaultManager.open_vault(db_path, "wrong password")
+    assert (_ciphertexts(db_path), _header(db_path).values) == before
+
+
+def test_created_vault_wraps_a_random_data_key(db_path):
+    VaultManager.create_vault(db_path, PASSWORD)
+    header = _header(db_path)
+    assert header.format_version == VAULT_FORMAT_VERSION
+    assert header.kdf_params == FAST_KDF
+    vault = VaultManager.open_vault(db_path, PASSWORD)
+    assert len(vault.key) == crypto.DATA_KEY_BYTES
+    assert crypto.key_identifier(vault.key) == _header(db_path).key_id
+    vault.close()
+
+
+def test_password_change_rewraps_without_touching_the_data(db_path):
+    VaultManager.create_vault(db_path, PASSWORD)
+    vault = VaultManager.open_vault(db_path, PASSWORD)
+    account_id = vault.add_account("GitHub", "s3cret-password")
+    key, before = vault.key, _ciphertexts_accounts(db_path)
+    old_wrap = _header(db_path).wrapped_data_key
+    VaultManager.change_master_password(vault.db, PASSWORD, "New-Passw0rd!")
+    vault.close()
+
+    assert _header(db_path).wrapped_data_key != old_wrap
+    assert _ciphertexts_accounts(db_path) == before
+    with pytest.raises(ValueError):
+        VaultManager.open_vault(db_path, PASSWORD)
+    reopened = VaultManager.open_vault(db_path, "New-Passw0rd!")
+    assert reopened.key == key
+    assert reopened.get_decrypted_password(account_id) == "s3cret-password"
+    reopened.close()
+
+
+def test_password_change_checks_the_current_password(db_path):
+    VaultManager.create_vault(db_path, PASSWORD)
+    with DatabaseManager(db_path) as db:
+        before = VaultHeader.load(db).values
+        with pytest.raises(ValueError, match="actuel"):
+            VaultManager.change_master_password(db, "wrong password", "New-Passw0rd!")
+        assert VaultHeader.load(db).values == before
+
+
+def test_retune_rewraps_under_new_parameters(db_path, monkeypatch):
+    VaultManager.create_vault(db_path, PASSWORD)
+    vault = VaultManager.open_vault(db_path, PASSWORD)
+    account_id = vault.add_account("GitHub", "s3cret-password")
+    before, old = _ciphertexts_accounts(db_path), _header(db_path)
+    retuned = dict(FAST_KDF, time_cost=2)
+    monkeypatch.setattr(crypto, "calibrate_kdf", lambda *args: dict(retuned))
+
+    with pytest.raises(ValueError):
+        VaultManager.retune_kdf(vault, "wrong password")
+    VaultManager.retune_kdf(vault, PASSWORD)
+    vault.close()
+
+    header = _header(db_path)
+    assert header.kdf_params == retuned
+    assert header.kdf_salt != old.kdf_salt and header.wrapped_data_key != old.wrapped_data_key
+    assert _ciphertexts_accounts(db_path) == before
+    reopened = VaultManager.open_vault(db_path, PASSWORD)
+    assert reopened.get_decrypted_password(account_id) == "s3cret-password"
+    reopened.close()
+
+
+def _forged_backup(path, params: bytes, salt: bytes = bytes(crypto.ARGON2_SALT_BYTES)):
+    with open(path, "wb") as f:
+        f.write(BACKUP_MAGIC + bytes([BACKUP_FORMAT_VERSION]) + struct.pack(">H", len(params)) + params + salt)
+        f.write(os.urandom(64))
+
+
+@pytest.mark.parametrize("params", [
+    json.dumps(dict(FAST_KDF, memory_cost=2 ** 40)).encode(),
+    json.dumps(dict(FAST_KDF, time_cost=10 ** 6)).encode(),
+    json.dumps(dict(FAST_KDF, parallelism=0)).encode(),
+    json.dumps({"algorithm": "argon2id"}).encode(),
+    json.dumps(dict(FAST_KDF, time_cost="1")).encode(),
+    json.dumps([1, 2, 3]).encode(),
+    b"{not json",
+    b"\xff\xfe",
+])
+def test_forged_backup_parameters_are_rejected_before_deriving(tmp_path, db_path, monkeypatch, params):
+    backup = tmp_path / "forged.thnsbak"
+    _forged_backup(backup, params)
+
+    def derive_key(*args):
+        raise AssertionError("dérivation sur des paramètres non vérifiés")
+
+    monkeypatch.setattr(crypto, "derive_key", derive_key)
+    with pytest.raises(ValueError, match="Sauvegarde corrompue"):
+        VaultManager.restore_vault(str(backup), db_path, PASSWORD, "recovery")
+    assert not os.path.exists(db_path)
+
+
+def test_truncated_backup_header_is_rejected(tmp_path, db_path):
+    backup = tmp_path / "truncated.thnsbak"
+    _forged_backup(backup, json.dumps(FAST_KDF).encode(), salt=b"")
+    with open(backup, "r+b") as f:
+        f.truncate(len(BACKUP_MAGIC) + 3 + len(json.dumps(FAST_KDF)) + 4)
+    with pytest.raises(ValueError, match="Sauvegarde corrompue"):
+        VaultManager.restore_vault(str(backup), db_path, PASSWORD, "recovery")
+
+
+def test_backup_round_trip(tmp_path, db_path):
+    recovery_key = VaultManager.create_vault(db_path, PASSWORD)
+    vault = VaultManager.open_vault(db_path, PASSWORD)
+    account_id = vault.add_account("GitHub", "s3cret-password")
+    vault.close()
+    backup = str(tmp_path / "vault.thnsbak")
+    VaultManager.backup_vault(db_path, backup, PASSWORD, recovery_key)
+
+    restored = str(tmp_path / "restored.db")
+    VaultManager.restore_vault(backup, restored, PASSWORD, recovery_key)
+    vault = VaultManager.open_vault(restored, PASSWORD)
+    assert vault.get_decrypted_password(account_id) == "s3cret-password"
+    vault.close()
+
+
+# --- En-tête invalide : refusé avant toute dérivation ---
+
+@pytest.fixture
+def no_derivation(monkeypatch):
+    def derive_key(*args):
+        raise AssertionError("dérivation sur un en-tête non vérifié")
+
+    monkeypatch.setattr(crypto, "derive_key", derive_key)
+
+
+def _assert_not_a_vault(db_path: str):
+    db = DatabaseManager(db_path)  # Connexion ouverte par VaultHeader.load, comme dans open_vault
+    with pytest.raises(FileNotFoundError):
+        VaultHeader.load(db)
+    db.close()
+    with pytest.raises(FileNotFoundError):
+        VaultManager.open_vault(db_path, PASSWORD)
+
+
+def test_non_sqlite_file_is_not_a_vault(db_path, no_derivation):
+    with open(db_path, "wb") as f:
+        f.write(os.urandom(4096))
+    _assert_not_a_vault(db_path)
+
+
+def test_foreign_database_is_not_a_vault(db_path, no_derivation):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, text TEXT)")
+    conn.commit()
+    conn.close()
+    _assert_not_a_vault(db_path)
+
+
+@pytest.mark.parametrize("kdf_params", [dict(FAST_KDF, memory_cost=2 ** 40), dict(FAST_KDF, parallelism=0),
+                                        dict(FAST_KDF, algorithm="scrypt"), {"time_cost": 1}])
+def test_out_of_bounds_kdf_parameters_are_refused(db_path, monkeypatch, kdf_params):
+    VaultManager.create_vault(db_path, PASSWORD)
+    with DatabaseManager(db_path) as db:
+        db.write_config({"kdf_params": json.dumps(kdf_params)})
+    monkeypatch.setattr(crypto, "derive_key", lambda *args: pytest.fail("dérivation sur un en-tête non vérifié"))
+    _assert_not_a_vault(db_path)
+
+
+# --- Changement d'appareil ---
+
+@pytest.fixture
+def moved_vault(db_path, monkeypatch):
+    """Coffre créé sur un appareil, avec un compte, une entrée de journal et une photo, puis ouvert sur un autre."""
+    recovery_key = VaultManager.create_vault(db_path, PASSWORD)
+    vault = VaultManager.open_vault(db_path, PASSWORD)
+    account_id = vault.add_account("GitHub", "s3cret-password")
+    security = SecurityManager(vault.db, vault.key)
+    security.log_event("LOGIN_FAILED", {"status": "failure"})
+    photo = security.save_encrypted_photo(b"raw image")
+    security.close()
+    vault.close()
+    monkeypatch.setattr(device_binding, "get_device_fingerprint", lambda: "another-device")
+    return recovery_key, account_id, photo
+
+
+def _photo_files() -> dict:
+    return {name: open(os.path.join(config.SECURITY_PHOTO_DIR, name), "rb").read()
+            for name in os.listdir(config.SECURITY_PHOTO_DIR)}
+
+
+def test_new_device_needs_the_recovery_key(db_path, moved_vault):
+    with pytest.raises(ValueError, match="DEVICE_MISMATCH"):
+        VaultManager.open_vault(db_path, PASSWORD)
+
+
+def test_device_change_rewraps_without_touching_the_data(db_path, moved_vault):
+    recovery_key, account_id, photo = moved_vault
+    before, old = (_ciphertexts(db_path), _photo_files()), _header(db_path)
+
+    vault = VaultManager.open_vault(db_path, PASSWORD, recovery_key)
+    assert vault.get_decrypted_password(account_id) == "s3cret-password"
+    security = SecurityManager(vault.db, vault.key)
+    assert [log["event_type"] for log in security.get_decrypted_logs()] == ["LOGIN_FAILED"]
+    assert security.get_decrypted_photo(photo) == b"raw image"
+    security.close()
+    vault.close()
+
+    header = _header(db_path)
+    assert header.device_fingerprint == "another-device"
+    assert header.wrapped_data_key != old.wrapped_data_key
+    assert header.kdf_salt == old.kdf_salt and header.key_id == old.key_id
+    assert (_ciphertexts(db_path), _photo_files()) == before
+    # Sur le nouvel appareil, le mot de passe suffit désormais
+    VaultManager.open_vault(db_path, PASSWORD).close()
+
+
+def test_wrong_recovery_key_leaves_the_header_unchanged(db_path, moved_vault):
+    before = _header(db_path).values
+    with pytest.raises(ValueError, match="récupération"):
+        VaultManager.open_vault(db_path, PASSWORD, "wrong recovery key")
+    assert _header(db_path).values == before
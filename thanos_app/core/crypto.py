@@ -1,6 +1,16 @@
 # thanos_app/core/crypto.py
 import os
+import io
+import hmac
+import hashlib
+import time
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.backends import default_backend
 import bcrypt
 import argon2
@@ -14,21 +24,71 @@ ARGON2_PARALLELISM = os.cpu_count() or 2 # Use detected CPU cores, fallback to 2
 ARGON2_HASH_LEN = 32 # For a 256-bit key (AES-256)
 ARGON2_SALT_BYTES = 16 # Recommended salt length
 
-def derive_key(password: str, salt: bytes) -> bytes:
+# Calibration bounds. Parallelism is capped so that stored parameters stay
+# usable on smaller machines (the lane count is part of the derived key).
+ARGON2_MIN_TIME_COST = 2
+ARGON2_MAX_TIME_COST = 16
+ARGON2_MIN_MEMORY_COST = 65536  # 64 MiB
+ARGON2_MAX_PARALLELISM = 4
+
+def legacy_kdf_params() -> dict:
+    """
+    Parameters used by vaults created before per-vault KDF parameters existed.
+    Parallelism follows the current host, which is only correct on the machine
+    the vault was created on.
+    """
+    return {
+        "algorithm": "argon2id",
+        "time_cost": ARGON2_TIME_COST,
+        "memory_cost": ARGON2_MEMORY_COST,
+        "parallelism": ARGON2_PARALLELISM,
+    }
+
+def derive_key(password: str, salt: bytes, params: dict | None = None) -> bytes:
     """
     Derives a 256-bit key from the master password using Argon2id.
     This is the modern, recommended standard for password-based key derivation.
+    `params` are the per-vault parameters (see calibrate_kdf); legacy defaults otherwise.
     """
+    params = params or legacy_kdf_params()
     return argon2.low_level.hash_secret_raw(
         secret=password.encode('utf-8'),
         salt=salt,
-        time_cost=ARGON2_TIME_COST,
-        memory_cost=ARGON2_MEMORY_COST,
-        parallelism=ARGON2_PARALLELISM,
+        time_cost=params["time_cost"],
+        memory_cost=params["memory_cost"],
+        parallelism=params["parallelism"],
         hash_len=ARGON2_HASH_LEN,
         type=Argon2Type.ID
     )
 
+def calibrate_kdf(target_seconds: float, max_memory_kib: int) -> dict:
+    """
+    Benchmarks Argon2id on this host and returns parameters that keep one
+    derivation close to `target_seconds` without exceeding `max_memory_kib`.
+    Memory is preferred over passes: the budget is used in full and only
+    reduced if a single pass already exceeds the target. A budget below
+    ARGON2_MIN_MEMORY_COST is refused rather than silently exceeded.
+    """
+    if max_memory_kib < ARGON2_MIN_MEMORY_COST:
+        raise ValueError(f"Budget mémoire Argon2id insuffisant : {max_memory_kib} KiB "
+                         f"(minimum {ARGON2_MIN_MEMORY_COST} KiB).")
+    parallelism = max(1, min(ARGON2_MAX_PARALLELISM, os.cpu_count() or 2))
+    memory_cost = max_memory_kib
+    salt = os.urandom(ARGON2_SALT_BYTES)
+
+    while True:
+        params = {"algorithm": "argon2id", "time_cost": 1, "memory_cost": memory_cost, "parallelism": parallelism}
+        start = time.perf_counter()
+        derive_key("calibration", salt, params)
+        per_pass = time.perf_counter() - start
+        if per_pass * ARGON2_MIN_TIME_COST <= target_seconds or memory_cost <= ARGON2_MIN_MEMORY_COST:
+            break
+        memory_cost = max(ARGON2_MIN_MEMORY_COST, memory_cost // 2)
+
+    time_cost = int(target_seconds / per_pass) if per_pass > 0 else ARGON2_MAX_TIME_COST
+    params["time_cost"] = max(ARGON2_MIN_TIME_COST, min(ARGON2_MAX_TIME_COST, time_cost))
+    return params
+
 def encrypt_data(key: bytes, plaintext: str) -> bytes:
     data_to_encrypt = plaintext.encode('utf-8') if isinstance(plaintext, str) else plaintext
     aesgcm = AESGCM(key)
@@ -58,6 +118,237 @@ def decrypt_binary(key: bytes, encrypted_data: bytes) -> bytes:
     aesgcm = AESGCM(key)
     return aesgcm.decrypt(nonce, ciphertext, None)
 
+# Batches at least this large are split across the AEAD thread pool.
+# AES-GCM in `cryptography` releases the GIL, so the slices run truly in parallel.
+AEAD_PARALLEL_THRESHOLD = 256
+AEAD_MAX_WORKERS = os.cpu_count() or 2
+AEAD_NONCE_BYTES = 12
+
+_aead_executor = None
+_aead_executor_lock = threading.Lock()
+
+def _get_aead_executor() -> ThreadPoolExecutor:
+    global _aead_executor
+    with _aead_executor_lock:
+        if _aead_executor is None:
+            _aead_executor = ThreadPoolExecutor(max_workers=AEAD_MAX_WORKERS, thread_name_prefix="thanos-aead")
+        return _aead_executor
+
+class CipherContext:
+    """
+    AES-256-GCM cipher bound to one key, built once and reused for every item.
+    Same wire format as encrypt_data/decrypt_data (nonce + ciphertext).
+
+    The *_many methods never raise for a bad item: they return one
+    (result, error) pair per input, in input order, with exactly one of the
+    two set. One corrupt row therefore does not abort the batch.
+    """
+    def __init__(self, key: bytes):
+        self._aesgcm = AESGCM(key)
+
+    def encrypt(self, data: str | bytes) -> bytes:
+        data_to_encrypt = data.encode('utf-8') if isinstance(data, str) else data
+        nonce = os.urandom(AEAD_NONCE_BYTES)
+        return nonce + self._aesgcm.encrypt(nonce, data_to_encrypt, None)
+
+    def decrypt(self, encrypted_data: bytes, decode_to_str: bool = True) -> bytes | str:
+        try:
+            plaintext_bytes = self._aesgcm.decrypt(encrypted_data[:AEAD_NONCE_BYTES], encrypted_data[AEAD_NONCE_BYTES:], None)
+            return plaintext_bytes.decode('utf-8') if decode_to_str else plaintext_bytes
+        except Exception as e:
+            raise ValueError("Échec du déchiffrement.") from e
+
+    def encrypt_many(self, items: Iterable[str | bytes]) -> list[tuple[bytes | None, Exception | None]]:
+        return self._map(self.encrypt, list(items))
+
+    def decrypt_many(self, items: Iterable[bytes], decode_to_str: bool = True) -> list[tuple[bytes | str | None, Exception | None]]:
+        return self._map(lambda item: self.decrypt(item, decode_to_str), list(items))
+
+    @staticmethod
+    def _apply(fn: Callable, items: list) -> list:
+        results = []
+        for item in items:
+            try:
+                results.append((fn(item), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def _map(self, fn: Callable, items: list) -> list:
+        if len(items) < AEAD_PARALLEL_THRESHOLD:
+            return self._apply(fn, items)
+        executor = _get_aead_executor()
+        slice_size = -(-len(items) // AEAD_MAX_WORKERS)
+        slices = [items[i:i + slice_size] for i in range(0, len(items), slice_size)]
+        results = []
+        for part in executor.map(lambda chunk: self._apply(fn, chunk), slices):
+            results.extend(part)
+        return results
+
+def encrypt_many(key: bytes, items: Iterable[str | bytes]) -> list[tuple[bytes | None, Exception | None]]:
+    return CipherContext(key).encrypt_many(items)
+
+def decrypt_many(key: bytes, items: Iterable[bytes], decode_to_str: bool = True) -> list[tuple[bytes | str | None, Exception | None]]:
+    return CipherContext(key).decrypt_many(items, decode_to_str)
+
+# Segmented streaming format (large blobs: backups, photos).
+# Header: MAGIC | version | chunk size (u32) | random nonce prefix (7 bytes).
+# Each chunk is AES-GCM encrypted with nonce = prefix | counter (u32) | last flag,
+# and the header as associated data. A missing final chunk, reordered or
+# altered chunks all fail authentication.
+STREAM_MAGIC = b"THNS"
+STREAM_FORMAT_VERSION = 1
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+# Upper bound on the chunk size read from a header, checked before any allocation
+STREAM_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+STREAM_NONCE_PREFIX_BYTES = 7
+STREAM_TAG_BYTES = 16
+STREAM_HEADER_BYTES = len(STREAM_MAGIC) + 1 + 4 + STREAM_NONCE_PREFIX_BYTES
+
+def _stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    if counter >= 2 ** 32:
+        raise ValueError("Flux trop volumineux.")
+    return prefix + struct.pack(">I", counter) + (b"\x01" if last else b"\x00")
+
+def is_stream(data: bytes) -> bool:
+    """True if `data` starts with a streaming-format header."""
+    return data[:len(STREAM_MAGIC)] == STREAM_MAGIC
+
+def _check_chunk_size(chunk_size: int):
+    if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+        raise ValueError(f"Taille de segment invalide : {chunk_size}")
+
+def _parse_stream_header(header: bytes) -> tuple[int, bytes]:
+    """(chunk size, nonce prefix) of a stream header; ValueError if it is not a valid one."""
+    if len(header) != STREAM_HEADER_BYTES or not is_stream(header):
+        raise ValueError("En-tête de flux chiffré invalide.")
+    version = header[len(STREAM_MAGIC)]
+    if version != STREAM_FORMAT_VERSION:
+        raise ValueError(f"Version de flux chiffré non supportée : {version}")
+    (chunk_size,) = struct.unpack(">I", header[len(STREAM_MAGIC) + 1:len(STREAM_MAGIC) + 5])
+    _check_chunk_size(chunk_size)
+    return chunk_size, header[-STREAM_NONCE_PREFIX_BYTES:]
+
+def encrypt_stream(key: bytes, src: BinaryIO, dst: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE,
+                   progress: Callable[[int], None] | None = None) -> int:
+    """
+    Encrypts `src` into `dst` chunk by chunk, in constant memory.
+    `progress` receives the number of plaintext bytes processed so far.
+    Returns the total number of plaintext bytes.
+    """
+    _check_chunk_size(chunk_size)
+    aesgcm = AESGCM(key)
+    header = STREAM_MAGIC + bytes([STREAM_FORMAT_VERSION]) + struct.pack(">I", chunk_size) + os.urandom(STREAM_NONCE_PREFIX_BYTES)
+    prefix = header[-STREAM_NONCE_PREFIX_BYTES:]
+    dst.write(header)
+
+    total = 0
+    counter = 0
+    chunk = src.read(chunk_size)
+    while True:
+        next_chunk = src.read(chunk_size)
+        last = not next_chunk
+        dst.write(aesgcm.encrypt(_stream_nonce(prefix, counter, last), chunk, header))
+        total += len(chunk)
+        counter += 1
+        if progress:
+            progress(total)
+        if last:
+            return total
+        chunk = next_chunk
+
+def decrypt_stream(key: bytes, src: BinaryIO, dst: BinaryIO, progress: Callable[[int], None] | None = None) -> int:
+    """
+    Decrypts a stream produced by encrypt_stream from `src` into `dst`.
+    Fails with ValueError on the first bad chunk, before writing it; a
+    truncated stream is detected by the missing final-chunk flag. The chunk
+    size is read before the header is authenticated, so it is bounded first.
+    Returns the total number of plaintext bytes.
+    """
+    header = src.read(STREAM_HEADER_BYTES)
+    chunk_size, prefix = _parse_stream_header(header)
+    aesgcm = AESGCM(key)
+
+    total = 0
+    counter = 0
+    chunk = src.read(chunk_size + STREAM_TAG_BYTES)
+    if not chunk:
+        raise ValueError("Flux chiffré tronqué.")
+    while True:
+        next_chunk = src.read(chunk_size + STREAM_TAG_BYTES)
+        last = not next_chunk
+        try:
+            plaintext = aesgcm.decrypt(_stream_nonce(prefix, counter, last), chunk, header)
+        except Exception as e:
+            raise ValueError(f"Échec du déchiffrement (segment {counter}).") from e
+        dst.write(plaintext)
+        total += len(plaintext)
+        counter += 1
+        if progress:
+            progress(total)
+        if last:
+            return total
+        chunk = next_chunk
+
+def decrypt_blob(key: bytes, data: bytes) -> bytes:
+    """
+    Decrypts a blob written either in the streaming format or as a single AES-GCM message.
+    Only a header that does not parse means a single message (whose random nonce happens to
+    start with the magic); a stream whose chunks fail to authenticate is an error.
+    """
+    try:
+        _parse_stream_header(data[:STREAM_HEADER_BYTES])
+    except ValueError:
+        return decrypt_binary(key, data)
+    out = io.BytesIO()
+    decrypt_stream(key, io.BytesIO(data), out)
+    return out.getvalue()
+
+# Key hierarchy: a random data-encryption key (DEK) per vault, wrapped by the
+# password-derived key, with one HKDF subkey per purpose.
+DATA_KEY_BYTES = 32
+SUBKEY_ACCOUNTS = "accounts"
+SUBKEY_LOGS = "logs"
+SUBKEY_PHOTOS = "photos"
+SUBKEY_LOG_INDEX = "log-index"
+SUBKEY_PHOTO_INDEX = "photo-index"
+# Prefix of the device-bound wrapping key ("device/<fingerprint>"), derived from the password key
+SUBKEY_DEVICE = "device"
+
+def generate_data_key() -> bytes:
+    return secrets.token_bytes(DATA_KEY_BYTES)
+
+def derive_subkey(data_key: bytes, purpose: str) -> bytes:
+    """Derives the purpose-specific subkey (HKDF-SHA256) from the vault data key (or password key)."""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=DATA_KEY_BYTES,
+        salt=None,
+        info=f"thanos/{purpose}".encode('utf-8'),
+    ).derive(data_key)
+
+def key_identifier(data_key: bytes) -> str:
+    """
+    Public identifier of a data key (HMAC-SHA256 of a fixed label).
+    Lets a cached key be matched to its vault without revealing the key.
+    """
+    return hmac.new(data_key, b"thanos/key-id", hashlib.sha256).hexdigest()
+
+# Blind index: a keyed, deterministic tag of a plaintext field, stored next to the
+# ciphertext so that equality filters run in SQL. Truncated HMAC-SHA256; equal
+# values are linkable by design, nothing else about them is revealed.
+BLIND_INDEX_BYTES = 16
+
+def blind_index(index_key: bytes, value: str) -> bytes:
+    return hmac.new(index_key, value.encode('utf-8'), hashlib.sha256).digest()[:BLIND_INDEX_BYTES]
+
+def content_address(index_key: bytes, data: bytes) -> str:
+    """
+    Keyed content address (HMAC-SHA256, hex): identical content gets the same name,
+    but a name cannot be matched against a candidate file without the key.
+    """
+    return hmac.new(index_key, data, hashlib.sha256).hexdigest()
+
 def hash_password(password: str) -> bytes:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
 
@@ -1,20 +1,439 @@
 # thanos_app/core/database.py
+import os
+import re
+import sys
+import time
 import sqlite3
-from typing import List, Dict, Any, Optional
-from config import VAULT_DB_FILE
+import argparse
+import threading
+import unicodedata
+from contextlib import contextmanager, nullcontext
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+from config import VAULT_DB_FILE, DEBUG_QUERY_PLANS
+
+ACCOUNT_FIELDS = ("name", "username", "encrypted_password", "url", "notes", "category", "importance", "tags")
+ACCOUNT_DEFAULTS = {"username": "", "url": "", "notes": "", "category": "Autre", "importance": 1, "tags": ""}
+
+# Index secondaires : (nom, table, DDL). Un index par chemin d'accès réellement emprunté
+# par l'application ; l'index par catégorie inclut les colonnes de tri pour éviter tout tri temporaire.
+INDEXES = (
+    ("idx_accounts_importance_name", "accounts",
+     "CREATE INDEX IF NOT EXISTS idx_accounts_importance_name ON accounts (importance DESC, name)"),
+    ("idx_accounts_category", "accounts",
+     "CREATE INDEX IF NOT EXISTS idx_accounts_category ON accounts (category, importance DESC, name)"),
+    ("idx_security_logs_timestamp", "security_logs",
+     "CREATE INDEX IF NOT EXISTS idx_security_logs_timestamp ON security_logs (timestamp)"),
+    ("idx_security_logs_event_type", "security_logs",
+     "CREATE INDEX IF NOT EXISTS idx_security_logs_event_type ON security_logs (event_type_hmac, timestamp)"),
+    ("idx_account_tags_tag", "account_tags",
+     "CREATE INDEX IF NOT EXISTS idx_account_tags_tag ON account_tags (tag_id, account_id)"),
+    ("idx_tags_count", "tags",
+     "CREATE INDEX IF NOT EXISTS idx_tags_count ON tags (account_count DESC, name)"),
+)
+
+# Tags normalisés : accounts.tags reste la saisie affichée, tags/account_tags en sont
+# la forme indexée (synchronisée à chaque écriture d'un compte, voir _sync_account_tags).
+# Le nombre de comptes par tag est tenu à jour par triggers ; un tag orphelin disparaît.
+TAG_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+        account_count INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS account_tags (
+        account_id INTEGER NOT NULL,
+        tag_id INTEGER NOT NULL,
+        PRIMARY KEY (account_id, tag_id)
+    ) WITHOUT ROWID""",
+    """CREATE TRIGGER IF NOT EXISTS account_tags_insert AFTER INSERT ON account_tags BEGIN
+        UPDATE tags SET account_count = account_count + 1 WHERE id = new.tag_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS account_tags_delete AFTER DELETE ON account_tags BEGIN
+        UPDATE tags SET account_count = account_count - 1 WHERE id = old.tag_id;
+        DELETE FROM tags WHERE id = old.tag_id AND account_count <= 0;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_tags_delete AFTER DELETE ON accounts BEGIN
+        DELETE FROM account_tags WHERE account_id = old.id;
+    END""",
+)
+
+def account_sort_key(row: Dict[str, Any]) -> tuple:
+    """Ordre de la liste principale (importance décroissante, nom, id), identique aux ORDER BY SQL."""
+    return (-(row['importance'] or 0), row['name'], row['id'])
+
+def parse_tags(tags: str | None) -> List[str]:
+    """Tags d'une saisie libre séparée par des virgules : sans espaces superflus ni doublons (casse ignorée)."""
+    seen, result = set(), []
+    for tag in (tags or "").split(","):
+        tag = tag.strip()
+        if tag and tag.casefold() not in seen:
+            seen.add(tag.casefold())
+            result.append(tag)
+    return result
+
+# Requêtes de lecture et de purge émises par l'application. check_query_plans() vérifie
+# que chacune est servie par un index (exemples de paramètres fournis pour EXPLAIN).
+SQL_ALL_ACCOUNTS = "SELECT * FROM accounts ORDER BY importance DESC, name ASC"
+SQL_ACCOUNTS_BY_CATEGORY = "SELECT * FROM accounts WHERE category = ? ORDER BY importance DESC, name ASC"
+SQL_ACCOUNT_BY_ID = "SELECT * FROM accounts WHERE id = ?"
+
+# Liste paginée : seules les colonnes affichées, jamais le mot de passe chiffré ni les notes.
+# Pagination par clé (importance, name, id) : chaque page reprend après la dernière ligne
+# vue, par une recherche dans l'index (coût constant quelle que soit la profondeur).
+# L'importance n'ayant que quelques valeurs, la suite d'une page se lit en deux requêtes
+# indexées : la fin du niveau d'importance courant, puis les niveaux inférieurs.
+ACCOUNT_SUMMARY_COLUMNS = ("id", "name", "username", "category", "importance", "tags")
+ACCOUNT_PAGE_SIZE = 200
+SQL_MAX_VARIABLES = 500  # Taille des lots de paramètres pour les requêtes "IN (...)"
+_SQL_ACCOUNT_SUMMARIES = ("SELECT id, name, username, category, importance, tags FROM accounts {where} "
+                          "ORDER BY importance DESC, name ASC, id ASC LIMIT ?")
+SQL_ACCOUNT_SUMMARIES_FIRST = _SQL_ACCOUNT_SUMMARIES.format(where="")
+SQL_ACCOUNT_SUMMARIES_SAME_LEVEL = _SQL_ACCOUNT_SUMMARIES.format(
+    where="WHERE importance = ? AND (name, id) > (?, ?)")
+SQL_ACCOUNT_SUMMARIES_LOWER_LEVELS = _SQL_ACCOUNT_SUMMARIES.format(where="WHERE importance < ?")
+SQL_CATEGORY_SUMMARIES_FIRST = _SQL_ACCOUNT_SUMMARIES.format(where="WHERE category = ?")
+SQL_CATEGORY_SUMMARIES_SAME_LEVEL = _SQL_ACCOUNT_SUMMARIES.format(
+    where="WHERE category = ? AND importance = ? AND (name, id) > (?, ?)")
+SQL_CATEGORY_SUMMARIES_LOWER_LEVELS = _SQL_ACCOUNT_SUMMARIES.format(
+    where="WHERE category = ? AND importance < ?")
+# Champs de la recherche approchée (search_index), lus par pages sur la clé primaire
+SQL_ACCOUNT_SEARCH_FIELDS = ("SELECT id, name, username, url, category, tags FROM accounts "
+                             "WHERE id > ? ORDER BY id LIMIT ?")
+# Les événements écrits par lots portent l'heure de l'événement, pas celle du commit
+SQL_INSERT_LOG = ("INSERT INTO security_logs (timestamp, encrypted_log_data, event_type_hmac, status_hmac) "
+                  "VALUES (COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?)")
+SQL_ALL_LOGS = "SELECT * FROM security_logs ORDER BY timestamp DESC"
+# Journal paginé par clé (timestamp, id), du plus récent au plus ancien, borné par une période.
+# L'index sur timestamp contient implicitement l'id : ni tri temporaire ni parcours complet.
+LOG_PAGE_SIZE = 100
+LOG_TIMESTAMP_MIN = ""
+LOG_TIMESTAMP_MAX = "9999-12-31 23:59:59"
+_SQL_LOG_PAGE = ("SELECT id, timestamp, encrypted_log_data FROM security_logs "
+                 "WHERE timestamp >= ? AND {upper} ORDER BY timestamp DESC, id DESC LIMIT ?")
+SQL_LOG_PAGE_FIRST = _SQL_LOG_PAGE.format(upper="timestamp < ?")
+SQL_LOG_PAGE_AFTER = _SQL_LOG_PAGE.format(upper="(timestamp, id) < (?, ?)")
+# Index aveugles (HMAC du type et du statut, calculés par SecurityManager) : filtres et
+# comptages par type d'événement sans rien déchiffrer
+LOG_INDEX_COLUMNS = ("event_type_hmac", "status_hmac")
+SQL_TYPE_LOG_PAGE_FIRST = _SQL_LOG_PAGE.format(upper="event_type_hmac = ? AND timestamp < ?")
+SQL_TYPE_LOG_PAGE_AFTER = _SQL_LOG_PAGE.format(upper="event_type_hmac = ? AND (timestamp, id) < (?, ?)")
+SQL_COUNT_LOGS = ("SELECT COUNT(*) FROM security_logs WHERE event_type_hmac IN ({types}) "
+                  "AND timestamp >= ? AND timestamp < ? {status}")
+SQL_UNINDEXED_LOGS = "SELECT id, encrypted_log_data FROM security_logs WHERE event_type_hmac IS NULL LIMIT ?"
+SQL_SET_LOG_INDEX = "UPDATE security_logs SET event_type_hmac = ?, status_hmac = ? WHERE id = ?"
+SQL_DELETE_OLD_LOGS = "DELETE FROM security_logs WHERE timestamp < datetime('now', ?)"
+
+SQL_TAG_FACETS = "SELECT name, account_count FROM tags ORDER BY account_count DESC, name ASC"
+SQL_TAGS_BY_PREFIX = "SELECT name, account_count FROM tags WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?"
+SQL_TAG_ACCOUNT_IDS = ("SELECT account_id FROM account_tags "
+                       "WHERE tag_id = (SELECT id FROM tags WHERE name = ?)")
+
+def _fts5_available() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(x)")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+# Recherche plein texte : table FTS5 à contenu externe (le texte n'est pas dupliqué,
+# seul l'index inversé est stocké), tenue à jour par des triggers sur accounts.
+# Le classement bm25 pondère les colonnes : nom > identifiant = tags > URL > notes.
+FTS5_AVAILABLE = _fts5_available()
+FTS_COLUMNS = ("name", "username", "url", "notes", "tags")
+FTS_RANK = "bm25(10.0, 5.0, 2.0, 1.0, 5.0)"
+FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS accounts_fts USING fts5(
+        name, username, url, notes, tags,
+        content='accounts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_fts_insert AFTER INSERT ON accounts BEGIN
+        INSERT INTO accounts_fts (rowid, name, username, url, notes, tags)
+        VALUES (new.id, new.name, new.username, new.url, new.notes, new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_fts_delete AFTER DELETE ON accounts BEGIN
+        INSERT INTO accounts_fts (accounts_fts, rowid, name, username, url, notes, tags)
+        VALUES ('delete', old.id, old.name, old.username, old.url, old.notes, old.tags);
+    END""",
+    # Un changement de mot de passe seul ne touche pas à l'index
+    """CREATE TRIGGER IF NOT EXISTS accounts_fts_update AFTER UPDATE OF name, username, url, notes, tags ON accounts BEGIN
+        INSERT INTO accounts_fts (accounts_fts, rowid, name, username, url, notes, tags)
+        VALUES ('delete', old.id, old.name, old.username, old.url, old.notes, old.tags);
+        INSERT INTO accounts_fts (rowid, name, username, url, notes, tags)
+        VALUES (new.id, new.name, new.username, new.url, new.notes, new.tags);
+    END""",
+    f"INSERT INTO accounts_fts (accounts_fts, rank) VALUES ('rank', '{FTS_RANK}')",
+)
+ACCOUNT_SEARCH_LIMIT = 500
+# Les résultats portent aussi l'URL et les notes : l'interface peut affiner localement une recherche
+_SQL_SEARCH_ACCOUNTS = ("SELECT a.id, a.name, a.username, a.category, a.importance, a.tags, a.url, a.notes "
+                        "FROM accounts_fts JOIN accounts a ON a.id = accounts_fts.rowid "
+                        "WHERE accounts_fts MATCH ? {category} ORDER BY rank LIMIT ?")
+SQL_SEARCH_ACCOUNTS = _SQL_SEARCH_ACCOUNTS.format(category="")
+SQL_SEARCH_CATEGORY_ACCOUNTS = _SQL_SEARCH_ACCOUNTS.format(category="AND a.category = ?")
+# Repli sans FTS5 : sous-chaînes, parcours complet de la table
+SQL_SEARCH_ACCOUNTS_LIKE = ("SELECT id, name, username, category, importance, tags, url, notes FROM accounts "
+                            "WHERE {terms} {category} ORDER BY importance DESC, name ASC, id ASC LIMIT ?")
+_SEARCH_TERM_LIKE = "(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in FTS_COLUMNS) + ")"
+
+def search_terms(text: str) -> List[str]:
+    """Découpe une saisie en termes de recherche (mêmes séparateurs que le tokenizer unicode61)."""
+    return re.findall(r"\w+", text.lower())
+
+def fold_search_text(text: str) -> str:
+    """Minuscules sans diacritiques, comme le tokenizer FTS5 (unicode61 remove_diacritics 2)."""
+    if text.isascii():
+        return text.lower()
+    return "".join(c for c in unicodedata.normalize("NFKD", text.casefold()) if not unicodedata.combining(c))
+
+def fts_prefix_query(terms: List[str]) -> str:
+    """Requête FTS5 : tous les termes, chacun comme préfixe ("goo"* "mai"*)."""
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+QUERY_PLAN_CHECKS = (
+    (SQL_ALL_ACCOUNTS, ()),
+    (SQL_ACCOUNTS_BY_CATEGORY, ("Autre",)),
+    (SQL_ACCOUNT_BY_ID, (1,)),
+    (SQL_ACCOUNT_SUMMARIES_FIRST, (ACCOUNT_PAGE_SIZE,)),
+    (SQL_ACCOUNT_SUMMARIES_SAME_LEVEL, (2, "a", 1, ACCOUNT_PAGE_SIZE)),
+    (SQL_ACCOUNT_SUMMARIES_LOWER_LEVELS, (2, ACCOUNT_PAGE_SIZE)),
+    (SQL_CATEGORY_SUMMARIES_FIRST, ("Autre", ACCOUNT_PAGE_SIZE)),
+    (SQL_CATEGORY_SUMMARIES_SAME_LEVEL, ("Autre", 2, "a", 1, ACCOUNT_PAGE_SIZE)),
+    (SQL_CATEGORY_SUMMARIES_LOWER_LEVELS, ("Autre", 2, ACCOUNT_PAGE_SIZE)),
+    (SQL_ACCOUNT_SEARCH_FIELDS, (0, ACCOUNT_PAGE_SIZE)),
+    (SQL_ALL_LOGS, ()),
+    (SQL_LOG_PAGE_FIRST, (LOG_TIMESTAMP_MIN, LOG_TIMESTAMP_MAX, LOG_PAGE_SIZE)),
+    (SQL_LOG_PAGE_AFTER, (LOG_TIMESTAMP_MIN, "2024-01-01 00:00:00", 1, LOG_PAGE_SIZE)),
+    (SQL_TYPE_LOG_PAGE_FIRST, (LOG_TIMESTAMP_MIN, b"t", LOG_TIMESTAMP_MAX, LOG_PAGE_SIZE)),
+    (SQL_TYPE_LOG_PAGE_AFTER, (LOG_TIMESTAMP_MIN, b"t", "2024-01-01 00:00:00", 1, LOG_PAGE_SIZE)),
+    (SQL_COUNT_LOGS.format(types="?", status=""), (b"t", LOG_TIMESTAMP_MIN, LOG_TIMESTAMP_MAX)),
+    (SQL_COUNT_LOGS.format(types="?, ?", status="AND status_hmac = ?"),
+     (b"t", b"u", LOG_TIMESTAMP_MIN, LOG_TIMESTAMP_MAX, b"s")),
+    (SQL_UNINDEXED_LOGS, (LOG_PAGE_SIZE,)),
+    (SQL_DELETE_OLD_LOGS, ("-24 hours",)),
+    (SQL_TAG_FACETS, ()),
+    (SQL_TAGS_BY_PREFIX, ("a%", 20)),
+    (SQL_TAG_ACCOUNT_IDS, ("a",)),
+    (SQL_SEARCH_ACCOUNTS, ('"a"*', ACCOUNT_SEARCH_LIMIT)),
+    (SQL_SEARCH_CATEGORY_ACCOUNTS, ('"a"*', "Autre", ACCOUNT_SEARCH_LIMIT)),
+)
+
+# Réglages appliqués à chaque connexion (voir open_connection)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024   # 64 MiB
+SQLITE_CACHE_SIZE_KIB = 8192          # 8 MiB par connexion
+
+def open_connection(db_file: str) -> sqlite3.Connection:
+    """
+    Fabrique de connexions du coffre. Le journal WAL permet aux lectures de ne jamais
+    bloquer l'écrivain (ni l'inverse) ; synchronous=NORMAL ne synchronise le disque
+    qu'aux checkpoints, ce qui reste sûr en WAL (seule la dernière transaction peut
+    être perdue en cas de coupure, jamais l'intégrité de la base).
+    Mode autocommit : les transactions sont délimitées explicitement par transaction().
+    """
+    # check_same_thread=False : close() peut fermer depuis un autre thread les connexions du pool
+    conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None,
+                           timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+    return conn
+
+def remove_wal_files(db_file: str):
+    """
+    Supprime les fichiers -wal et -shm d'une base sur le point d'être remplacée
+    (restauration, import) : rejoués sur le nouveau fichier, ils le corrompraient.
+    """
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+
+# --- Migrations du schéma ---
+# Chaque étape reçoit (db, cursor) dans une transaction ouverte et doit être idempotente :
+# les coffres créés avant ce registre (user_version = 0) repassent par toutes les étapes.
+# Nouvelle étape = nouvelle entrée en fin de liste ; create_tables() produit directement le dernier schéma.
+
+def _migrate_account_columns(db, cursor):
+    columns = {row['name'] for row in cursor.execute("PRAGMA table_info(accounts)")}
+    if 'category' not in columns:
+        cursor.execute("ALTER TABLE accounts ADD COLUMN category TEXT DEFAULT 'Autre'")
+    if 'importance' not in columns:
+        cursor.execute("ALTER TABLE accounts ADD COLUMN importance INTEGER DEFAULT 1")
+    if 'tags' not in columns:
+        cursor.execute("ALTER TABLE accounts ADD COLUMN tags TEXT DEFAULT ''")
+
+def _migrate_secondary_indexes(db, cursor):
+    tables = {row['name'] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in ("accounts", "security_logs"):
+        if table in tables:  # Le journal est créé plus tard s'il n'existe pas encore, avec ses index
+            if table == "security_logs":
+                db._create_log_index_columns(cursor)  # Requises par l'index des types d'événements
+            db._create_indexes(cursor, table)
+
+def _migrate_full_text_search(db, cursor):
+    if not FTS5_AVAILABLE:
+        return  # Recherche par LIKE (voir search_accounts)
+    for ddl in FTS_SCHEMA:
+        cursor.execute(ddl)
+    cursor.execute("INSERT INTO accounts_fts (accounts_fts) VALUES ('rebuild')")
+
+def _migrate_normalized_tags(db, cursor):
+    db._create_tag_tables(cursor)
+    for row in cursor.execute("SELECT id, tags FROM accounts WHERE tags <> ''").fetchall():
+        db._sync_account_tags(cursor, row['id'], row['tags'])
+
+def _migrate_log_blind_index(db, cursor):
+    # Les lignes existantes sont indexées par SecurityManager.index_logs, seul à détenir la clé
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'security_logs'").fetchone():
+        db._create_log_index_columns(cursor)
+        db._create_indexes(cursor, "security_logs")
+
+MIGRATIONS = (
+    (1, "colonnes category, importance et tags", _migrate_account_columns),
+    (2, "index secondaires", _migrate_secondary_indexes),
+    (3, "recherche plein texte", _migrate_full_text_search),
+    (4, "tags normalisés", _migrate_normalized_tags),
+    (5, "index aveugle des types d'événements du journal", _migrate_log_blind_index),
+)
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+class _DryRunRollback(Exception):
+    """Annule la transaction englobante d'une migration simulée."""
 
 class DatabaseManager:
+    """
+    Accès à la base du coffre. Chaque thread obtient automatiquement sa propre
+    connexion (pool local au thread) : le thread GUI, le TaskRunner et les threads
+    d'arrière-plan ne partagent jamais une connexion.
+    """
     def __init__(self, db_file=VAULT_DB_FILE):
         self.db_file = db_file
-        self.conn = None
+        self._local = threading.local()
+        self._pool = []
+        self._pool_lock = threading.Lock()
+        self._generation = 0  # Incrémenté par close() : invalide les connexions locales des threads
+        self._config_cache = None  # Contenu de vault_config (voir read_config)
+        self._config_generation = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion du thread appelant, ouverte à la première utilisation."""
+        if getattr(self._local, "generation", None) != self._generation:
+            self.connect()
+        return self._local.conn
+
+    def connect(self) -> sqlite3.Connection:
+        if getattr(self._local, "generation", None) != self._generation:
+            conn = open_connection(self.db_file)
+            with self._pool_lock:
+                self._pool.append(conn)
+                self._local.generation = self._generation
+            self._local.conn = conn
+            self._local.tx_depth = 0
+            self._local.config_written = False
+        return self._local.conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unité de travail : tout le bloc est validé par un seul COMMIT (un seul fsync),
+        ou annulé en cas d'exception. Les blocs imbriqués deviennent des SAVEPOINT :
+        l'échec d'un bloc interne n'annule que ses propres écritures.
+        """
+        conn = self.conn
+        depth = self._local.tx_depth
+        savepoint = f"sp_{depth}"
+        # IMMEDIATE : le verrou d'écriture est pris d'emblée (attente bornée par busy_timeout)
+        conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+        self._local.tx_depth = depth + 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            conn.execute("COMMIT" if depth == 0 else f"RELEASE {savepoint}")
+        finally:
+            self._local.tx_depth = depth
+            if depth == 0 and self._local.config_written:
+                # Validée ou annulée, l'écriture rend le cache périmé (y compris pour les autres threads)
+                self._local.config_written = False
+                self._invalidate_config()
+
+    def read_config(self) -> Dict[str, Any]:
+        """
+        Table vault_config entière, lue en une seule requête et conservée en cache jusqu'à
+        la prochaine écriture par write_config(). Dans une transaction, la table est relue :
+        le cache ne voit pas les écritures pas encore validées. Lève sqlite3.DatabaseError si
+        le fichier n'est pas une base SQLite ou n'a pas de configuration.
+        """
+        conn = self.conn
+        in_transaction = self._local.tx_depth > 0 or self._local.config_written
+        with self._pool_lock:
+            cached, generation = self._config_cache, self._config_generation
+        if cached is not None and not in_transaction:
+            return dict(cached)
+        values = {row['key']: row['value'] for row in conn.execute("SELECT key, value FROM vault_config")}
+        # Lecture dans une transaction : elle peut voir des écritures non validées, on ne la garde pas
+        if not in_transaction:
+            with self._pool_lock:
+                if self._config_generation == generation:
+                    self._config_cache = values
+        return dict(values)
 
-    def connect(self):
-        self.conn = sqlite3.connect(self.db_file)
-        self.conn.row_factory = sqlite3.Row
+    def write_config(self, values: Dict[str, Any] | None = None, delete: Iterable[str] = ()):
+        """Écrit et/ou supprime des clés de vault_config (dans la transaction en cours s'il y en a une)."""
+        with self.transaction() as cursor:
+            self._local.config_written = True
+            if values:
+                cursor.executemany("INSERT OR REPLACE INTO vault_config (key, value) VALUES (?, ?)", values.items())
+            delete = list(delete)
+            if delete:
+                cursor.executemany("DELETE FROM vault_config WHERE key = ?", ((key,) for key in delete))
+
+    def _invalidate_config(self):
+        with self._pool_lock:
+            self._config_cache = None
+            self._config_generation += 1
+
+    def snapshot(self, dest_file: str):
+        """Copie cohérente de la base (pages encore dans le WAL comprises) via l'API de sauvegarde SQLite."""
+        target = sqlite3.connect(dest_file)
+        try:
+            self.conn.backup(target)
+        finally:
+            target.close()
+
+    def release(self):
+        """Ferme la connexion du thread courant (à appeler en fin de thread d'arrière-plan)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            return
+        with self._pool_lock:
+            if conn in self._pool:
+                self._pool.remove(conn)
+        conn.close()
+        self._local.generation = None
+        self._local.conn = None
 
     def close(self):
-        if self.conn:
-            self.conn.close()
+        """Ferme toutes les connexions du pool ; elles seront rouvertes à la prochaine utilisation."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, []
+            self._generation += 1
+            self._config_cache = None  # Le fichier peut être remplacé avant la réouverture (import, restauration)
+            self._config_generation += 1
+        for conn in pool:
+            conn.close()
 
     def __enter__(self):
         self.connect()
@@ -24,116 +443,433 @@ class DatabaseManager:
         self.close()
 
     def create_tables(self):
-        if not self.conn: self.connect()
-        cursor = self.conn.cursor()
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS vault_config (
-            key TEXT PRIMARY KEY,
-            value BLOB NOT NULL
-        )
-        """)
-
-        # Ajout des colonnes category, importance, tags
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            username TEXT,
-            encrypted_password BLOB NOT NULL,
-            url TEXT,
-            notes TEXT,
-            category TEXT DEFAULT 'Autre',
-            importance INTEGER DEFAULT 1,
-            tags TEXT DEFAULT '',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vault_config (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL
+            )
+            """)
+
+            # Ajout des colonnes category, importance, tags
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                username TEXT,
+                encrypted_password BLOB NOT NULL,
+                url TEXT,
+                notes TEXT,
+                category TEXT DEFAULT 'Autre',
+                importance INTEGER DEFAULT 1,
+                tags TEXT DEFAULT '',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            self._create_indexes(cursor, "accounts")
+            self._create_tag_tables(cursor)
+            if FTS5_AVAILABLE:
+                for ddl in FTS_SCHEMA:
+                    cursor.execute(ddl)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
     def create_logs_table(self):
-        if not self.conn: self.connect()
-        cursor = self.conn.cursor()
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS security_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            encrypted_log_data BLOB NOT NULL
-        )""")
-        self.conn.commit()
-
-    def migrate_database(self):
-        """Vérifie et met à jour le schéma de la base de données si nécessaire."""
-        if not self.conn: self.connect()
-        cursor = self.conn.cursor()
+        with self.transaction() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS security_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                encrypted_log_data BLOB NOT NULL,
+                event_type_hmac BLOB,
+                status_hmac BLOB
+            )""")
+            self._create_log_index_columns(cursor)  # Journal créé avant la migration 5
+            self._create_indexes(cursor, "security_logs")
 
-        cursor.execute("PRAGMA table_info(accounts)")
-        columns = [row['name'] for row in cursor.fetchall()]
+    def _create_log_index_columns(self, cursor):
+        columns = {row['name'] for row in cursor.execute("PRAGMA table_info(security_logs)")}
+        for column in LOG_INDEX_COLUMNS:
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE security_logs ADD COLUMN {column} BLOB")
 
-        migrated = False
-        if 'category' not in columns:
-            cursor.execute("ALTER TABLE accounts ADD COLUMN category TEXT DEFAULT 'Autre'")
-            migrated = True
-        if 'importance' not in columns:
-            cursor.execute("ALTER TABLE accounts ADD COLUMN importance INTEGER DEFAULT 1")
-            migrated = True
-        if 'tags' not in columns:
-            cursor.execute("ALTER TABLE accounts ADD COLUMN tags TEXT DEFAULT ''")
-            migrated = True
+    def _create_indexes(self, cursor, table: str):
+        for _, index_table, ddl in INDEXES:
+            if index_table == table:
+                cursor.execute(ddl)
 
-        if migrated:
-            self.conn.commit()
+    def _create_tag_tables(self, cursor):
+        for ddl in TAG_SCHEMA:
+            cursor.execute(ddl)
+        self._create_indexes(cursor, "tags")
+        self._create_indexes(cursor, "account_tags")
 
-    def add_log_entry(self, encrypted_log_data: bytes):
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT INTO security_logs (encrypted_log_data) VALUES (?)", (encrypted_log_data,))
-        self.conn.commit()
-        return cursor.lastrowid
+    def _sync_account_tags(self, cursor, account_id: int, tags: str | None):
+        """Aligne account_tags sur la saisie libre d'un compte (seules les différences sont écrites)."""
+        wanted = {tag.casefold(): tag for tag in parse_tags(tags)}
+        cursor.execute("SELECT t.id, t.name FROM account_tags at JOIN tags t ON t.id = at.tag_id WHERE at.account_id = ?",
+                       (account_id,))
+        current = {row['name'].casefold(): row['id'] for row in cursor.fetchall()}
+        removed = [(account_id, tag_id) for key, tag_id in current.items() if key not in wanted]
+        if removed:
+            cursor.executemany("DELETE FROM account_tags WHERE account_id = ? AND tag_id = ?", removed)
+        for key, tag in wanted.items():
+            if key in current:
+                continue
+            cursor.execute("INSERT INTO tags (name) VALUES (?) ON CONFLICT (name) DO NOTHING", (tag,))
+            tag_id = cursor.execute("SELECT id FROM tags WHERE name = ?", (tag,)).fetchone()[0]
+            cursor.execute("INSERT INTO account_tags (account_id, tag_id) VALUES (?, ?)", (account_id, tag_id))
+
+    def schema_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate_database(self, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        Applique les étapes de MIGRATIONS postérieures à la version du schéma (PRAGMA user_version).
+        Chaque étape est validée avec son numéro de version dans sa propre transaction : une
+        migration interrompue reprend à l'étape suivante. Un coffre à jour ne coûte qu'une lecture.
+        dry_run=True exécute les étapes puis annule tout, pour en mesurer la durée.
+        Retourne le rapport des étapes exécutées (version, description, durée en secondes).
+        """
+        current = self.schema_version()
+        pending = [migration for migration in MIGRATIONS if migration[0] > current]
+        report = []
+        if pending:
+            try:
+                # Simulation : toutes les étapes dans une transaction englobante, annulée à la fin
+                with self.transaction() if dry_run else nullcontext():
+                    for version, description, step in pending:
+                        start = time.perf_counter()
+                        with self.transaction() as cursor:
+                            step(self, cursor)
+                            cursor.execute(f"PRAGMA user_version = {version}")
+                        seconds = time.perf_counter() - start
+                        report.append({"version": version, "description": description, "seconds": seconds})
+                        print(f"{'Simulation' if dry_run else 'Migration'} du schéma v{version} ({description}) : {seconds:.3f} s")
+                    if dry_run:
+                        raise _DryRunRollback()
+            except _DryRunRollback:
+                pass
+        if DEBUG_QUERY_PLANS and not dry_run:
+            self.check_query_plans()
+        return report
+
+    def check_query_plans(self):
+        """
+        Contrôle de débogage : lève AssertionError si une requête de l'application
+        parcourt une table sans index ou doit trier via un B-tree temporaire.
+        """
+        # Connexion dédiée : les EXPLAIN mis en cache par une connexion ne sont pas
+        # recompilés après un changement de schéma et décriraient un plan périmé.
+        conn = open_connection(self.db_file)
+        try:
+            self._check_query_plans(conn.cursor())
+        finally:
+            conn.close()
+
+    def _check_query_plans(self, cursor):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row['name'] for row in cursor.fetchall()}
+        problems = []
+        for sql, params in QUERY_PLAN_CHECKS:
+            if not set(re.findall(r"(?:FROM|JOIN) (\w+)", sql)) <= tables:
+                continue  # Table pas encore créée (journal) ou FTS5 indisponible
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            for row in cursor.fetchall():
+                detail = row['detail']
+                # Un parcours complet n'est acceptable que pour une liste entière lue dans l'ordre d'un index
+                full_scan = detail.startswith("SCAN") and ("USING" not in detail or " WHERE " in sql)
+                if "VIRTUAL TABLE INDEX" in detail:
+                    full_scan = ":M" not in detail  # Table FTS5 : la contrainte MATCH doit être exploitée
+                if "TEMP B-TREE" in detail or full_scan:
+                    problems.append(f"{sql} -> {detail}")
+        if problems:
+            raise AssertionError("Requêtes sans index :\n" + "\n".join(problems))
+
+    def add_log_entry(self, encrypted_log_data: bytes, timestamp: str | None = None,
+                      event_type_hmac: bytes | None = None, status_hmac: bytes | None = None):
+        """
+        `timestamp` : horodatage UTC de l'événement ('YYYY-MM-DD HH:MM:SS') ; heure d'insertion si absent.
+        `event_type_hmac` / `status_hmac` : index aveugles du type et du statut (voir crypto.blind_index).
+        """
+        with self.transaction() as cursor:
+            cursor.execute(SQL_INSERT_LOG, (timestamp, encrypted_log_data, event_type_hmac, status_hmac))
+            return cursor.lastrowid
+
+    def add_log_entries(self, entries: Iterable[tuple[bytes, str | None, bytes | None, bytes | None]]) -> int:
+        """
+        Insère plusieurs entrées (données chiffrées, horodatage UTC ou None, index aveugles du
+        type et du statut) en une seule transaction. Retourne le nombre inséré.
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(SQL_INSERT_LOG, ((timestamp, entry, type_hmac, status_hmac)
+                                                for entry, timestamp, type_hmac, status_hmac in entries))
+            return cursor.rowcount
 
     def get_all_logs(self) -> List[Dict[str, Any]]:
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM security_logs ORDER BY timestamp DESC")
+        cursor.execute(SQL_ALL_LOGS)
         return [dict(row) for row in cursor.fetchall()]
 
-    def delete_old_logs(self, hours: int):
+    def get_log_page(self, after: tuple | None = None, since: str | None = None, until: str | None = None,
+                     limit: int = LOG_PAGE_SIZE, event_type_hmac: bytes | None = None) -> List[Dict[str, Any]]:
+        """
+        Une page du journal (id, timestamp, encrypted_log_data), du plus récent au plus ancien.
+        `since` (inclus) et `until` (exclu) bornent la période, au format UTC de CURRENT_TIMESTAMP.
+        `after` est la clé (timestamp, id) de la dernière ligne de la page précédente.
+        `event_type_hmac` restreint la page à un type d'événement.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM security_logs WHERE timestamp < datetime('now', ?)", (f'-{hours} hours',))
-        self.conn.commit()
-        return cursor.rowcount
+        lower = since or LOG_TIMESTAMP_MIN
+        upper = (after[0], after[1]) if after else (until or LOG_TIMESTAMP_MAX,)
+        if event_type_hmac is not None:
+            sql = SQL_TYPE_LOG_PAGE_AFTER if after else SQL_TYPE_LOG_PAGE_FIRST
+            upper = (event_type_hmac,) + upper
+        else:
+            sql = SQL_LOG_PAGE_AFTER if after else SQL_LOG_PAGE_FIRST
+        return [dict(row) for row in cursor.execute(sql, (lower,) + upper + (limit,))]
+
+    def iter_logs(self, since: str | None = None, until: str | None = None,
+                  page_size: int = LOG_PAGE_SIZE, event_type_hmac: bytes | None = None) -> Iterator[Dict[str, Any]]:
+        """Parcourt paresseusement le journal sur une période, une page à la fois (voir iter_account_summaries)."""
+        after = None
+        while True:
+            page = self.get_log_page(after, since, until, page_size, event_type_hmac)
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+            after = (last["timestamp"], last["id"])
+
+    def count_logs(self, event_type_hmacs: List[bytes], since: str | None = None, until: str | None = None,
+                   status_hmac: bytes | None = None) -> int:
+        """Nombre d'événements des types donnés (index aveugles) sur la période, sans rien déchiffrer."""
+        if not event_type_hmacs:
+            return 0
+        sql = SQL_COUNT_LOGS.format(types=", ".join("?" * len(event_type_hmacs)),
+                                    status="AND status_hmac = ?" if status_hmac is not None else "")
+        params = tuple(event_type_hmacs) + (since or LOG_TIMESTAMP_MIN, until or LOG_TIMESTAMP_MAX)
+        if status_hmac is not None:
+            params += (status_hmac,)
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def get_unindexed_logs(self, limit: int = LOG_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """Entrées sans index aveugle (écrites avant la migration 5)."""
+        return [dict(row) for row in self.conn.execute(SQL_UNINDEXED_LOGS, (limit,))]
+
+    def set_log_indexes(self, entries: Iterable[tuple[bytes, bytes | None, int]]):
+        """Enregistre les index aveugles (type, statut, id) de plusieurs entrées en une transaction."""
+        with self.transaction() as cursor:
+            cursor.executemany(SQL_SET_LOG_INDEX, entries)
+
+    def delete_old_logs(self, hours: int):
+        with self.transaction() as cursor:
+            cursor.execute(SQL_DELETE_OLD_LOGS, (f'-{hours} hours',))
+            return cursor.rowcount
 
     def delete_log(self, log_id: int):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM security_logs WHERE id = ?", (log_id,))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM security_logs WHERE id = ?", (log_id,))
 
     def add_account(self, name: str, username: str, encrypted_password: bytes, url: str, notes: str, category: str, importance: int, tags: str) -> int:
+        with self.transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO accounts (name, username, encrypted_password, url, notes, category, importance, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, username, encrypted_password, url, notes, category, importance, tags)
+            )
+            account_id = cursor.lastrowid
+            self._sync_account_tags(cursor, account_id, tags)
+            return account_id
+
+    def add_accounts(self, accounts: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Insère plusieurs comptes (dictionnaires aux clés d'ACCOUNT_FIELDS) en une seule transaction.
+        Retourne les IDs attribués, dans l'ordre d'entrée.
+        """
+        rows = [tuple({**ACCOUNT_DEFAULTS, **account}[field] for field in ACCOUNT_FIELDS) for account in accounts]
+        if not rows:
+            return []
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO accounts (name, username, encrypted_password, url, notes, category, importance, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            # Écrivain unique pendant la transaction : les IDs AUTOINCREMENT sont consécutifs
+            last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+            account_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+            tags_index = ACCOUNT_FIELDS.index("tags")
+            for account_id, row in zip(account_ids, rows):
+                self._sync_account_tags(cursor, account_id, row[tags_index])
+        return account_ids
+
+    def get_all_accounts(self, category: str | None = None) -> List[Dict[str, Any]]:
         cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO accounts (name, username, encrypted_password, url, notes, category, importance, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (name, username, encrypted_password, url, notes, category, importance, tags)
-        )
-        self.conn.commit()
-        return cursor.lastrowid
-
-    def get_all_accounts(self) -> List[Dict[str, Any]]:
-        cursor = self.conn.cursor()
-        # Tri par importance (descendant) puis par nom
-        cursor.execute("SELECT * FROM accounts ORDER BY importance DESC, name ASC")
+        # Tri par importance (descendant) puis par nom, servi par les index (aucun tri en mémoire)
+        if category:
+            cursor.execute(SQL_ACCOUNTS_BY_CATEGORY, (category,))
+        else:
+            cursor.execute(SQL_ALL_ACCOUNTS)
         return [dict(row) for row in cursor.fetchall()]
 
+    def get_account_summaries(self, category: str | None = None, after: tuple | None = None,
+                              limit: int = ACCOUNT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """
+        Une page de la liste des comptes (colonnes d'ACCOUNT_SUMMARY_COLUMNS), triée par
+        importance décroissante puis nom. `after` est la clé (importance, name, id) de la
+        dernière ligne de la page précédente ; None pour la première page.
+        """
+        cursor = self.conn.cursor()
+        prefix = (category,) if category else ()
+        if after is None:
+            sql = SQL_CATEGORY_SUMMARIES_FIRST if category else SQL_ACCOUNT_SUMMARIES_FIRST
+            return [dict(row) for row in cursor.execute(sql, prefix + (limit,))]
+
+        importance, name, account_id = after
+        sql = SQL_CATEGORY_SUMMARIES_SAME_LEVEL if category else SQL_ACCOUNT_SUMMARIES_SAME_LEVEL
+        rows = [dict(row) for row in cursor.execute(sql, prefix + (importance, name, account_id, limit))]
+        if len(rows) < limit:
+            sql = SQL_CATEGORY_SUMMARIES_LOWER_LEVELS if category else SQL_ACCOUNT_SUMMARIES_LOWER_LEVELS
+            rows += [dict(row) for row in cursor.execute(sql, prefix + (importance, limit - len(rows)))]
+        return rows
+
+    def iter_account_summaries(self, category: str | None = None,
+                               page_size: int = ACCOUNT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourt paresseusement la liste des comptes, page par page : une seule page en
+        mémoire, et aucune lecture ne reste ouverte entre deux pages (le WAL peut être recyclé).
+        """
+        after = None
+        while True:
+            page = self.get_account_summaries(category, after, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+            after = (last["importance"], last["name"], last["id"])
+
+    def iter_account_search_fields(self, page_size: int = ACCOUNT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Champs indexés par la recherche approchée, pour tous les comptes, page par page."""
+        after = 0
+        while True:
+            page = [dict(row) for row in self.conn.execute(SQL_ACCOUNT_SEARCH_FIELDS, (after, page_size))]
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]["id"]
+
+    def search_accounts(self, text: str, category: str | None = None,
+                        limit: int = ACCOUNT_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Recherche dans le nom, l'identifiant, l'URL, les notes et les tags. Chaque mot saisi
+        est cherché comme préfixe ; résultats classés par pertinence (bm25) via l'index FTS5.
+        Sans FTS5, repli sur une recherche de sous-chaînes triée comme la liste.
+        """
+        terms = search_terms(text)
+        if not terms:
+            return self.get_account_summaries(category, limit=limit)
+        cursor = self.conn.cursor()
+        prefix = (category,) if category else ()
+        if FTS5_AVAILABLE:
+            sql = SQL_SEARCH_CATEGORY_ACCOUNTS if category else SQL_SEARCH_ACCOUNTS
+            return [dict(row) for row in cursor.execute(sql, (fts_prefix_query(terms),) + prefix + (limit,))]
+
+        sql = SQL_SEARCH_ACCOUNTS_LIKE.format(terms=" AND ".join([_SEARCH_TERM_LIKE] * len(terms)),
+                                              category="AND category = ?" if category else "")
+        params = []
+        for term in terms:
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params += [pattern] * len(FTS_COLUMNS)
+        return [dict(row) for row in cursor.execute(sql, tuple(params) + prefix + (limit,))]
+
+    def get_tag_facets(self) -> List[Dict[str, Any]]:
+        """Tous les tags avec leur nombre de comptes (compteurs tenus à jour, aucun parcours des comptes)."""
+        return [{"name": row['name'], "count": row['account_count']} for row in self.conn.execute(SQL_TAG_FACETS)]
+
+    def find_tags(self, prefix: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Tags commençant par `prefix` (casse ignorée), par ordre alphabétique."""
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return [{"name": row['name'], "count": row['account_count']}
+                for row in self.conn.execute(SQL_TAGS_BY_PREFIX, (pattern, limit))]
+
+    def get_account_ids_with_tags(self, tag_names: Iterable[str]) -> set:
+        """IDs des comptes portant tous les tags donnés (correspondance exacte, casse ignorée)."""
+        result = None
+        for tag in parse_tags(",".join(tag_names)):
+            ids = {row[0] for row in self.conn.execute(SQL_TAG_ACCOUNT_IDS, (tag,))}
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def get_account_summaries_by_ids(self, account_ids: Iterable[int], category: str | None = None) -> List[Dict[str, Any]]:
+        """Colonnes de liste des comptes donnés, dans l'ordre de la liste principale."""
+        account_ids = list(account_ids)
+        rows = []
+        for start in range(0, len(account_ids), SQL_MAX_VARIABLES):
+            chunk = account_ids[start:start + SQL_MAX_VARIABLES]
+            cursor = self.conn.execute(
+                "SELECT id, name, username, category, importance, tags FROM accounts "
+                f"WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            rows += [dict(row) for row in cursor if not category or row['category'] == category]
+        rows.sort(key=account_sort_key)
+        return rows
+
+    def get_account_stats(self) -> Dict[str, int]:
+        """Nombre total de comptes et de comptes critiques (importance 3)."""
+        cursor = self.conn.cursor()
+        total = cursor.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+        critical = cursor.execute("SELECT COUNT(*) FROM accounts WHERE importance = 3").fetchone()[0]
+        return {"total": total, "critical": critical}
+
     def get_account(self, account_id: int) -> Optional[Dict[str, Any]]:
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM accounts WHERE id = ?", (account_id,))
+        cursor.execute(SQL_ACCOUNT_BY_ID, (account_id,))
         row = cursor.fetchone()
         return dict(row) if row else None
 
     def update_account(self, account_id: int, name: str, username: str, encrypted_password: bytes, url: str, notes: str, category: str, importance: int, tags: str):
-        cursor = self.conn.cursor()
-        cursor.execute("""UPDATE accounts SET name=?, username=?, encrypted_password=?, url=?, notes=?, category=?, importance=?, tags=? WHERE id=?""",
-            (name, username, encrypted_password, url, notes, category, importance, tags, account_id))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute("""UPDATE accounts SET name=?, username=?, encrypted_password=?, url=?, notes=?, category=?, importance=?, tags=? WHERE id=?""",
+                (name, username, encrypted_password, url, notes, category, importance, tags, account_id))
+            self._sync_account_tags(cursor, account_id, tags)
+
+    def update_accounts(self, accounts: Iterable[Dict[str, Any]]):
+        """Met à jour plusieurs comptes (dictionnaires avec 'id' et les clés d'ACCOUNT_FIELDS) en une seule transaction."""
+        accounts = list(accounts)
+        rows = [tuple(account[field] for field in ACCOUNT_FIELDS) + (account["id"],) for account in accounts]
+        with self.transaction() as cursor:
+            cursor.executemany("""UPDATE accounts SET name=?, username=?, encrypted_password=?, url=?, notes=?, category=?, importance=?, tags=? WHERE id=?""",
+                rows)
+            for account in accounts:
+                self._sync_account_tags(cursor, account["id"], account["tags"])
 
     def delete_account(self, account_id: int):
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
-        self.conn.commit()
\ No newline at end of file
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM accounts WHERE id = ?", (account_id,))
+
+    def delete_accounts(self, account_ids: Iterable[int]) -> int:
+        with self.transaction() as cursor:
+            cursor.executemany("DELETE FROM accounts WHERE id = ?", ((account_id,) for account_id in account_ids))
+            return cursor.rowcount
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m thanos_app.core.database",
+                                     description="Migration du schéma d'un coffre Thanos.")
+    parser.add_argument("db_file", nargs="?", default=VAULT_DB_FILE, help="base du coffre (défaut : coffre de l'utilisateur)")
+    parser.add_argument("--dry-run", action="store_true", help="exécute les étapes puis les annule (mesure de durée)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db_file):
+        print(f"Base introuvable : {args.db_file}", file=sys.stderr)
+        return 1
+    with DatabaseManager(args.db_file) as db:
+        current = db.schema_version()
+        report = db.migrate_database(dry_run=args.dry_run)
+    if not report:
+        print(f"Schéma à jour (v{current}).")
+    else:
+        print(f"v{current} -> v{report[-1]['version']} en {sum(step['seconds'] for step in report):.3f} s"
+              + (" (simulation, rien n'a été modifié)" if args.dry_run else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -53,4 +53,8 @@ LOG_EVENT_INCORRECT_ATTEMPT = "INCORRECT_ATTEMPT"
 LOG_EVENT_SECURITY_TRIGGER = "SECURITY_TRIGGER"
 LOG_EVENT_PHOTO_CAPTURE = "PHOTO_CAPTURE"
 LOG_EVENT_EMAIL_ALERT = "EMAIL_ALERT"
-LOG_EVENT_LOGIN_SUCCESS = "LOGIN_SUCCESS"
\ No newline at end of file
+LOG_EVENT_LOGIN_SUCCESS = "LOGIN_SUCCESS"
+
+# Événements comptés dans la carte « Alertes Sécurité » du tableau de bord, sur SECURITY_ALERT_DAYS jours
+SECURITY_ALERT_EVENTS = (LOG_EVENT_INCORRECT_ATTEMPT, LOG_EVENT_SECURITY_TRIGGER)
+SECURITY_ALERT_DAYS = 7
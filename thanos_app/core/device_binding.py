@@ -42,3 +42,15 @@ def combine_key_with_device_id(derived_key: bytes, device_id: str) -> bytes:
     combined = derived_key + device_id.encode('utf-8')
     final_key = hashlib.sha256(combined).digest()
     return final_key
+
+def get_hardware_profile() -> dict:
+    """
+    Décrit les ressources de la machine (cœurs, mémoire physique).
+    Sert à détecter un changement de matériel depuis le calibrage Argon2id.
+    """
+    memory_kib = 0
+    try:
+        memory_kib = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 1024
+    except (ValueError, OSError, AttributeError):
+        pass
+    return {"cpu_count": os.cpu_count() or 0, "memory_kib": memory_kib}
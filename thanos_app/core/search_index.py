@@ -0,0 +1,183 @@
+# thanos_app/core/search_index.py
+"""
+Index de trigrammes en mémoire pour la recherche approchée des comptes.
+
+Complète l'index plein texte (préfixes de mots exacts) : une faute de frappe
+(« githbu ») ou un morceau de domaine (« hub.co ») retrouvent le compte. Chaque
+compte est indexé sur le nom, l'identifiant, l'hôte de l'URL et les tags ; la
+similarité est la part des trigrammes de la requête présents dans le compte.
+"""
+import heapq
+import math
+import threading
+from array import array
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import chain
+from operator import itemgetter
+from urllib.parse import urlsplit
+from typing import List, Dict, Any, Iterable
+from .database import fold_search_text, search_terms
+
+TRIGRAM_MIN_SIMILARITY = 0.3
+TRIGRAM_SEARCH_LIMIT = 50
+# Une liste au plus ce nombre de fois plus longue que les candidats est lue (ou intersectée
+# avec eux) ; les trigrammes des listes plus longues sont cherchés dans le texte des candidats
+TRIGRAM_INTERSECT_RATIO = 4
+# Numéros d'entrée sur 32 bits : deux fois moins de mémoire que des entiers 64 bits, et
+# quatre milliards d'ajouts avant épuisement (l'index est reconstruit à chaque ouverture)
+POSTING_TYPECODE = "I"
+
+def url_host(url: str | None) -> str:
+    """Hôte d'une URL, sans « www. » (une saisie sans schéma est acceptée)."""
+    if not url:
+        return ""
+    try:
+        host = urlsplit(url if "//" in url else "//" + url).hostname or ""
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+def normalized_words(text: str) -> str:
+    """Mots normalisés séparés et bordés d'une espace : « GitHub.com » -> « github com »."""
+    return f" {' '.join(search_terms(fold_search_text(text)))} "
+
+def trigrams(words: str) -> set:
+    """Trigrammes d'un texte issu de normalized_words (début et fin de mot compris : « gi», « ub »)."""
+    return {words[i:i + 3] for i in range(len(words) - 2)}
+
+def account_words(account: Dict[str, Any]) -> str:
+    return normalized_words(" ".join((account.get("name") or "", account.get("username") or "",
+                                      url_host(account.get("url")), account.get("tags") or "")))
+
+class AccountSearchIndex:
+    """
+    Listes inversées trigramme -> numéros d'entrée (tableaux compacts), tenues à jour compte
+    par compte. Une entrée retirée reste dans les listes jusqu'à ce qu'elle y soit majoritaire :
+    la liste est alors compactée (retrait en temps constant amorti).
+    Une requête lit ses listes de la plus courte à la plus longue et s'arrête dès qu'aucun
+    compte absent des listes lues ne peut plus atteindre le seuil (`needed` trigrammes) ni
+    dépasser le dernier des `limit` meilleurs candidats. Le résultat est exact.
+    Sûr entre threads : l'index est construit en tâche de fond et mis à jour par l'interface.
+    """
+    def __init__(self):
+        self._postings = defaultdict(partial(array, POSTING_TYPECODE))  # trigramme -> numéros d'entrée
+        self._stale = Counter()  # trigramme -> entrées retirées encore présentes dans sa liste
+        self._entries = {}       # numéro -> (ID du compte, texte normalisé, catégorie)
+        self._entry_of = {}      # ID du compte -> numéro de son entrée
+        self._next_entry = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, account_id: int, account: Dict[str, Any]):
+        """Ajoute ou remplace l'entrée d'un compte (clés name, username, url, tags, category)."""
+        words = account_words(account)
+        with self._lock:
+            self._remove(account_id)
+            entry = self._next_entry
+            self._next_entry += 1
+            self._entries[entry] = (account_id, words, account.get("category"))
+            self._entry_of[account_id] = entry
+            for gram in trigrams(words):
+                self._postings[gram].append(entry)
+
+    def add_many(self, accounts: Iterable[Dict[str, Any]]):
+        """Comptes avec leur clé 'id' (construction initiale, import)."""
+        for account in accounts:
+            self.add(account["id"], account)
+
+    def remove(self, account_id: int):
+        with self._lock:
+            self._remove(account_id)
+
+    def _remove(self, account_id: int):
+        entry = self._entry_of.pop(account_id, None)
+        if entry is None:
+            return
+        _, words, _ = self._entries.pop(entry)
+        for gram in trigrams(words):
+            posting = self._postings[gram]
+            stale = self._stale[gram] + 1
+            if stale * 2 < len(posting):
+                self._stale[gram] = stale
+                continue
+            del self._stale[gram]
+            live = array(POSTING_TYPECODE, (e for e in posting if e in self._entries))
+            if live:
+                self._postings[gram] = live
+            else:
+                del self._postings[gram]
+
+    def search(self, text: str, category: str | None = None, limit: int = TRIGRAM_SEARCH_LIMIT,
+               min_similarity: float = TRIGRAM_MIN_SIMILARITY) -> List[tuple[int, float]]:
+        """(ID, similarité) des comptes les plus proches, du plus au moins similaire."""
+        query = trigrams(normalized_words(text))
+        if not query:
+            return []
+        needed = max(1, math.ceil(min_similarity * len(query)))
+        with self._lock:
+            grams = sorted(query, key=lambda gram: len(self._postings.get(gram, ())))
+            counts = Counter()
+            for probed, gram in enumerate(grams, 1):
+                counts.update(self._postings.get(gram, ()))
+                # Un compte absent des listes déjà lues partage au plus `unseen` trigrammes
+                unseen = len(grams) - probed
+                last = unseen < needed
+                if not last and len(self._postings.get(grams[probed], ())) <= TRIGRAM_INTERSECT_RATIO * len(counts):
+                    continue  # Lire la liste suivante coûte moins que noter les candidats
+                # Pour s'arrêter ici, il faut `limit` comptes partageant plus de `unseen` trigrammes :
+                # les autres candidats ne sont examinés qu'à la dernière liste
+                top = self._score(counts, grams[probed:], max(needed, unseen + 1), category, limit)
+                if last or (len(top) == limit and -top[-1][0] > unseen):
+                    break
+        return [(account_id, -negative_shared / len(query)) for negative_shared, _, account_id in top]
+
+    def _score(self, counts: Counter, unread: List[str], minimum: int, category: str | None,
+               limit: int) -> List[tuple]:
+        """
+        Les `limit` meilleurs candidats partageant au moins `minimum` trigrammes, du meilleur au
+        moins bon. Les listes non lues courtes sont intersectées avec les candidats ; les trigrammes
+        des plus longues sont cherchés dans le texte des candidats, examinés par décompte
+        décroissant : on s'arrête dès que le décompte plus les trigrammes cherchés ne peut plus
+        atteindre `minimum` ni égaler le dernier des `limit` retenus.
+        """
+        counts, candidates, searched = counts.copy(), None, []
+        for gram in unread:
+            posting = self._postings.get(gram, ())
+            if len(posting) <= TRIGRAM_INTERSECT_RATIO * len(counts):
+                candidates = candidates or set(counts)
+                counts.update(candidates.intersection(posting))
+            else:
+                searched.append(gram)
+        top = []  # Tas des retenus, le moins bon en tête : (partagés, -longueur, -ID)
+        entries, extra, contains = self._entries, len(searched), str.__contains__
+        # La plupart des candidats n'ont qu'un trigramme en commun : seuls les autres sont triés
+        ranked = chain(sorted([item for item in counts.items() if item[1] > 1], key=itemgetter(1), reverse=True),
+                       (item for item in counts.items() if item[1] == 1))
+        for entry, shared in ranked:
+            best_case = shared + extra
+            if best_case < minimum:
+                break
+            found = entries.get(entry)  # None : entrée retirée, pas encore compactée
+            if not found or (category and found[2] != category):
+                continue
+            words = found[1]
+            if len(top) == limit:
+                worst = top[0]
+                if best_case < worst[0]:
+                    break
+                if best_case == worst[0] and -len(words) < worst[1]:
+                    continue  # Au mieux à égalité, et plus long que le dernier retenu
+            # Les trigrammes d'un compte sont exactement les sous-chaînes de 3 caractères de son texte
+            if extra:
+                shared += sum([contains(words, gram) for gram in searched])
+            if shared >= minimum:
+                # À similarité égale, le compte le plus court (le plus spécifique) d'abord
+                hit = (shared, -len(words), -found[0])
+                if len(top) < limit:
+                    heapq.heappush(top, hit)
+                elif hit > top[0]:
+                    heapq.heapreplace(top, hit)
+        return [(-shared, -length, -account_id) for shared, length, account_id in sorted(top, reverse=True)]
@@ -4,18 +4,27 @@ import datetime
 import json
 import smtplib
 import io
+import time
+import struct
+import queue
+import atexit
+import threading
 from email.mime.text import MIMEText
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
 
 try:
     import cv2
+    import numpy
     _CAMERA_AVAILABLE = True
 except ImportError:
     _CAMERA_AVAILABLE = False
     print("Warning: 'opencv-python' not found. Security camera capture will be disabled.")
 
-from thanos_app.core.crypto import encrypt_data, decrypt_data, encrypt_binary, decrypt_binary
-from thanos_app.core.database import DatabaseManager
+from thanos_app.core.crypto import (
+    CipherContext, decrypt_blob, encrypt_stream, derive_subkey, blind_index, content_address,
+    SUBKEY_LOGS, SUBKEY_PHOTOS, SUBKEY_LOG_INDEX, SUBKEY_PHOTO_INDEX
+)
+from thanos_app.core.database import DatabaseManager, LOG_PAGE_SIZE
 from thanos_app.core.definitions import (
     LOG_EVENT_INCORRECT_ATTEMPT, LOG_EVENT_SECURITY_TRIGGER,
     LOG_EVENT_PHOTO_CAPTURE, LOG_EVENT_EMAIL_ALERT
@@ -23,65 +32,329 @@ from thanos_app.core.definitions import (
 from thanos_app.core.device_binding import get_device_id
 import config
 
+# Group commit of security events: at most this many events per transaction,
+# and no event waits longer than the interval for companions.
+LOG_WRITER_BATCH_SIZE = 64
+LOG_WRITER_FLUSH_INTERVAL = 0.2  # seconds
+# A batch whose commit fails (e.g. database locked) is retried, then held back and
+# prepended to the next batch; beyond the bound, the oldest held events are dropped.
+LOG_WRITER_MAX_ATTEMPTS = 3
+LOG_WRITER_RETRY_DELAY = 0.05  # seconds, doubled after each failed attempt
+LOG_WRITER_MAX_HELD = 1024
+
+# Event type reported for entries that cannot be decrypted with the vault key
+LOG_EVENT_UNREADABLE = "ENCRYPTED/UNREADABLE"
+
+def _sql_timestamp(moment: datetime.datetime) -> str:
+    """UTC, in the format of SQLite's CURRENT_TIMESTAMP (used by the retention purge)."""
+    return moment.astimezone(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+# Photo store: each capture is named after a keyed hash of its content and stored as
+# <address>.enc (the full JPEG) next to <address>.thumb.enc, a small record made once at
+# save time: u32 metadata length | JSON metadata | thumbnail JPEG. Both use the versioned
+# segmented stream format; thumbnails written as a single AES-GCM message are still read.
+PHOTO_THUMBNAIL_SUFFIX = ".thumb.enc"
+PHOTO_THUMBNAIL_MAX_PX = 128
+PHOTO_THUMBNAIL_JPEG_QUALITY = 80
+
+def _make_thumbnail(image_data: bytes) -> tuple[bytes, int, int] | None:
+    """Downscaled JPEG of an image, with the original's width and height (None without OpenCV)."""
+    if not _CAMERA_AVAILABLE:
+        return None
+    try:
+        frame = cv2.imdecode(numpy.frombuffer(image_data, numpy.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        height, width = frame.shape[:2]
+        scale = min(1.0, PHOTO_THUMBNAIL_MAX_PX / max(width, height))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, PHOTO_THUMBNAIL_JPEG_QUALITY])
+    except cv2.error as e:
+        print(f"Error creating photo thumbnail: {e}")
+        return None
+    return (buffer.tobytes(), width, height) if success else None
+
+def _write_atomically(path: str, write):
+    with open(f"{path}.tmp", 'wb') as f:
+        write(f)
+    os.replace(f"{path}.tmp", path)
+
+def _log_index_tags(index_key: bytes, entry: Dict[str, Any]) -> tuple[bytes, bytes | None]:
+    """Blind index of an event's type and, when it has one, of its status."""
+    details = entry.get("details")
+    status = details.get("status") if isinstance(details, dict) else None
+    return (blind_index(index_key, str(entry.get("event_type"))),
+            blind_index(index_key, status) if isinstance(status, str) else None)
+
+class SecurityLogWriter:
+    """
+    Background writer for the security journal. Callers only enqueue events; one
+    thread encrypts and commits them in groups, a single transaction per batch,
+    as soon as LOG_WRITER_BATCH_SIZE events are waiting or the oldest one has
+    waited LOG_WRITER_FLUSH_INTERVAL. The thread starts with the first event.
+    Events that could not be committed are reported by flush() and close(), with
+    the cause in `last_error`.
+    """
+    _STOP = object()
+
+    def __init__(self, db_manager: DatabaseManager, log_key: bytes, index_key: bytes,
+                 batch_size: int = LOG_WRITER_BATCH_SIZE, flush_interval: float = LOG_WRITER_FLUSH_INTERVAL):
+        self.db = db_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cipher = CipherContext(log_key)
+        self._index_key = index_key
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._held = []  # Encrypted rows whose commit failed, retried with the next batch
+        self._dropped = 0  # Events lost since the last report (encryption failure, held overflow)
+        self.last_error = None
+
+    def submit(self, entry: Dict[str, Any], timestamp: str):
+        """Queues one event (never blocks). After close(), writes it synchronously instead."""
+        with self._lock:
+            if not self._closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="thanos-log-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+                self._queue.put((entry, timestamp))
+                return
+        self._write([(entry, timestamp)])
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every event queued so far is written. Returns False on timeout, or if
+        some events could not be committed since the previous report (still held back for
+        a retry, or dropped).
+        """
+        with self._lock:
+            if self._thread is None or self._closed:
+                return self._report()
+            done = threading.Event()
+            self._queue.put(done)
+        return done.wait(timeout) and self._report()
+
+    def close(self) -> bool:
+        """Commits the pending events and stops the thread. Returns False as flush() does."""
+        with self._lock:
+            if self._closed:
+                return self._report()
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(self._STOP)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        return self._report()
+
+    def _report(self) -> bool:
+        with self._write_lock:
+            ok = not self._held and not self._dropped
+            self._dropped = 0
+            return ok
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                batch, flushed, stop = [], [], False
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is self._STOP:
+                        stop = True
+                        break
+                    if isinstance(item, threading.Event):
+                        flushed.append(item)  # Explicit flush: commit what we have now
+                        break
+                    batch.append(item)
+                    remaining = deadline - time.monotonic()
+                    if len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                self._write(batch)
+                for done in flushed:
+                    done.set()
+                if stop:
+                    return
+        finally:
+            self.db.release()
+
+    def _write(self, batch: list):
+        with self._write_lock:
+            encrypted = self._cipher.encrypt_many(json.dumps(entry) for entry, _ in batch)
+            rows = self._held
+            for (entry, timestamp), (blob, error) in zip(batch, encrypted):
+                if error is None:
+                    rows.append((blob, timestamp) + _log_index_tags(self._index_key, entry))
+                else:
+                    self._dropped += 1
+                    self.last_error = error
+            self._held = []
+            if not rows:
+                return
+            for attempt in range(LOG_WRITER_MAX_ATTEMPTS):
+                if attempt:
+                    time.sleep(LOG_WRITER_RETRY_DELAY * 2 ** (attempt - 1))
+                try:
+                    self.db.add_log_entries(rows)
+                    return
+                except Exception as e:
+                    self.last_error = e
+            self._held = rows[-LOG_WRITER_MAX_HELD:]
+            self._dropped += len(rows) - len(self._held)
+
 class SecurityManager:
     def __init__(self, db_manager: DatabaseManager, vault_key: bytes):
         self.db = db_manager
         self.vault_key = vault_key
+        # Sous-clés dédiées dérivées de la clé de données du coffre
+        self.log_key = derive_subkey(vault_key, SUBKEY_LOGS)
+        self.photo_key = derive_subkey(vault_key, SUBKEY_PHOTOS)
+        self.log_index_key = derive_subkey(vault_key, SUBKEY_LOG_INDEX)
+        self.photo_index_key = derive_subkey(vault_key, SUBKEY_PHOTO_INDEX)
         os.makedirs(config.SECURITY_PHOTO_DIR, exist_ok=True)
         self.db.create_logs_table() # Ensure logs table exists
+        self._log_writer = SecurityLogWriter(self.db, self.log_key, self.log_index_key)
+        self._log_cipher = CipherContext(self.log_key)
 
     def is_camera_available(self) -> bool:
         return _CAMERA_AVAILABLE
 
-    def _encrypt_log_entry(self, log_data: Dict[str, Any]) -> bytes:
-        """Encrypts a log entry dictionary into bytes."""
-        json_data = json.dumps(log_data)
-        return encrypt_data(self.vault_key, json_data)
-
     def log_event(self, event_type: str, details: Dict[str, Any]):
         """
         Logs a security event to the encrypted local journal.
         Details should not contain sensitive information in plaintext.
+        The event is committed in the background (see SecurityLogWriter).
         """
-        log_entry = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "event_type": event_type,
-            "details": details
-        }
-        encrypted_data = self._encrypt_log_entry(log_entry)
-        self.db.add_log_entry(encrypted_data)
+        now = datetime.datetime.now()
+        self._log_writer.submit({"timestamp": now.isoformat(), "event_type": event_type, "details": details},
+                                _sql_timestamp(now))
         print(f"Security event logged: {event_type}")
 
-    def get_decrypted_logs(self) -> list[Dict[str, Any]]:
-        raw_logs = self.db.get_all_logs()
-        decrypted_logs = []
-        for log in raw_logs:
-            try:
-                encrypted_data = log['encrypted_log_data']
-                json_data = decrypt_data(self.vault_key, encrypted_data)
-                entry = json.loads(json_data)
-                # Add ID for reference
-                entry['id'] = log['id']
-                decrypted_logs.append(entry)
-            except Exception as e:
-                # Log corrupted or undecryptable (e.g. from previous session with different key/random key)
-                decrypted_logs.append({
-                    "id": log['id'],
-                    "timestamp": log['timestamp'],
-                    "event_type": "ENCRYPTED/UNREADABLE",
-                    "details": {"error": "Impossible de déchiffrer cet événement."}
-                })
-        return decrypted_logs
+    def log_events(self, events: list[tuple[str, Dict[str, Any]]]):
+        """Logs several (event_type, details) pairs; they are committed together."""
+        if not events:
+            return
+        now = datetime.datetime.now()
+        for event_type, details in events:
+            self._log_writer.submit({"timestamp": now.isoformat(), "event_type": event_type, "details": details},
+                                    _sql_timestamp(now))
+        print(f"Security events logged: {len(events)}")
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until the events logged so far are committed. False if some could not be (see log_error)."""
+        return self._log_writer.flush(timeout)
+
+    def close(self) -> bool:
+        """Commits pending events and stops the background writer. False as for flush()."""
+        return self._log_writer.close()
+
+    @property
+    def log_error(self) -> Exception | None:
+        """Cause of the last failure to write security events."""
+        return self._log_writer.last_error
+
+    def iter_decrypted_logs(self, since: datetime.datetime | None = None, until: datetime.datetime | None = None,
+                            page_size: int = LOG_PAGE_SIZE, event_type: str | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the journal newest first, reading it page by page. Only the rows actually
+        consumed are decrypted. `since` (inclusive) and `until` (exclusive) bound the
+        period and `event_type` restricts it to one type; both are applied in SQL
+        (plaintext timestamp, blind index of the type).
+        """
+        self.flush()
+        type_hmac = blind_index(self.log_index_key, event_type) if event_type else None
+        rows = self.db.iter_logs(_sql_timestamp(since) if since else None,
+                                 _sql_timestamp(until) if until else None, page_size, type_hmac)
+        for log in rows:
+            yield self._decrypt_log_entry(log)
+
+    def get_decrypted_logs(self, since: datetime.datetime | None = None, until: datetime.datetime | None = None,
+                           event_type: str | None = None) -> list[Dict[str, Any]]:
+        return list(self.iter_decrypted_logs(since, until, event_type=event_type))
+
+    def count_events(self, event_types: list[str], since: datetime.datetime | None = None,
+                     until: datetime.datetime | None = None, status: str | None = None) -> int:
+        """Counts events of the given types (and status) in SQL, through their blind index."""
+        self.flush()
+        return self.db.count_logs([blind_index(self.log_index_key, event_type) for event_type in event_types],
+                                  _sql_timestamp(since) if since else None,
+                                  _sql_timestamp(until) if until else None,
+                                  blind_index(self.log_index_key, status) if status is not None else None)
+
+    def index_logs(self, batch_size: int = LOG_PAGE_SIZE) -> int:
+        """
+        Computes the blind index of entries written before it existed. Must run with the
+        real vault key: entries it cannot decrypt are indexed as LOG_EVENT_UNREADABLE.
+        Returns the number of entries indexed; a no-op once the journal is indexed.
+        """
+        self.flush()
+        unreadable = (blind_index(self.log_index_key, LOG_EVENT_UNREADABLE), None)
+        count = 0
+        while True:
+            # Every row read leaves the unindexed set (unreadable ones included): no cursor to keep
+            rows = self.db.get_unindexed_logs(batch_size)
+            if not rows:
+                return count
+            updates = []
+            for log in rows:
+                try:
+                    tags = _log_index_tags(self.log_index_key,
+                                           json.loads(self._log_cipher.decrypt(log['encrypted_log_data'])))
+                except (ValueError, AttributeError):
+                    tags = unreadable
+                updates.append(tags + (log['id'],))
+            self.db.set_log_indexes(updates)
+            count += len(rows)
+
+    def _decrypt_log_entry(self, log: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            entry = json.loads(self._log_cipher.decrypt(log['encrypted_log_data']))
+        except ValueError:
+            # Log corrupted or undecryptable (e.g. from previous session with different key/random key)
+            return {
+                "id": log['id'],
+                "timestamp": log['timestamp'],
+                "event_type": LOG_EVENT_UNREADABLE,
+                "details": {"error": "Impossible de déchiffrer cet événement."}
+            }
+        # Add ID for reference
+        entry['id'] = log['id']
+        return entry
 
     def get_decrypted_photo(self, filename: str) -> bytes:
         path = os.path.join(config.SECURITY_PHOTO_DIR, filename)
         if not os.path.exists(path):
             raise FileNotFoundError("Fichier photo introuvable.")
         with open(path, 'rb') as f:
-            return decrypt_binary(self.vault_key, f.read())
+            data = f.read()
+        return decrypt_blob(self.photo_key, data)
+
+    def get_photo_thumbnail(self, filename: str) -> tuple[bytes, Dict[str, Any]] | None:
+        """
+        Thumbnail JPEG and metadata (size, width, height, captured_at) of a stored photo,
+        without touching the full image. None for photos saved before thumbnails existed.
+        """
+        path = os.path.join(config.SECURITY_PHOTO_DIR, filename.removesuffix(".enc") + PHOTO_THUMBNAIL_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            record = decrypt_blob(self.photo_key, f.read())
+        (meta_len,) = struct.unpack(">I", record[:4])
+        return record[4 + meta_len:], json.loads(record[4:4 + meta_len])
 
     def cleanup_old_logs(self, hours: int = 24) -> int:
         """Deletes logs older than the specified number of hours."""
+        self.flush()
         count = self.db.delete_old_logs(hours)
         print(f"Cleaned up {count} old log entries.")
         return count
@@ -113,16 +386,28 @@ class SecurityManager:
             print(f"Error capturing webcam: {e}")
             return None
 
-    def save_encrypted_photo(self, raw_image_data: bytes) -> str:
-        """Encrypts and saves raw image bytes, returns filename."""
+    def save_encrypted_photo(self, raw_image_data: bytes, captured_at: datetime.datetime | None = None) -> str:
+        """
+        Encrypts and stores raw image bytes with their thumbnail, returns the filename.
+        The name is a keyed hash of the content: saving the same image twice stores it once.
+        """
         try:
-            encrypted_image_data = encrypt_binary(self.vault_key, raw_image_data)
-            
-            photo_filename = f"security_photo_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.enc"
+            address = content_address(self.photo_index_key, raw_image_data)
+            photo_filename = f"{address}.enc"
             photo_path = os.path.join(config.SECURITY_PHOTO_DIR, photo_filename)
-            
-            with open(photo_path, 'wb') as f:
-                f.write(encrypted_image_data)
+            if not os.path.exists(photo_path):
+                _write_atomically(photo_path, lambda f: encrypt_stream(self.photo_key, io.BytesIO(raw_image_data), f))
+
+            thumb_path = os.path.join(config.SECURITY_PHOTO_DIR, address + PHOTO_THUMBNAIL_SUFFIX)
+            thumbnail = None if os.path.exists(thumb_path) else _make_thumbnail(raw_image_data)
+            if thumbnail:
+                thumb_data, width, height = thumbnail
+                metadata = json.dumps({
+                    "size": len(raw_image_data), "width": width, "height": height,
+                    "captured_at": (captured_at or datetime.datetime.now()).isoformat(timespec="seconds"),
+                }).encode('utf-8')
+                record = struct.pack(">I", len(metadata)) + metadata + thumb_data
+                _write_atomically(thumb_path, lambda f: encrypt_stream(self.photo_key, io.BytesIO(record), f))
             
             print(f"Security photo saved: {photo_path}")
             return photo_filename
@@ -0,0 +1,307 @@
+# thanos_app/core/unlock_agent.py
+"""
+Agent de déverrouillage local (optionnel), sur le modèle de ssh-agent.
+
+Le processus agent conserve la clé de données du coffre en mémoire verrouillée
+(mlock, exclue des core dumps) tant qu'elle sert : chaque lecture repousse
+l'échéance d'inactivité. Rouvrir l'interface ou lancer un outil pendant ce
+délai évite entièrement la dérivation Argon2id.
+
+Protocole : une requête JSON par connexion, sur une socket Unix (0600, dans
+le dossier 0700 de l'application). Les deux côtés vérifient par SO_PEERCRED
+que le pair appartient au même utilisateur. Les clés sont indexées par leur
+identifiant public (crypto.key_identifier), jamais par un chemin.
+
+Usage : python -m thanos_app.core.unlock_agent [serve|status|lock|flush|stop]
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import base64
+import select
+import socket
+import struct
+import ctypes
+import ctypes.util
+import argparse
+import subprocess
+import config
+
+AGENT_TIMEOUT_SECONDS = 2.0
+AGENT_START_TIMEOUT_SECONDS = 3.0
+AGENT_MAX_MESSAGE_BYTES = 4096
+PR_SET_DUMPABLE = 4
+
+class AgentError(Exception):
+    """Erreur renvoyée par l'agent ou agent injoignable."""
+
+def is_supported() -> bool:
+    """L'agent requiert les sockets Unix et SO_PEERCRED (Linux)."""
+    return hasattr(socket, "AF_UNIX") and hasattr(socket, "SO_PEERCRED")
+
+def _libc():
+    try:
+        return ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return None
+
+class _LockedKey:
+    """Clé conservée dans une page anonyme verrouillée en mémoire, effacée à la suppression."""
+    def __init__(self, key: bytes):
+        self._size = len(key)
+        self._buf = mmap.mmap(-1, mmap.PAGESIZE)
+        self._ptr = ctypes.c_char.from_buffer(self._buf)
+        self.locked = False
+        libc = _libc()
+        if libc is not None:
+            self.locked = libc.mlock(ctypes.addressof(self._ptr), ctypes.c_size_t(mmap.PAGESIZE)) == 0
+        if hasattr(mmap, "MADV_DONTDUMP"):
+            try:
+                self._buf.madvise(mmap.MADV_DONTDUMP)
+            except OSError:
+                pass
+        self._buf[:self._size] = key
+
+    def get(self) -> bytes:
+        return self._buf[:self._size]
+
+    def wipe(self):
+        self._buf[:] = bytes(mmap.PAGESIZE)
+        if self.locked:
+            _libc().munlock(ctypes.addressof(self._ptr), ctypes.c_size_t(mmap.PAGESIZE))
+        del self._ptr
+        self._buf.close()
+
+def _peer_uid(conn: socket.socket) -> int:
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+def _recv_message(conn: socket.socket) -> dict:
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(AGENT_MAX_MESSAGE_BYTES)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > AGENT_MAX_MESSAGE_BYTES:
+            raise AgentError("Message trop long.")
+    return json.loads(data or b"{}")
+
+def _send_message(conn: socket.socket, message: dict):
+    conn.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+# --- Serveur ---
+
+class UnlockAgent:
+    def __init__(self, socket_path: str, default_ttl: int):
+        self.socket_path = socket_path
+        self.default_ttl = default_ttl
+        self._keys = {}  # key_id -> {"key": _LockedKey, "ttl": secondes, "expires": horloge monotone}
+        self._running = False
+
+    def _forget(self, key_id: str):
+        entry = self._keys.pop(key_id, None)
+        if entry:
+            entry["key"].wipe()
+
+    def _forget_all(self):
+        for key_id in list(self._keys):
+            self._forget(key_id)
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        for key_id in [k for k, entry in self._keys.items() if entry["expires"] <= now]:
+            self._forget(key_id)
+
+    def _next_timeout(self) -> float | None:
+        if not self._keys:
+            return None
+        return max(0.0, min(entry["expires"] for entry in self._keys.values()) - time.monotonic())
+
+    def handle(self, request: dict) -> dict:
+        command = request.get("command")
+        key_id = request.get("key_id")
+        if command == "add":
+            ttl = int(request.get("ttl") or self.default_ttl)
+            self._forget(key_id)
+            self._keys[key_id] = {"key": _LockedKey(base64.b64decode(request["key"])),
+                                  "ttl": ttl, "expires": time.monotonic() + ttl}
+            return {"ok": True}
+        if command == "get":
+            entry = self._keys.get(key_id)
+            if not entry:
+                return {"ok": False, "error": "LOCKED"}
+            entry["expires"] = time.monotonic() + entry["ttl"]
+            return {"ok": True, "key": base64.b64encode(entry["key"].get()).decode("ascii")}
+        if command == "lock":
+            self._forget(key_id)
+            return {"ok": True}
+        if command == "flush":
+            self._forget_all()
+            return {"ok": True}
+        if command == "stop":
+            self._forget_all()
+            self._running = False
+            return {"ok": True}
+        if command == "status":
+            return {"ok": True, "pid": os.getpid(), "keys": len(self._keys),
+                    "memory_locked": all(entry["key"].locked for entry in self._keys.values())}
+        return {"ok": False, "error": f"Commande inconnue : {command}"}
+
+    def _bind(self) -> socket.socket:
+        directory = os.path.dirname(self.socket_path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        if os.path.exists(self.socket_path):
+            if is_running(self.socket_path):
+                raise AgentError("Un agent est déjà actif.")
+            os.remove(self.socket_path)  # Socket orpheline d'un agent arrêté brutalement
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(8)
+        return server
+
+    def serve(self):
+        libc = _libc()
+        if libc is not None:
+            libc.prctl(PR_SET_DUMPABLE, 0, 0, 0, 0)  # Ni core dump ni ptrace par un autre processus
+
+        server = self._bind()
+        self._running = True
+        try:
+            while self._running:
+                readable, _, _ = select.select([server], [], [], self._next_timeout())
+                self._purge_expired()
+                if not readable:
+                    continue
+                conn, _ = server.accept()
+                with conn:
+                    conn.settimeout(AGENT_TIMEOUT_SECONDS)
+                    try:
+                        if _peer_uid(conn) != os.getuid():
+                            _send_message(conn, {"ok": False, "error": "Accès refusé."})
+                            continue
+                        _send_message(conn, self.handle(_recv_message(conn)))
+                    except (OSError, ValueError, KeyError, AgentError) as e:
+                        try:
+                            _send_message(conn, {"ok": False, "error": str(e)})
+                        except OSError:
+                            pass
+        finally:
+            self._forget_all()
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+# --- Client ---
+
+def _request(message: dict, socket_path: str | None = None) -> dict:
+    """Envoie une requête à l'agent. Lève OSError si l'agent est injoignable."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(AGENT_TIMEOUT_SECONDS)
+        conn.connect(socket_path or config.UNLOCK_AGENT_SOCKET)
+        # La clé ne doit jamais être confiée à un processus d'un autre utilisateur
+        if _peer_uid(conn) != os.getuid():
+            raise AgentError("L'agent n'appartient pas à l'utilisateur courant.")
+        _send_message(conn, message)
+        return _recv_message(conn)
+
+def is_running(socket_path: str | None = None) -> bool:
+    try:
+        return _request({"command": "status"}, socket_path).get("ok", False)
+    except (OSError, ValueError, AgentError):
+        return False
+
+def start_agent(ttl: int | None = None) -> bool:
+    """Démarre l'agent en arrière-plan s'il ne tourne pas déjà."""
+    if not is_supported():
+        return False
+    if is_running():
+        return True
+    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.Popen(
+        [sys.executable, "-m", "thanos_app.core.unlock_agent", "serve",
+         "--ttl", str(ttl or config.UNLOCK_AGENT_TTL_SECONDS)],
+        cwd=root_dir, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    deadline = time.monotonic() + AGENT_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if is_running():
+            return True
+        time.sleep(0.05)
+    return False
+
+def store_key(key_id: str, key: bytes, ttl: int | None = None):
+    response = _request({"command": "add", "key_id": key_id, "key": base64.b64encode(key).decode("ascii"),
+                         "ttl": ttl or config.UNLOCK_AGENT_TTL_SECONDS})
+    if not response.get("ok"):
+        raise AgentError(response.get("error", "Erreur de l'agent."))
+
+def fetch_key(key_id: str) -> bytes | None:
+    """Retourne la clé en cache, ou None si l'agent est absent ou la clé expirée."""
+    try:
+        response = _request({"command": "get", "key_id": key_id})
+    except (OSError, ValueError, AgentError):
+        return None
+    return base64.b64decode(response["key"]) if response.get("ok") else None
+
+def lock(key_id: str):
+    """Oublie la clé d'un coffre (sans effet si l'agent ne tourne pas)."""
+    try:
+        _request({"command": "lock", "key_id": key_id})
+    except (OSError, ValueError, AgentError):
+        pass
+
+def flush():
+    try:
+        _request({"command": "flush"})
+    except (OSError, ValueError, AgentError):
+        pass
+
+def stop():
+    try:
+        _request({"command": "stop"})
+    except (OSError, ValueError, AgentError):
+        pass
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m thanos_app.core.unlock_agent",
+                                     description="Agent de déverrouillage Thanos.")
+    parser.add_argument("command", choices=["serve", "status", "lock", "flush", "stop"])
+    parser.add_argument("--ttl", type=int, default=config.UNLOCK_AGENT_TTL_SECONDS,
+                        help="délai d'inactivité avant oubli d'une clé, en secondes (serve)")
+    parser.add_argument("--key-id", help="identifiant de la clé à oublier (lock ; toutes si absent)")
+    args = parser.parse_args(argv)
+
+    if not is_supported():
+        print("Agent non supporté sur ce système.", file=sys.stderr)
+        return 2
+    if args.command == "serve":
+        UnlockAgent(config.UNLOCK_AGENT_SOCKET, args.ttl).serve()
+        return 0
+    if args.command == "status":
+        try:
+            print(json.dumps(_request({"command": "status"})))
+        except OSError:
+            print("Agent inactif.")
+            return 1
+        return 0
+    if args.command == "lock" and args.key_id:
+        lock(args.key_id)
+    elif args.command in ("lock", "flush"):
+        flush()
+    else:
+        stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
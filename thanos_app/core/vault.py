@@ -1,26 +1,141 @@
 # thanos_app/core/vault.py
 import os
-from typing import List, Dict, Any
+import io
+import hmac
+import json
+import struct
+import sqlite3
+import threading
+from typing import List, Dict, Any, Callable, Optional, Iterator
 from . import crypto
 from . import device_binding
-from .database import DatabaseManager
+from . import unlock_agent
+from .database import DatabaseManager, remove_wal_files, ACCOUNT_PAGE_SIZE, ACCOUNT_DEFAULTS
+from .search_index import AccountSearchIndex, TRIGRAM_SEARCH_LIMIT
+import config
+
+# Format 2 : le mot de passe est vérifié par le déchiffrement de key_check (plus de bcrypt)
+# Format 3 : clé de données aléatoire (DEK) enveloppée par la clé dérivée du mot de passe ;
+#            son déballage authentifié vérifie le mot de passe et remplace key_check.
+# Format 4 : la KEK ne dépend plus que du mot de passe ; l'enveloppe de la DEK utilise
+#            une clé liée à l'appareil dérivée de la KEK (HKDF). Migrer = ré-envelopper.
+VAULT_FORMAT_VERSION = 4
+KEY_CHECK_PLAINTEXT = b"thanos-key-check"
+
+# En-tête des sauvegardes : MAGIC | version | longueur des paramètres KDF | paramètres (JSON) | sel
+# Version 1 : contenu chiffré en un seul bloc ; version 2 : flux segmenté (crypto.encrypt_stream)
+BACKUP_MAGIC = b"THNSBAK"
+BACKUP_FORMAT_VERSION = 2
 
 class Vault:
-    def __init__(self, db_manager: DatabaseManager, final_key: bytes):
+    def __init__(self, db_manager: DatabaseManager, data_key: bytes):
         self.db = db_manager
-        self.key = final_key
+        # Clé de données du coffre (DEK) ; chaque usage dispose de sa sous-clé
+        self.key = data_key
+        self.accounts_key = crypto.derive_subkey(data_key, crypto.SUBKEY_ACCOUNTS)
+        self.key_id = crypto.key_identifier(data_key)
+        self._search_index = None  # Recherche approchée, construite par build_search_index()
+        self._search_index_pending = None  # Mises à jour reçues pendant la construction
+        self._search_index_lock = threading.Lock()
 
     def add_account(self, name: str, password: str, username: str = "", url: str = "", notes: str = "", category: str = "Autre", importance: int = 1, tags: str = "") -> int:
         if not name or not password:
             raise ValueError("Le nom du compte et le mot de passe ne peuvent pas être vides.")
         
-        encrypted_password = crypto.encrypt_data(self.key, password)
+        encrypted_password = crypto.encrypt_data(self.accounts_key, password)
         account_id = self.db.add_account(name, username, encrypted_password, url, notes, category, importance, tags)
+        self._update_search_index([{"id": account_id, "name": name, "username": username, "url": url,
+                                    "category": category, "tags": tags}])
         print(f"Compte '{name}' ajouté avec l'ID {account_id}.")
         return account_id
 
-    def get_all_accounts(self) -> List[Dict[str, Any]]:
-        return self.db.get_all_accounts()
+    def get_all_accounts(self, category: str | None = None) -> List[Dict[str, Any]]:
+        return self.db.get_all_accounts(category)
+
+    def get_account_summaries(self, category: str | None = None, after: tuple | None = None,
+                              limit: int = ACCOUNT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        return self.db.get_account_summaries(category, after, limit)
+
+    def iter_account_summaries(self, category: str | None = None,
+                               page_size: int = ACCOUNT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """Liste des comptes sans données secrètes, chargée page par page."""
+        return self.db.iter_account_summaries(category, page_size)
+
+    def search_accounts(self, text: str, category: str | None = None) -> List[Dict[str, Any]]:
+        """Recherche plein texte dans les métadonnées des comptes, classée par pertinence."""
+        return self.db.search_accounts(text, category)
+
+    def build_search_index(self) -> AccountSearchIndex | None:
+        """
+        Index de recherche approchée (trigrammes), construit une fois par ouverture du coffre ;
+        l'interface le lance en tâche de fond. Aucun verrou n'est tenu pendant la lecture des
+        comptes : les écritures faites entre-temps sont mises en file puis rejouées sur l'index.
+        Retourne None si une autre construction est déjà en cours.
+        """
+        with self._search_index_lock:
+            if self._search_index is not None:
+                return self._search_index
+            if self._search_index_pending is not None:
+                return None
+            pending = self._search_index_pending = []
+        index = AccountSearchIndex()
+        index.add_many(self.db.iter_account_search_fields())
+        with self._search_index_lock:
+            if self._search_index_pending is not pending:
+                return None  # Coffre fermé pendant la construction
+            for accounts, removed_ids in pending:
+                self._apply_search_index_update(index, accounts, removed_ids)
+            self._search_index, self._search_index_pending = index, None
+            return index
+
+    def _update_search_index(self, accounts: List[Dict[str, Any]] = (), removed_ids: List[int] = ()):
+        """Après écriture en base. Index pas encore construit : il lira l'état à jour de la base."""
+        with self._search_index_lock:
+            if self._search_index is not None:
+                self._apply_search_index_update(self._search_index, accounts, removed_ids)
+            elif self._search_index_pending is not None:
+                self._search_index_pending.append((list(accounts), list(removed_ids)))
+
+    @staticmethod
+    def _apply_search_index_update(index: AccountSearchIndex, accounts, removed_ids):
+        for account in accounts:
+            index.add(account["id"], account)
+        for account_id in removed_ids:
+            index.remove(account_id)
+
+    def fuzzy_search_accounts(self, text: str, category: str | None = None,
+                              limit: int = TRIGRAM_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Comptes proches de la saisie (faute de frappe, domaine partiel), du plus au moins similaire.
+        Liste vide tant que l'index est en construction : la recherche plein texte reste seule.
+        """
+        index = self._search_index or self.build_search_index()
+        if index is None:
+            return []
+        ranked = index.search(text, category, limit)
+        rows = {row["id"]: row for row in self.db.get_account_summaries_by_ids(account_id for account_id, _ in ranked)}
+        return [rows[account_id] for account_id, _ in ranked if account_id in rows]
+
+    def get_tag_facets(self) -> List[Dict[str, Any]]:
+        return self.db.get_tag_facets()
+
+    def find_tags(self, prefix: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return self.db.find_tags(prefix, limit)
+
+    def get_account_ids_with_tags(self, tag_names: List[str]) -> set:
+        return self.db.get_account_ids_with_tags(tag_names)
+
+    def get_accounts_with_tags(self, tag_names: List[str], category: str | None = None) -> List[Dict[str, Any]]:
+        """Comptes portant tous les tags donnés, dans l'ordre de la liste principale."""
+        return self.db.get_account_summaries_by_ids(self.db.get_account_ids_with_tags(tag_names), category)
+
+    def get_account_summary(self, account_id: int) -> Dict[str, Any] | None:
+        """Colonnes de liste d'un seul compte (mise à jour ciblée de la vue)."""
+        rows = self.db.get_account_summaries_by_ids([account_id])
+        return rows[0] if rows else None
+
+    def get_account_stats(self) -> Dict[str, int]:
+        return self.db.get_account_stats()
 
     def get_decrypted_password(self, account_id: int) -> str:
         account = self.db.get_account(account_id)
@@ -28,72 +143,354 @@ class Vault:
             raise ValueError("Aucun compte trouvé avec cet ID.")
         
         encrypted_password = account['encrypted_password']
-        return crypto.decrypt_data(self.key, encrypted_password)
+        return crypto.decrypt_data(self.accounts_key, encrypted_password)
 
     def update_account(self, account_id: int, name: str, password: str, username: str, url: str, notes: str, category: str, importance: int, tags: str):
-        encrypted_password = crypto.encrypt_data(self.key, password)
+        encrypted_password = crypto.encrypt_data(self.accounts_key, password)
         self.db.update_account(account_id, name, username, encrypted_password, url, notes, category, importance, tags)
+        self._update_search_index([{"id": account_id, "name": name, "username": username, "url": url,
+                                    "category": category, "tags": tags}])
 
     def delete_account(self, account_id: int):
         self.db.delete_account(account_id)
+        self._update_search_index(removed_ids=[account_id])
+
+    def _encrypt_accounts(self, accounts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Remplace le champ 'password' par 'encrypted_password' (chiffrement groupé)."""
+        for account in accounts:
+            if not account.get("name") or not account.get("password"):
+                raise ValueError("Le nom du compte et le mot de passe ne peuvent pas être vides.")
+        encrypted = crypto.CipherContext(self.accounts_key).encrypt_many(account["password"] for account in accounts)
+        return [{**{k: v for k, v in account.items() if k != "password"}, "encrypted_password": enc}
+                for account, (enc, _) in zip(accounts, encrypted)]
+
+    def add_accounts(self, accounts: List[Dict[str, Any]]) -> List[int]:
+        """Ajoute plusieurs comptes (import) : un seul commit pour tout le lot."""
+        accounts = list(accounts)
+        account_ids = self.db.add_accounts(self._encrypt_accounts(accounts))
+        self._update_search_index([{**ACCOUNT_DEFAULTS, **account, "id": account_id}
+                                   for account, account_id in zip(accounts, account_ids)])
+        return account_ids
+
+    def update_accounts(self, accounts: List[Dict[str, Any]]):
+        accounts = list(accounts)
+        self.db.update_accounts(self._encrypt_accounts(accounts))
+        self._update_search_index(accounts)
+
+    def delete_accounts(self, account_ids: List[int]) -> int:
+        account_ids = list(account_ids)
+        count = self.db.delete_accounts(account_ids)
+        self._update_search_index(removed_ids=account_ids)
+        return count
+
+    def kdf_needs_retune(self) -> bool:
+        """Indique si le matériel a changé depuis le dernier calibrage Argon2id."""
+        profile = VaultHeader.load(self.db).kdf_host_profile
+        return not profile or profile != device_binding.get_hardware_profile()
+
+    def acknowledge_hardware_change(self):
+        """Conserve les paramètres actuels pour ce matériel (l'utilisateur a refusé le recalibrage)."""
+        _store_kdf_params(self.db, VaultHeader.load(self.db).effective_kdf_params)
+
+    def lock(self):
+        """Ferme le coffre et retire sa clé de l'agent de déverrouillage."""
+        unlock_agent.lock(self.key_id)
+        self.close()
 
     def close(self):
+        with self._search_index_lock:
+            self._search_index = self._search_index_pending = None
         self.db.close()
 
+ProgressCallback = Optional[Callable[[int, str], None]]
+
+def _report(progress: ProgressCallback, percent: int, message: str = ""):
+    """
+    Relaie l'avancement à l'appelant. Chaque appel est aussi un point où
+    l'appelant peut interrompre l'opération (en levant une exception) sans
+    laisser le coffre dans un état incohérent.
+    """
+    if progress:
+        progress(percent, message)
+
+# Bornes de validation des paramètres KDF lus dans un en-tête (un fichier forgé ne doit pas
+# pouvoir imposer une dérivation démesurée)
+KDF_MAX_ACCEPTED_MEMORY_KIB = 4 * 1024 * 1024  # 4 GiB
+KDF_MAX_ACCEPTED_PARALLELISM = 255
+
+class VaultHeader:
+    """
+    En-tête du coffre : toute la table vault_config, lue en une requête (mise en cache par
+    DatabaseManager jusqu'à la prochaine écriture) et validée avant toute dérivation de clé.
+    """
+    def __init__(self, values: Dict[str, Any]):
+        self.values = values
+        self.kdf_salt = values.get("kdf_salt")
+        self.wrapped_data_key = values.get("wrapped_data_key")
+        self.key_check = values.get("key_check")
+        self.master_password_hash = values.get("master_password_hash")
+        self.recovery_key_hash = values.get("recovery_key_hash")
+        self.device_fingerprint = values.get("device_fingerprint") or None
+        self.key_id = values.get("key_id")
+        # Format absent : format 2 si key_check existe, sinon format 1 (bcrypt)
+        self.format_version = int(values["format_version"]) if "format_version" in values else (2 if self.key_check else 1)
+        self.kdf_params = json.loads(values["kdf_params"]) if "kdf_params" in values else None
+        self.kdf_host_profile = json.loads(values["kdf_host_profile"]) if "kdf_host_profile" in values else None
+
+    @classmethod
+    def load(cls, db: DatabaseManager) -> "VaultHeader":
+        """Lit et valide l'en-tête. Lève FileNotFoundError si le fichier n'est pas un coffre valide."""
+        try:
+            header = cls(db.read_config())
+        except (sqlite3.DatabaseError, ValueError, TypeError):
+            raise FileNotFoundError("Configuration du coffre-fort invalide.")
+        header.validate()
+        return header
+
+    @property
+    def effective_kdf_params(self) -> dict:
+        """Paramètres Argon2id du coffre ; paramètres historiques pour les coffres antérieurs au calibrage."""
+        return self.kdf_params or crypto.legacy_kdf_params()
+
+    def validate(self):
+        if self.format_version > VAULT_FORMAT_VERSION:
+            raise FileNotFoundError("Ce coffre a été créé par une version plus récente de Thanos.")
+        verifiers = (self.wrapped_data_key, self.key_check, self.master_password_hash)
+        valid = (
+            self.format_version >= 1
+            and isinstance(self.kdf_salt, bytes) and len(self.kdf_salt) == crypto.ARGON2_SALT_BYTES
+            and any(verifiers)
+            and all(value is None or isinstance(value, bytes) for value in verifiers + (self.recovery_key_hash,))
+            and (self.format_version < 3 or self.wrapped_data_key)
+            and (self.device_fingerprint is None or isinstance(self.device_fingerprint, str))
+            and (self.kdf_params is None or self._kdf_params_valid(self.kdf_params))
+        )
+        if not valid:
+            raise FileNotFoundError("Configuration du coffre-fort invalide.")
+
+    @staticmethod
+    def _kdf_params_valid(params) -> bool:
+        if not isinstance(params, dict) or params.get("algorithm") != "argon2id":
+            return False
+        values = [params.get(name) for name in ("time_cost", "memory_cost", "parallelism")]
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+            return False
+        time_cost, memory_cost, parallelism = values
+        return (1 <= time_cost <= crypto.ARGON2_MAX_TIME_COST
+                and 1 <= parallelism <= KDF_MAX_ACCEPTED_PARALLELISM
+                and 8 * parallelism <= memory_cost <= KDF_MAX_ACCEPTED_MEMORY_KIB)
+
+def _store_kdf_params(db: DatabaseManager, params: dict):
+    """Enregistre les paramètres KDF et le profil matériel pour lequel ils ont été choisis."""
+    db.write_config({"kdf_params": json.dumps(params),
+                     "kdf_host_profile": json.dumps(device_binding.get_hardware_profile())})
+
+def _device_bound_key(password_key: bytes, device_fp: str | None) -> bytes:
+    """
+    Lie la clé dérivée du mot de passe à un appareil (HKDF sur l'empreinte, ou device id
+    en mode legacy). Aucune dérivation Argon2id : changer d'appareil ne coûte qu'un ré-enveloppement.
+    """
+    if device_fp:
+        return crypto.derive_subkey(password_key, f"{crypto.SUBKEY_DEVICE}/{device_fp}")
+    return device_binding.combine_key_with_device_id(password_key, device_binding.get_device_id())
+
+def _derive_final_key(master_password: str, kdf_salt: bytes, device_fp: str | None, kdf_params: dict | None = None) -> bytes:
+    """Dérive la clé d'enveloppe (KEK) de la clé de données pour cet appareil (format 4)."""
+    return _device_bound_key(crypto.derive_key(master_password, kdf_salt, kdf_params), device_fp)
+
+def _store_wrapped_key(db: DatabaseManager, kek: bytes, data_key: bytes):
+    """
+    Enveloppe la clé de données sous la KEK (format 3). Changer de mot de passe
+    revient à ré-envelopper cette clé : une dérivation et une écriture, quelle que soit la taille du coffre.
+    """
+    db.write_config({"wrapped_data_key": crypto.encrypt_data(kek, data_key), "format_version": VAULT_FORMAT_VERSION},
+                    delete=("master_password_hash", "key_check"))
+
+def _unwrap_key(kek: bytes, wrapped_data_key: bytes) -> bytes:
+    try:
+        return crypto.decrypt_data(kek, wrapped_data_key, decode_to_str=False)
+    except ValueError:
+        raise ValueError("Mot de passe principal incorrect.")
+
+def _verify_key_check(key: bytes, key_check: bytes):
+    try:
+        valid = crypto.decrypt_data(key, key_check, decode_to_str=False) == KEY_CHECK_PLAINTEXT
+    except ValueError:
+        valid = False
+    if not valid:
+        raise ValueError("Mot de passe principal incorrect.")
+
+# Taille des lots de re-chiffrement (un point de progression/annulation par lot)
+REENCRYPT_BATCH_SIZE = 1000
+
+def _reencrypt_column(cursor, table: str, column: str, old_cipher: crypto.CipherContext, new_cipher: crypto.CipherContext,
+                      strict: bool, progress: ProgressCallback, start: int, end: int, message: str):
+    """
+    Re-chiffre une colonne par lots (déchiffrement puis chiffrement groupés).
+    En mode strict, une ligne illisible interrompt l'opération ; sinon elle est laissée telle quelle.
+    """
+    cursor.execute(f"SELECT id, {column} FROM {table}")
+    rows = cursor.fetchall()
+    for offset in range(0, len(rows), REENCRYPT_BATCH_SIZE):
+        _report(progress, start + int((end - start) * offset / len(rows)), message)
+        batch = rows[offset:offset + REENCRYPT_BATCH_SIZE]
+        decrypted = old_cipher.decrypt_many([row[column] for row in batch], decode_to_str=False)
+        readable = []
+        for row, (plain, error) in zip(batch, decrypted):
+            if error is None:
+                readable.append((row['id'], plain))
+            elif strict:
+                raise Exception(f"Impossible de déchiffrer l'entrée ID {row['id']} ({table}): {error}")
+        encrypted = new_cipher.encrypt_many(plain for _, plain in readable)
+        cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                           [(enc, row_id) for (row_id, _), (enc, _) in zip(readable, encrypted)])
+
+def _upgrade_to_data_key(cursor, legacy_key: bytes, progress: ProgressCallback) -> bytes:
+    """
+    Migration unique des formats 1 et 2 : génère la clé de données et re-chiffre
+    comptes et journal (clé historique -> sous-clés), dans la transaction de l'appelant.
+    """
+    data_key = crypto.generate_data_key()
+    legacy_cipher = crypto.CipherContext(legacy_key)
+    _reencrypt_column(cursor, "accounts", "encrypted_password", legacy_cipher,
+                      crypto.CipherContext(crypto.derive_subkey(data_key, crypto.SUBKEY_ACCOUNTS)),
+                      True, progress, 50, 70, "Mise à niveau du coffre (comptes)...")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='security_logs'")
+    if cursor.fetchone():
+        # Entrées déjà illisibles (clé temporaire) : laissées telles quelles
+        _reencrypt_column(cursor, "security_logs", "encrypted_log_data", legacy_cipher,
+                          crypto.CipherContext(crypto.derive_subkey(data_key, crypto.SUBKEY_LOGS)),
+                          False, progress, 70, 90, "Mise à niveau du coffre (journal)...")
+    return data_key
+
+def _reencrypt_photos(legacy_key: bytes, data_key: bytes):
+    """Re-chiffre les photos de sécurité avec la sous-clé dédiée (après validation de la mise à niveau)."""
+    if not os.path.isdir(config.SECURITY_PHOTO_DIR):
+        return
+    photo_key = crypto.derive_subkey(data_key, crypto.SUBKEY_PHOTOS)
+    for filename in os.listdir(config.SECURITY_PHOTO_DIR):
+        if not filename.endswith(".enc"):
+            continue
+        path = os.path.join(config.SECURITY_PHOTO_DIR, filename)
+        try:
+            with open(path, 'rb') as f:
+                raw = crypto.decrypt_blob(legacy_key, f.read())
+        except Exception:
+            continue  # Photo d'un autre coffre ou illisible : laissée telle quelle
+        with open(f"{path}.tmp", 'wb') as f:
+            crypto.encrypt_stream(photo_key, io.BytesIO(raw), f)
+        os.replace(f"{path}.tmp", path)
+
+def _backup_header(kdf_params: dict, salt: bytes) -> bytes:
+    params = json.dumps(kdf_params).encode('utf-8')
+    return BACKUP_MAGIC + bytes([BACKUP_FORMAT_VERSION]) + struct.pack(">H", len(params)) + params + salt
+
+def _read_backup_header(f) -> tuple[int, dict, bytes]:
+    """
+    Lit l'en-tête d'une sauvegarde et retourne (version, paramètres KDF, sel).
+    Le fichier est positionné au début du contenu chiffré. Le fichier n'est pas de
+    confiance : les paramètres KDF sont bornés comme ceux de l'en-tête du coffre,
+    avant toute dérivation.
+    """
+    magic = f.read(len(BACKUP_MAGIC))
+    if magic != BACKUP_MAGIC:
+        # Ancien format : Sel + Nonce + Ciphertext, paramètres historiques
+        f.seek(0)
+        return 0, crypto.legacy_kdf_params(), f.read(crypto.ARGON2_SALT_BYTES)
+    version = f.read(1)
+    if not version:
+        raise ValueError("Sauvegarde corrompue.")
+    if version[0] not in (1, BACKUP_FORMAT_VERSION):
+        raise ValueError(f"Version de sauvegarde non supportée : {version[0]}")
+    try:
+        (params_len,) = struct.unpack(">H", f.read(2))
+        kdf_params = json.loads(f.read(params_len))
+    except (struct.error, ValueError, RecursionError):
+        raise ValueError("Sauvegarde corrompue.")
+    salt = f.read(crypto.ARGON2_SALT_BYTES)
+    if not VaultHeader._kdf_params_valid(kdf_params) or len(salt) != crypto.ARGON2_SALT_BYTES:
+        raise ValueError("Sauvegarde corrompue.")
+    return version[0], kdf_params, salt
+
+def _stream_progress(progress: ProgressCallback, total_bytes: int, start: int, end: int, message: str):
+    """Convertit l'avancement en octets d'un flux chiffré en pourcentage de l'opération."""
+    if not progress:
+        return None
+    return lambda done: _report(progress, start + int((end - start) * done / max(total_bytes, 1)), message)
+
 class VaultManager:
     @staticmethod
-    def create_vault(db_path: str, master_password: str) -> str:
-        with DatabaseManager(db_path) as db:
+    def create_vault(db_path: str, master_password: str, progress: ProgressCallback = None) -> str:
+        """
+        Calibrage et dérivation d'abord, sans toucher à la base : une annulation n'y laisse rien.
+        Tables et configuration sont ensuite écrites dans une seule transaction.
+        """
+        _report(progress, 5, "Calibrage de la dérivation de clé...")
+        kdf_params = crypto.calibrate_kdf(config.KDF_TARGET_UNLOCK_SECONDS, config.KDF_MAX_MEMORY_KIB)
+        kdf_salt = os.urandom(crypto.ARGON2_SALT_BYTES)
+
+        # --- DEVICE BINDING ---
+        # Génération de l'empreinte unique de l'appareil
+        device_fp = device_binding.get_device_fingerprint()
+
+        _report(progress, 50, "Dérivation de la clé (Argon2id)...")
+        kek = _derive_final_key(master_password, kdf_salt, device_fp, kdf_params)
+
+        # --- RECOVERY KEY ---
+        recovery_key = crypto.generate_recovery_key()
+        recovery_key_hash = crypto.hash_password(recovery_key)
+
+        _report(progress, 90, "Enregistrement de la configuration...")
+        with DatabaseManager(db_path) as db, db.transaction():
             db.create_tables()
-            hashed_mp = crypto.hash_password(master_password)
-            kdf_salt = os.urandom(crypto.ARGON2_SALT_BYTES)
-            
-            # --- DEVICE BINDING ---
-            # Génération de l'empreinte unique de l'appareil
-            device_fp = device_binding.get_device_fingerprint()
-            
-            # --- RECOVERY KEY ---
-            recovery_key = crypto.generate_recovery_key()
-            recovery_key_hash = crypto.hash_password(recovery_key)
-            
-            cursor = db.conn.cursor()
-            cursor.execute("INSERT INTO vault_config (key, value) VALUES (?, ?)", ("master_password_hash", hashed_mp))
-            cursor.execute("INSERT INTO vault_config (key, value) VALUES (?, ?)", ("kdf_salt", kdf_salt))
-            # Stockage de l'empreinte pour vérification à l'ouverture
-            cursor.execute("INSERT INTO vault_config (key, value) VALUES (?, ?)", ("device_fingerprint", device_fp))
-            cursor.execute("INSERT INTO vault_config (key, value) VALUES (?, ?)", ("recovery_key_hash", recovery_key_hash))
-            db.conn.commit()
+            # Empreinte stockée pour vérification à l'ouverture
+            db.write_config({"kdf_salt": kdf_salt, "device_fingerprint": device_fp,
+                             "recovery_key_hash": recovery_key_hash})
+            _store_kdf_params(db, kdf_params)
+            _store_wrapped_key(db, kek, crypto.generate_data_key())
         print(f"Coffre-fort créé : {db_path}")
         return recovery_key
 
     @staticmethod
-    def open_vault(db_path: str, master_password: str, recovery_key: str = None) -> Vault:
+    def open_vault(db_path: str, master_password: str, recovery_key: str = None, progress: ProgressCallback = None) -> Vault:
         db = DatabaseManager(db_path)
-        db.connect()
         try:
+            # En-tête lu et validé d'abord : un fichier corrompu ou étranger échoue avant toute dérivation
+            header = VaultHeader.load(db)
             # Exécute la migration pour s'assurer que le schéma est à jour
             db.migrate_database()
+            kdf_params = header.effective_kdf_params
 
-            cursor = db.conn.cursor()
-            cursor.execute("SELECT value FROM vault_config WHERE key = ?", ("master_password_hash",))
-            hashed_mp_row = cursor.fetchone()
-            cursor.execute("SELECT value FROM vault_config WHERE key = ?", ("kdf_salt",))
-            kdf_salt_row = cursor.fetchone()
-            cursor.execute("SELECT value FROM vault_config WHERE key = ?", ("device_fingerprint",))
-            device_fp_row = cursor.fetchone()
-            cursor.execute("SELECT value FROM vault_config WHERE key = ?", ("recovery_key_hash",))
-            rk_hash_row = cursor.fetchone()
+            if not (header.wrapped_data_key or header.key_check):
+                # Format 1 : vérification bcrypt préalable
+                _report(progress, 5, "Vérification du mot de passe...")
+                if not crypto.verify_password(master_password, header.master_password_hash):
+                    raise ValueError("Mot de passe principal incorrect.")
 
-            if not hashed_mp_row or not kdf_salt_row:
-                raise FileNotFoundError("Configuration du coffre-fort invalide.")
+            stored_fp = header.device_fingerprint
+            if not stored_fp:
+                # Système Legacy (pour compatibilité avec anciens coffres)
+                print("⚠️ Mode Legacy (Pas d'empreinte stockée).")
 
-            if not crypto.verify_password(master_password, hashed_mp_row[0]):
-                raise ValueError("Mot de passe principal incorrect.")
+            # Une seule dérivation Argon2id vérifie le mot de passe et produit la KEK
+            _report(progress, 20, "Dérivation de la clé (Argon2id)...")
+            password_key = None
+            if stored_fp and header.format_version < 4:
+                # Formats 1 à 3 : l'empreinte entrait dans le secret dérivé par Argon2id
+                kek = crypto.derive_key(master_password + stored_fp, header.kdf_salt, kdf_params)
+            else:
+                password_key = crypto.derive_key(master_password, header.kdf_salt, kdf_params)
+                kek = _device_bound_key(password_key, stored_fp)
+            if header.wrapped_data_key:
+                data_key = _unwrap_key(kek, header.wrapped_data_key)
+            elif header.key_check:
+                _verify_key_check(kek, header.key_check)
 
             # --- DEVICE BINDING CHECK ---
-            if device_fp_row:
+            target_fp = stored_fp
+            if stored_fp:
                 # Nouveau système : Vérification stricte de l'empreinte
-                stored_fp = device_fp_row[0]
                 current_fp = device_binding.get_device_fingerprint()
                 
                 if stored_fp != current_fp:
@@ -102,87 +499,148 @@ class VaultManager:
                         raise ValueError("DEVICE_MISMATCH")
                     
                     # Vérification de la clé de récupération
-                    if not rk_hash_row or not crypto.verify_password(recovery_key, rk_hash_row[0]):
+                    if not header.recovery_key_hash or not crypto.verify_password(recovery_key, header.recovery_key_hash):
                         raise ValueError("Clé de récupération invalide. Accès refusé.")
                     
                     print("🔄 Migration du coffre vers le nouvel appareil en cours...")
-                    
-                    # 1. Dériver l'ancienne clé (pour déchiffrer)
-                    old_combined = master_password + stored_fp
-                    old_key = crypto.derive_key(old_combined, kdf_salt_row[0])
-                    
-                    # 2. Dériver la nouvelle clé (pour chiffrer)
-                    new_combined = master_password + current_fp
-                    new_key = crypto.derive_key(new_combined, kdf_salt_row[0])
-                    
-                    # 3. Re-chiffrer tous les comptes
-                    cursor.execute("SELECT id, encrypted_password FROM accounts")
-                    accounts = cursor.fetchall()
-                    for acc in accounts:
-                        plain = crypto.decrypt_data(old_key, acc['encrypted_password'])
-                        new_enc = crypto.encrypt_data(new_key, plain)
-                        cursor.execute("UPDATE accounts SET encrypted_password = ? WHERE id = ?", (new_enc, acc['id']))
-                    
-                    # 4. Mettre à jour l'empreinte
-                    cursor.execute("UPDATE vault_config SET value = ? WHERE key = 'device_fingerprint'", (current_fp,))
-                    db.conn.commit()
-                    final_key = new_key
+                    _report(progress, 40, "Migration du coffre vers cet appareil...")
+                    # Seule l'enveloppe de la clé de données change : comptes, journal et photos restent intacts
+                    target_fp = current_fp
                 else:
-                    print("✅ Vérification Appareil OK. Dérivation de la clé avec Argon2id...")
-                    combined_password = master_password + current_fp
-                    final_key = crypto.derive_key(combined_password, kdf_salt_row[0])
-            else:
-                # Système Legacy (pour compatibilité avec anciens coffres)
-                print("⚠️ Mode Legacy (Pas d'empreinte stockée).")
-                derived_key = crypto.derive_key(master_password, kdf_salt_row[0])
-                device_id = device_binding.get_device_id()
-                final_key = device_binding.combine_key_with_device_id(derived_key, device_id)
+                    print("✅ Vérification Appareil OK.")
 
-            return Vault(db, final_key)
+            upgraded = not header.wrapped_data_key
+            rewrap = header.format_version < VAULT_FORMAT_VERSION or target_fp != stored_fp
+            if rewrap and password_key is None:
+                # Passage au format 4 (une seule fois) : KEK indépendante de l'appareil.
+                # Dérivée avant la transaction pour ne pas bloquer les écritures pendant Argon2id.
+                password_key = crypto.derive_key(master_password, header.kdf_salt, kdf_params)
+
+            # Toutes les écritures de l'ouverture sont validées ensemble (un seul commit)
+            with db.transaction() as cursor:
+                if upgraded:
+                    # Mise à niveau transparente vers le format 3 (une seule fois)
+                    data_key = _upgrade_to_data_key(cursor, kek, progress)
+
+                if rewrap:
+                    _report(progress, 95, "Enregistrement de la configuration...")
+                    _store_wrapped_key(db, _device_bound_key(password_key, target_fp), data_key)
+                    if target_fp != stored_fp:
+                        db.write_config({"device_fingerprint": target_fp})
+
+                # Identifiant public de la clé : permet de reconnaître la clé en cache dans l'agent
+                key_id = crypto.key_identifier(data_key)
+                if header.key_id != key_id:
+                    db.write_config({"key_id": key_id})
+
+                if header.kdf_params is None:
+                    # Le parallélisme historique dépend de l'hôte : on l'enregistre pour que
+                    # le coffre reste ouvrable sur une machine ayant un autre nombre de cœurs.
+                    _store_kdf_params(db, kdf_params)
+
+            if upgraded:
+                _reencrypt_photos(kek, data_key)
+
+            return Vault(db, data_key)
         except Exception as e:
             db.close()
             raise e
 
     @staticmethod
-    def backup_vault(db_path: str, backup_path: str, master_password: str, recovery_key: str):
-        """Crée une sauvegarde chiffrée (AES-256) du fichier DB complet."""
+    def open_cached_vault(db_path: str, progress: ProgressCallback = None) -> Vault | None:
+        """
+        Ouvre le coffre avec la clé conservée par l'agent de déverrouillage, sans dérivation.
+        Retourne None si l'agent est désactivé, absent, a oublié la clé, ou si l'appareil a changé.
+        """
+        if not config.UNLOCK_AGENT_ENABLED or not unlock_agent.is_supported() or not os.path.exists(db_path):
+            return None
+        db = DatabaseManager(db_path)
+        vault = None
+        try:
+            header = VaultHeader.load(db)
+            db.migrate_database()
+
+            # La migration d'appareil exige la clé de récupération : pas de raccourci possible
+            device_ok = not header.device_fingerprint or header.device_fingerprint == device_binding.get_device_fingerprint()
+            if header.key_id and header.format_version >= VAULT_FORMAT_VERSION and device_ok:
+                _report(progress, 50, "Déverrouillage par l'agent...")
+                data_key = unlock_agent.fetch_key(header.key_id)
+                if data_key and hmac.compare_digest(crypto.key_identifier(data_key), header.key_id):
+                    vault = Vault(db, data_key)
+            return vault
+        except FileNotFoundError:
+            return None  # Coffre invalide : l'ouverture par mot de passe affichera l'erreur
+        finally:
+            if vault is None:
+                db.close()
+
+    @staticmethod
+    def cache_vault_key(vault: Vault, progress: ProgressCallback = None):
+        """Confie la clé du coffre à l'agent de déverrouillage (démarré au besoin), si l'option est active."""
+        if not config.UNLOCK_AGENT_ENABLED:
+            return
+        if unlock_agent.start_agent():
+            unlock_agent.store_key(vault.key_id, vault.key)
+
+    @staticmethod
+    def backup_vault(db_path: str, backup_path: str, master_password: str, recovery_key: str, progress: ProgressCallback = None):
+        """Crée une sauvegarde chiffrée (AES-256, format segmenté) du fichier DB complet."""
         # 1. Dérivation de la clé de sauvegarde (MP + RK + Sel aléatoire)
+        _report(progress, 5, "Dérivation de la clé de sauvegarde...")
+        # Instantané cohérent : en mode WAL, le fichier principal seul peut ne pas contenir les dernières écritures
+        snapshot_path = f"{db_path}.snapshot"
+        with DatabaseManager(db_path) as db:
+            kdf_params = VaultHeader.load(db).effective_kdf_params
+            db.snapshot(snapshot_path)
         backup_salt = os.urandom(crypto.ARGON2_SALT_BYTES)
         combined_secret = master_password + recovery_key
-        key = crypto.derive_key(combined_secret, backup_salt)
-        
-        # 2. Lecture du fichier DB
-        with open(db_path, 'rb') as f:
-            db_bytes = f.read()
-            
-        # 3. Chiffrement (Salt + Nonce + Ciphertext)
-        encrypted_data = crypto.encrypt_binary(key, db_bytes)
+        key = crypto.derive_key(combined_secret, backup_salt, kdf_params)
         
-        # 4. Écriture
-        with open(backup_path, 'wb') as f:
-            f.write(backup_salt + encrypted_data)
+        # 2. Chiffrement par segments (En-tête + flux chiffré), en mémoire constante.
+        # Écriture dans un fichier temporaire : une annulation ne laisse pas de sauvegarde partielle.
+        tmp_path = f"{backup_path}.tmp"
+        try:
+            with open(snapshot_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                dst.write(_backup_header(kdf_params, backup_salt))
+                crypto.encrypt_stream(key, src, dst, progress=_stream_progress(
+                    progress, os.path.getsize(snapshot_path), 50, 95, "Chiffrement de la sauvegarde..."))
+            os.replace(tmp_path, backup_path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            if os.path.exists(snapshot_path): os.remove(snapshot_path)
 
     @staticmethod
-    def restore_vault(backup_path: str, db_path: str, master_password: str, recovery_key: str):
+    def restore_vault(backup_path: str, db_path: str, master_password: str, recovery_key: str, progress: ProgressCallback = None):
         """Restaure une sauvegarde, déchiffre la DB et effectue la migration d'appareil."""
-        # 1. Lecture et Déchiffrement
-        with open(backup_path, 'rb') as f:
-            data = f.read()
-            
-        salt = data[:crypto.ARGON2_SALT_BYTES]
-        encrypted_content = data[crypto.ARGON2_SALT_BYTES:]
-        
-        combined_secret = master_password + recovery_key
-        key = crypto.derive_key(combined_secret, salt)
-        
+        # 1. Lecture et Déchiffrement (vers un fichier temporaire)
+        _report(progress, 5, "Lecture de la sauvegarde...")
+        tmp_path = f"{db_path}.restore"
         try:
-            db_bytes = crypto.decrypt_binary(key, encrypted_content)
-        except Exception:
-            raise ValueError("Déchiffrement impossible. Mot de passe ou clé de récupération incorrect.")
-            
-        # 2. Écriture temporaire pour migration
-        with open(db_path, 'wb') as f:
-            f.write(db_bytes)
+            with open(backup_path, 'rb') as src:
+                version, kdf_params, salt = _read_backup_header(src)
+                
+                _report(progress, 15, "Dérivation de la clé de sauvegarde...")
+                combined_secret = master_password + recovery_key
+                key = crypto.derive_key(combined_secret, salt, kdf_params)
+                
+                _report(progress, 50, "Déchiffrement de la sauvegarde...")
+                with open(tmp_path, 'wb') as dst:
+                    try:
+                        if version >= 2:
+                            crypto.decrypt_stream(key, src, dst, progress=_stream_progress(
+                                progress, os.path.getsize(backup_path), 50, 70, "Déchiffrement de la sauvegarde..."))
+                        else:
+                            dst.write(crypto.decrypt_binary(key, src.read()))
+                    except Exception:
+                        raise ValueError("Déchiffrement impossible. Mot de passe ou clé de récupération incorrect.")
+                
+            # 2. Mise en place pour migration
+            # (dernier point d'annulation : la suite remplace le coffre local)
+            _report(progress, 70, "Restauration et migration du coffre...")
+            remove_wal_files(db_path)
+            os.replace(tmp_path, db_path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
             
         # 3. Migration immédiate (Re-keying pour le nouvel appareil)
         # On utilise open_vault qui contient déjà la logique de migration si on lui fournit la recovery_key
@@ -195,3 +653,60 @@ class VaultManager:
             # Si open_vault échoue, la restauration est compromise
             if os.path.exists(db_path): os.remove(db_path)
             raise e
+
+    @staticmethod
+    def change_master_password(db: DatabaseManager, old_password: str, new_password: str,
+                               progress: ProgressCallback = None):
+        """
+        Change le mot de passe principal en ré-enveloppant la clé de données :
+        aucune donnée n'est re-chiffrée, le coût est indépendant de la taille du coffre.
+        """
+        header = VaultHeader.load(db)
+        if not header.wrapped_data_key:
+            raise FileNotFoundError("Configuration du coffre introuvable.")
+        device_fp = device_binding.get_device_fingerprint() if header.device_fingerprint else None
+        kdf_params = header.effective_kdf_params
+
+        _report(progress, 5, "Vérification du mot de passe actuel...")
+        try:
+            data_key = _unwrap_key(_derive_final_key(old_password, header.kdf_salt, device_fp, kdf_params),
+                                   header.wrapped_data_key)
+        except ValueError:
+            raise ValueError("Mot de passe actuel incorrect.")
+
+        _report(progress, 50, "Dérivation de la nouvelle clé (Argon2id)...")
+        new_salt = os.urandom(crypto.ARGON2_SALT_BYTES)
+        new_kek = _derive_final_key(new_password, new_salt, device_fp, kdf_params)
+
+        _report(progress, 95, "Enregistrement de la configuration...")
+        with db.transaction():
+            db.write_config({"kdf_salt": new_salt})
+            _store_wrapped_key(db, new_kek, data_key)
+
+    @staticmethod
+    def retune_kdf(vault: Vault, master_password: str, progress: ProgressCallback = None):
+        """
+        Recalibre Argon2id pour le matériel actuel (opération volontaire, proposée quand
+        le matériel a changé). Seule l'enveloppe de la clé de données est réécrite.
+        """
+        header = VaultHeader.load(vault.db)
+        device_fp = device_binding.get_device_fingerprint() if header.device_fingerprint else None
+
+        # Le mot de passe fourni doit ouvrir l'enveloppe actuelle : sinon le coffre serait ré-enveloppé sous une mauvaise clé
+        _report(progress, 5, "Vérification du mot de passe...")
+        current_kek = _derive_final_key(master_password, header.kdf_salt, device_fp, header.effective_kdf_params)
+        if _unwrap_key(current_kek, header.wrapped_data_key) != vault.key:
+            raise ValueError("Mot de passe principal incorrect.")
+
+        _report(progress, 30, "Calibrage de la dérivation de clé...")
+        kdf_params = crypto.calibrate_kdf(config.KDF_TARGET_UNLOCK_SECONDS, config.KDF_MAX_MEMORY_KIB)
+
+        _report(progress, 60, "Dérivation de la nouvelle clé (Argon2id)...")
+        new_salt = os.urandom(crypto.ARGON2_SALT_BYTES)
+        new_kek = _derive_final_key(master_password, new_salt, device_fp, kdf_params)
+
+        _report(progress, 95, "Enregistrement de la configuration...")
+        with vault.db.transaction():
+            vault.db.write_config({"kdf_salt": new_salt})
+            _store_kdf_params(vault.db, kdf_params)
+            _store_wrapped_key(vault.db, new_kek, vault.key)
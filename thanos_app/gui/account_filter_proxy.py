@@ -0,0 +1,72 @@
+# thanos_app/gui/account_filter_proxy.py
+from PySide6.QtCore import QSortFilterProxyModel, QModelIndex
+from typing import List, Dict, Any
+from thanos_app.core.database import FTS_COLUMNS, FTS5_AVAILABLE, fold_search_text, search_terms
+
+def normalized_search_terms(text: str) -> List[str]:
+    return search_terms(fold_search_text(text))
+
+def refines(previous: List[str], terms: List[str]) -> bool:
+    """Vrai si tout compte trouvé par `terms` l'est aussi par `previous` (chaque ancien terme prolongé)."""
+    return bool(previous) and all(any(term.startswith(old) for term in terms) for old in previous)
+
+class AccountFilterProxy(QSortFilterProxyModel):
+    """
+    Affine sur place les résultats d'une recherche plein texte. Le modèle source contient
+    les comptes trouvés par l'index FTS pour une requête ; quand la saisie prolonge cette
+    requête, seuls les comptes encore acceptés sont réexaminés, sur des clés de recherche
+    normalisées une seule fois par ligne. Même sémantique que l'index : chaque terme est
+    un préfixe d'un mot (sous-chaîne avec le repli sans FTS5).
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._terms: List[str] = []
+        self._accepted = None  # IDs acceptés ; None : toutes les lignes du modèle source
+        self._keys = {}  # id -> (ligne source, clé normalisée)
+
+    def search_terms(self) -> List[str]:
+        return self._terms
+
+    def set_search_terms(self, terms: List[str]):
+        """Nouveaux résultats dans le modèle source : tous affichés, aucun filtrage local."""
+        self._keys.clear()
+        if self._accepted is None:
+            self._terms = terms
+            return
+        self.beginFilterChange()
+        self._terms, self._accepted = terms, None
+        self.endFilterChange(QSortFilterProxyModel.Direction.Rows)
+
+    def clear_search(self):
+        self.set_search_terms([])
+
+    def narrow_search(self, terms: List[str]):
+        """Affinement (refines(search_terms(), terms)) : filtre les seules lignes encore acceptées."""
+        source = self.sourceModel()
+        if self._accepted is None:
+            candidates = (source.account_at(row) for row in range(source.rowCount()))
+        else:
+            # Lignes retrouvées par leur ID ; un compte retiré du modèle entre-temps est ignoré
+            rows = (source.row_for_account(account_id) for account_id in self._accepted)
+            candidates = (source.account_at(row) for row in rows if row is not None)
+        accepted = {account['id'] for account in candidates if self._matches(account, terms)}
+        self.beginFilterChange()
+        self._terms, self._accepted = terms, accepted
+        self.endFilterChange(QSortFilterProxyModel.Direction.Rows)
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        return self._accepted is None or self.sourceModel().account_at(source_row)['id'] in self._accepted
+
+    def _search_key(self, account: Dict[str, Any]) -> str:
+        cached = self._keys.get(account['id'])
+        if cached is None or cached[0] is not account:
+            text = " ".join(str(account.get(column) or "") for column in FTS_COLUMNS)
+            cached = (account, " " + " ".join(search_terms(fold_search_text(text))))
+            self._keys[account['id']] = cached
+        return cached[1]
+
+    def _matches(self, account: Dict[str, Any], terms: List[str]) -> bool:
+        key = self._search_key(account)
+        if FTS5_AVAILABLE:
+            return all(" " + term in key for term in terms)
+        return all(term in key for term in terms)
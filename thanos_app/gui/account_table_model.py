@@ -1,23 +1,54 @@
 # thanos_app/gui/account_table_model.py
 from PySide6.QtCore import QAbstractTableModel, Qt, QModelIndex
 from PySide6.QtGui import QColor
-from typing import List, Dict, Any
+from bisect import bisect_left
+from itertools import islice
+from typing import List, Dict, Any, Iterator
+from thanos_app.core.database import account_sort_key
 from thanos_app.core.definitions import IMPORTANCE_LEVELS
 
+def _increasing_subsequence(values: List[int]) -> set:
+    """Indices d'une plus longue sous-suite strictement croissante de `values` (O(n log n))."""
+    tails, tail_indices, previous = [], [], [-1] * len(values)
+    for i, value in enumerate(values):
+        k = bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tail_indices.append(i)
+        else:
+            tails[k] = value
+            tail_indices[k] = i
+        previous[i] = tail_indices[k - 1] if k else -1
+    result, i = set(), tail_indices[-1] if tail_indices else -1
+    while i >= 0:
+        result.add(i)
+        i = previous[i]
+    return result
+
 class AccountTableModel(QAbstractTableModel):
+    """
+    Lignes identifiées par l'id du compte. Un nouveau contenu est appliqué par différence
+    (lignes retirées, insérées, modifiées) plutôt que par réinitialisation : la sélection
+    et la position de défilement de la vue sont conservées.
+    """
     def __init__(self, data: List[Dict[str, Any]] = None, parent=None):
         super().__init__(parent)
         self._data = data or []
         self._headers = ["Importance", "Service", "Catégorie", "Identifiant", "Tags"]
         self._column_keys = ["importance", "name", "category", "username", "tags"]
+        self._source = None  # Itérateur des lignes restantes (chargement à la demande)
+        self._source_key = None  # Clé de tri de la dernière ligne lue dans la source
+        self._fetch_size = 100
+        self._rows_by_id = None  # id -> ligne, reconstruit après chaque changement de structure
+        self._applying = False  # Différence en cours : pas de fetchMore réentrant depuis les vues
 
     def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
         if not index.isValid(): return None
         row, col = index.row(), index.column()
-        
+
         key = self._column_keys[col]
         val = self._data[row].get(key)
-        
+
         if role == Qt.DisplayRole:
             if val is None: return ""
             if key == "importance":
@@ -34,15 +65,139 @@ class AccountTableModel(QAbstractTableModel):
             return Qt.AlignLeft | Qt.AlignVCenter
         return None
 
-    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int: return len(self._data)
-    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int: return len(self._headers)
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int: return 0 if parent.isValid() else len(self._data)
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int: return 0 if parent.isValid() else len(self._headers)
     def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
         if role == Qt.DisplayRole and orientation == Qt.Horizontal: return self._headers[section]
         return None
     def refresh_data(self, new_data: List[Dict[str, Any]]):
-        self.beginResetModel()
-        self._data = new_data
-        self.endResetModel()
+        """Remplace le contenu par une liste complète (résultats de recherche, filtre par tags)."""
+        self._source = None
+        self._source_key = None
+        self._apply_diff(list(new_data))
+    def set_source(self, rows: Iterator[Dict[str, Any]], fetch_size: int = 100):
+        """
+        Remplace le contenu par un itérateur paresseux, trié selon account_sort_key : la vue
+        appelle fetchMore() en défilant. Le premier lot couvre au moins les lignes déjà chargées
+        (en multiples de fetch_size, la taille de page de la source) pour conserver le défilement.
+        """
+        self._source = iter(rows)
+        self._fetch_size = fetch_size
+        count = max(1, -(-len(self._data) // fetch_size)) * fetch_size
+        self._apply_diff(self._read_source(count))
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._source is not None and not self._applying
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if not self.canFetchMore(parent): return
+        batch = self._read_source(self._fetch_size)
+        if batch:
+            self._insert_rows(len(self._data), batch)
+    def _read_source(self, count: int) -> List[Dict[str, Any]]:
+        batch = list(islice(self._source, count))
+        if len(batch) < count:
+            self._source = None  # Source épuisée
+            self._source_key = None
+        elif batch:
+            self._source_key = account_sort_key(batch[-1])
+        return batch
     def get_account_id_for_row(self, row: int) -> int | None:
         if 0 <= row < self.rowCount(): return self._data[row].get('id')
         return None
+    def account_at(self, row: int) -> Dict[str, Any]:
+        return self._data[row]
+    def row_for_account(self, account_id: int) -> int | None:
+        if self._rows_by_id is None:
+            self._rows_by_id = {row['id']: i for i, row in enumerate(self._data)}
+        return self._rows_by_id.get(account_id)
+
+    # --- Mises à jour ciblées (une seule ligne) ---
+
+    def remove_account(self, account_id: int) -> bool:
+        row = self.row_for_account(account_id)
+        if row is None:
+            return False
+        self._remove_rows(row, row)
+        return True
+    def upsert_sorted(self, account: Dict[str, Any]):
+        """
+        Ajoute ou met à jour une ligne de la liste triée (set_source) à sa place. Une ligne
+        qui se classe après la dernière lue dans la source n'est pas insérée : fetchMore la lira.
+        """
+        key = account_sort_key(account)
+        row = self.row_for_account(account['id'])
+        if self._source_key is not None and key > self._source_key:
+            if row is not None:
+                self._remove_rows(row, row)
+            return
+        if row is not None:
+            in_place = ((row == 0 or account_sort_key(self._data[row - 1]) < key) and
+                        (row == len(self._data) - 1 or key < account_sort_key(self._data[row + 1])))
+            if in_place:
+                self._data[row] = account
+                self._emit_changed(row, row)
+                return
+            self._remove_rows(row, row)
+        self._insert_rows(bisect_left(self._data, key, key=account_sort_key), [account])
+
+    # --- Application d'une différence ---
+
+    def _apply_diff(self, new_rows: List[Dict[str, Any]]):
+        """
+        Transforme le contenu actuel en `new_rows` : les lignes conservées à leur place relative
+        (plus longue sous-suite croissante de leurs nouvelles positions) restent, les autres sont
+        retirées puis réinsérées. Seules les lignes touchées sont signalées à la vue.
+        """
+        self._applying = True
+        try:
+            self._apply_rows(new_rows)
+        finally:
+            self._applying = False
+    def _apply_rows(self, new_rows: List[Dict[str, Any]]):
+        new_positions = {account['id']: i for i, account in enumerate(new_rows)}
+        candidates = [account['id'] for account in self._data if account['id'] in new_positions]
+        kept = {candidates[i] for i in _increasing_subsequence([new_positions[i] for i in candidates])}
+
+        row = len(self._data) - 1
+        while row >= 0:
+            if self._data[row]['id'] in kept:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and self._data[row]['id'] not in kept:
+                row -= 1
+            self._remove_rows(row + 1, last)
+
+        changed, i = [], 0
+        while i < len(new_rows):
+            if i < len(self._data) and self._data[i]['id'] == new_rows[i]['id']:
+                if self._data[i] != new_rows[i]:
+                    self._data[i] = new_rows[i]
+                    changed.append(i)
+                i += 1
+                continue
+            end = i
+            while end < len(new_rows) and new_rows[end]['id'] not in kept:
+                end += 1
+            self._insert_rows(i, new_rows[i:end])
+            i = end
+
+        start = 0
+        while start < len(changed):
+            end = start
+            while end + 1 < len(changed) and changed[end + 1] == changed[end] + 1:
+                end += 1
+            self._emit_changed(changed[start], changed[end])
+            start = end + 1
+
+    def _insert_rows(self, position: int, rows: List[Dict[str, Any]]):
+        self.beginInsertRows(QModelIndex(), position, position + len(rows) - 1)
+        self._data[position:position] = rows
+        self._rows_by_id = None
+        self.endInsertRows()
+    def _remove_rows(self, first: int, last: int):
+        self.beginRemoveRows(QModelIndex(), first, last)
+        del self._data[first:last + 1]
+        self._rows_by_id = None
+        self.endRemoveRows()
+    def _emit_changed(self, first: int, last: int):
+        self.dataChanged.emit(self.index(first, 0), self.index(last, len(self._headers) - 1))
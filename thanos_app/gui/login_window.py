@@ -3,16 +3,17 @@ import datetime
 import threading
 
 from PySide6.QtWidgets import (
-    QApplication, QDialog, QVBoxLayout, QLineEdit, QPushButton, QLabel, QInputDialog, QFileDialog,
+    QDialog, QVBoxLayout, QLineEdit, QPushButton, QLabel, QInputDialog, QFileDialog,
     QMessageBox, QFrame, QGraphicsDropShadowEffect
 )
 from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve
 from PySide6.QtGui import QPixmap, QFont, QColor
 from thanos_app.core.vault import VaultManager, Vault
-from thanos_app.core.database import DatabaseManager
+from thanos_app.core.database import DatabaseManager, remove_wal_files
 from thanos_app.core.security_manager import SecurityManager
 from thanos_app.core.definitions import LOG_EVENT_INCORRECT_ATTEMPT, LOG_EVENT_SECURITY_TRIGGER, LOG_EVENT_LOGIN_SUCCESS, LOG_EVENT_PHOTO_CAPTURE
 from .styles.dark_theme import apply_dark_theme
+from .task_runner import TaskRunner, run_with_progress
 from thanos_app.utils.password_validator import validate_master_password
 import config
 
@@ -34,12 +35,14 @@ class LoginWindow(QDialog):
         self._incorrect_attempts_count = 0
         self._last_attempt_time = None
         self._login_blocked = False
+        self._busy = False
         self._block_timer = QTimer(self)
         self._block_timer.setSingleShot(True)
         self._block_timer.timeout.connect(self._unblock_login)
 
         self.setup_ui()
-        self._check_vault_exists()
+        if self._check_vault_exists():
+            self._try_agent_unlock()
         
         # Animation d'apparition en fondu
         self.setWindowOpacity(0)
@@ -205,12 +208,8 @@ class LoginWindow(QDialog):
             try:
                 # Le fichier peut exister (créé par SecurityManager pour les logs),
                 # on vérifie donc la présence de la table de configuration.
-                if not self.db_manager.conn:
-                    self.db_manager.connect()
-                cursor = self.db_manager.conn.cursor()
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='vault_config'")
-                if cursor.fetchone():
-                    vault_initialized = True
+                self.db_manager.read_config()
+                vault_initialized = True
             except Exception:
                 pass
 
@@ -226,6 +225,7 @@ class LoginWindow(QDialog):
             self.import_button.setVisible(True)
             self.setWindowTitle("Thanos - Créer un nouveau coffre")
             self.strength_label.setVisible(True)
+        return vault_initialized
 
     def update_strength_indicator(self, text):
         if not self.create_button.isVisible(): return # Only show for creation
@@ -249,125 +249,215 @@ class LoginWindow(QDialog):
         if self._login_blocked:
             self.status_label.setText(f"Veuillez patienter {config.LOGIN_BLOCK_DELAY_SECONDS} secondes avant de réessayer.")
             return
+        if self._busy:
+            return
 
         master_password = self.password_input.text()
         if not master_password:
             self.status_label.setText("Veuillez entrer un mot de passe.")
             return
 
-        try:
-            self.vault = VaultManager.open_vault(config.VAULT_DB_FILE, master_password)
-            # Connexion réussie
-            self._incorrect_attempts_count = 0
-            self.status_label.setText("")
-            
-            # Initialisation du manager de sécurité avec la vraie clé
-            self.security_manager = SecurityManager(self.db_manager, self.vault.key) 
-            # Traitement des logs et photos en attente
-            self._flush_pending_logs()
-            self._process_pending_photos()
-            self.security_manager.log_event(LOG_EVENT_LOGIN_SUCCESS, {"method": "password"})
-            
-            self.accept() # Close login window and proceed to main window
-        except ValueError as e: # Incorrect password or invalid vault config
-            error_msg = str(e)
-            if "DEVICE_MISMATCH" in error_msg:
-                self.status_label.setText("Nouvel appareil détecté.")
-                QApplication.processEvents()
-                
-                recovery_key, ok = QInputDialog.getText(
-                    self, "Migration de Sécurité",
-                    "Ce coffre est lié à un autre appareil.\n\n"
-                    "Pour autoriser la migration et re-chiffrer vos données,\n"
-                    "veuillez entrer votre Clé de Récupération :",
-                    QLineEdit.Normal
+        self._start_unlock(master_password)
+
+    def _set_busy(self, busy: bool, message: str = ""):
+        self._busy = busy
+        self.login_button.setEnabled(not busy)
+        self.create_button.setEnabled(not busy)
+        self.import_button.setEnabled(not busy)
+        self.password_input.setEnabled(not busy)
+        self.status_label.setStyleSheet("color: #8b949e; font-weight: bold;" if busy else "color: #ff7b72; font-weight: bold;")
+        self.status_label.setText(message)
+
+    def _on_task_progress(self, percent, message):
+        if message:
+            self.status_label.setText(message)
+
+    def _try_agent_unlock(self):
+        # Clé encore conservée par l'agent de déverrouillage : ouverture sans mot de passe ni dérivation
+        if not config.UNLOCK_AGENT_ENABLED:
+            return
+        self._set_busy(True, "Recherche d'une session déverrouillée...")
+        TaskRunner.instance().submit(
+            VaultManager.open_cached_vault, config.VAULT_DB_FILE,
+            on_success=self._on_agent_unlock_result,
+            on_error=lambda e: self._set_busy(False),
+            cancellable=False
+        )
+
+    def _on_agent_unlock_result(self, vault):
+        self._set_busy(False)
+        if vault is None:
+            return
+        self.vault = vault
+        self._finish_login(False, method="agent")
+
+    def _start_unlock(self, master_password, recovery_key=None):
+        # La dérivation Argon2id s'exécute dans le TaskRunner pour ne pas figer l'interface
+        self._set_busy(True, "Déverrouillage du coffre...")
+        TaskRunner.instance().submit(
+            VaultManager.open_vault, config.VAULT_DB_FILE, master_password, recovery_key,
+            on_success=lambda vault: self._on_unlock_success(vault, master_password, migrated=recovery_key is not None),
+            on_error=lambda e: self._on_unlock_error(e, master_password, recovery_key),
+            on_progress=self._on_task_progress,
+            cancellable=False
+        )
+
+    def _on_unlock_success(self, vault, master_password, migrated=False):
+        self._set_busy(False)
+        self.vault = vault
+
+        if vault.kdf_needs_retune():
+            reply = QMessageBox.question(
+                self, "Matériel modifié",
+                "Le matériel de cet ordinateur a changé depuis le calibrage de la protection du coffre.\n\n"
+                "Recalibrer la dérivation de clé (Argon2id) pour cette machine ?\n"
+                "Seule l'enveloppe de la clé du coffre est réécrite : vos données restent inchangées.",
+                QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self._set_busy(True, "Recalibrage de la dérivation de clé...")
+                run_with_progress(
+                    self, "Recalibrage de la dérivation de clé...",
+                    VaultManager.retune_kdf, vault, master_password,
+                    on_success=lambda _result: self._finish_login(migrated),
+                    on_error=lambda e: self._on_retune_failed(e, migrated),
+                    on_cancel=lambda: self._finish_login(migrated)
                 )
-                
-                if ok and recovery_key:
-                    try:
-                        self.vault = VaultManager.open_vault(config.VAULT_DB_FILE, master_password, recovery_key.strip())
-                        QMessageBox.information(self, "Migration Réussie", 
-                                              "Votre coffre a été migré avec succès vers cet appareil.\n"
-                                              "L'ancien appareil n'a plus accès.")
-                        
-                        self._incorrect_attempts_count = 0
-                        self.security_manager = SecurityManager(self.db_manager, self.vault.key)
-                        self._flush_pending_logs()
-                        self.security_manager.log_event("VAULT_MIGRATION", {"status": "success"})
-                        self.accept()
-                        return
-                    except Exception as mig_e:
-                        QMessageBox.critical(self, "Échec Migration", f"Erreur : {mig_e}")
-                        return
-                else:
-                    self.status_label.setText("Migration annulée.")
-                    return
-
-            self._incorrect_attempts_count += 1
-            self._last_attempt_time = datetime.datetime.now()
-            
-            self.status_label.setText(f"Mot de passe incorrect. Veuillez patienter {config.LOGIN_BLOCK_DELAY_SECONDS} secondes avant de réessayer.")
-            self.login_button.setEnabled(False)
-            self.password_input.setEnabled(False)
-            self._login_blocked = True
-            self._block_timer.start(config.LOGIN_BLOCK_DELAY_SECONDS * 1000)
-            self.password_input.clear()
-            
-            # Force l'affichage immédiat des changements d'interface pour éviter l'impression de plantage
-            QApplication.processEvents()
-
-            # Enregistrement de la tentative échouée
-            self._pending_logs.append((LOG_EVENT_INCORRECT_ATTEMPT, 
-                                       {"attempt_number": self._incorrect_attempts_count, "error": str(e)}))
-
-            if self._incorrect_attempts_count >= config.MAX_INCORRECT_ATTEMPTS_BEFORE_SECURITY_EVENTS:
-                self.status_label.setText("Seuil de tentatives atteint. Événements de sécurité déclenchés.")
-                QApplication.processEvents()
-                
-                self._pending_logs.append((LOG_EVENT_SECURITY_TRIGGER, 
-                                           {"attempts_count": self._incorrect_attempts_count}))
-                
-                # Capture photo en mémoire (sera chiffrée après connexion réussie)
-                photo_bytes = self._temp_security_manager.capture_webcam_bytes()
-                
-                if not photo_bytes and not self._temp_security_manager.is_camera_available():
-                    print("⚠️ ATTENTION: La librairie 'opencv-python' est manquante ou la caméra est introuvable.")
-                    print("   Installez-la avec: pip install opencv-python")
-                
-                # Envoi d'email en arrière-plan
-                self._run_background_alert(self._incorrect_attempts_count)
-                
-                if photo_bytes:
-                    self._save_temp_photo(photo_bytes)
-                    print("📸 Photo capturée et mise en attente (sera chiffrée à la connexion).")
-                else:
-                    print("Warning: No photo captured (Camera disabled or unavailable)")
+                return
+            vault.acknowledge_hardware_change()
+
+        self._finish_login(migrated)
+
+    def _on_retune_failed(self, e, migrated):
+        QMessageBox.warning(self, "Recalibrage", f"Le recalibrage a échoué, les paramètres actuels sont conservés : {e}")
+        self._finish_login(migrated)
+
+    def _finish_login(self, migrated, method="password"):
+        self._set_busy(False)
+        # Connexion réussie
+        self._incorrect_attempts_count = 0
+        self.status_label.setText("")
+
+        # Initialisation du manager de sécurité avec la vraie clé
+        self.security_manager = SecurityManager(self.db_manager, self.vault.key)
+        # Traitement des logs et photos en attente
+        self._flush_pending_logs()
+        if migrated:
+            QMessageBox.information(self, "Migration Réussie",
+                                  "Votre coffre a été migré avec succès vers cet appareil.\n"
+                                  "L'ancien appareil n'a plus accès.")
+            self.security_manager.log_event("VAULT_MIGRATION", {"status": "success"})
+        else:
+            self._process_pending_photos()
+            self.security_manager.log_event(LOG_EVENT_LOGIN_SUCCESS, {"method": method})
 
-        except FileNotFoundError:
+        if method == "password" and config.UNLOCK_AGENT_ENABLED:
+            TaskRunner.instance().submit(VaultManager.cache_vault_key, self.vault, cancellable=False)
+
+        self.accept() # Close login window and proceed to main window
+
+    def _on_unlock_error(self, e, master_password, recovery_key):
+        self._set_busy(False)
+        if recovery_key is not None:
+            QMessageBox.critical(self, "Échec Migration", f"Erreur : {e}")
+            return
+        if isinstance(e, FileNotFoundError):
             QMessageBox.warning(self, "Erreur", "Le fichier du coffre-fort n'existe pas ou est corrompu.")
             self.create_button.setVisible(True)
             self.login_button.setVisible(False)
-        except Exception as e:
+            return
+        if not isinstance(e, ValueError): # Incorrect password or invalid vault config
             QMessageBox.critical(self, "Erreur inattendue", f"Une erreur est survenue: {e}")
+            return
+
+        error_msg = str(e)
+        if "DEVICE_MISMATCH" in error_msg:
+            self.status_label.setText("Nouvel appareil détecté.")
+
+            recovery_key, ok = QInputDialog.getText(
+                self, "Migration de Sécurité",
+                "Ce coffre est lié à un autre appareil.\n\n"
+                "Pour autoriser la migration et re-chiffrer vos données,\n"
+                "veuillez entrer votre Clé de Récupération :",
+                QLineEdit.Normal
+            )
+
+            if ok and recovery_key:
+                self._start_unlock(master_password, recovery_key.strip())
+            else:
+                self.status_label.setText("Migration annulée.")
+            return
+
+        self._incorrect_attempts_count += 1
+        self._last_attempt_time = datetime.datetime.now()
+
+        self.status_label.setText(f"Mot de passe incorrect. Veuillez patienter {config.LOGIN_BLOCK_DELAY_SECONDS} secondes avant de réessayer.")
+        self.login_button.setEnabled(False)
+        self.password_input.setEnabled(False)
+        self._login_blocked = True
+        self._block_timer.start(config.LOGIN_BLOCK_DELAY_SECONDS * 1000)
+        self.password_input.clear()
+
+        # Enregistrement de la tentative échouée
+        self._pending_logs.append((LOG_EVENT_INCORRECT_ATTEMPT,
+                                   {"attempt_number": self._incorrect_attempts_count, "error": str(e)}))
+
+        if self._incorrect_attempts_count >= config.MAX_INCORRECT_ATTEMPTS_BEFORE_SECURITY_EVENTS:
+            self.status_label.setText("Seuil de tentatives atteint. Événements de sécurité déclenchés.")
+
+            self._pending_logs.append((LOG_EVENT_SECURITY_TRIGGER,
+                                       {"attempts_count": self._incorrect_attempts_count}))
+
+            # Envoi d'email en arrière-plan
+            self._run_background_alert(self._incorrect_attempts_count)
+
+            # Capture photo en mémoire (sera chiffrée après connexion réussie)
+            TaskRunner.instance().submit(
+                lambda progress: self._temp_security_manager.capture_webcam_bytes(),
+                on_success=self._on_photo_captured,
+                cancellable=False
+            )
+
+    def _on_photo_captured(self, photo_bytes):
+        if not photo_bytes and not self._temp_security_manager.is_camera_available():
+            print("⚠️ ATTENTION: La librairie 'opencv-python' est manquante ou la caméra est introuvable.")
+            print("   Installez-la avec: pip install opencv-python")
+
+        if photo_bytes:
+            self._save_temp_photo(photo_bytes)
+            print("📸 Photo capturée et mise en attente (sera chiffrée à la connexion).")
+        else:
+            print("Warning: No photo captured (Camera disabled or unavailable)")
 
     def _run_background_alert(self, attempts):
+        """
+        Envoi de l'alerte email sur un thread dédié, hors du TaskRunner : celui-ci exécute les
+        tâches une par une, et la connexion SMTP (sans délai d'expiration) peut bloquer longtemps.
+        Dans la file, elle retarderait la capture photo et le déverrouillage suivant, voire les
+        bloquerait. Thread démon : un envoi en cours est abandonné si l'application se ferme.
+        """
         def task():
             try:
-                # Connexion isolée pour le thread (évite les conflits SQLite)
-                db = DatabaseManager(config.VAULT_DB_FILE)
-                db.connect()
-                # Manager temporaire (suffisant pour email et logs non chiffrés)
-                sm = SecurityManager(db, os.urandom(32))
+                # Le pool fournit à ce thread sa propre connexion (WAL : pas de conflit avec le thread GUI)
+                sm = SecurityManager(self.db_manager, os.urandom(32))
                 sm.send_email_alert(attempts)
-                db.close()
+                sm.close()
             except Exception as e:
                 print(f"Background alert error: {e}")
+            finally:
+                self.db_manager.release()
         
-        threading.Thread(target=task, daemon=True).start()
+        threading.Thread(target=task, name="thanos-alert", daemon=True).start()
+
+    def done(self, result):
+        # Les événements de la connexion sont écrits en arrière-plan : on les valide avant de quitter
+        for manager in (self._temp_security_manager, getattr(self, "security_manager", None)):
+            if manager is not None:
+                manager.close()
+        super().done(result)
 
     def _flush_pending_logs(self):
-        for event_type, details in self._pending_logs:
-            self.security_manager.log_event(event_type, details)
+        # Un seul commit pour toutes les tentatives mises en attente
+        self.security_manager.log_events(self._pending_logs)
 
     def _save_temp_photo(self, photo_bytes):
         # Sauvegarde temporaire de la photo brute (en attendant le chiffrement)
@@ -394,8 +484,13 @@ class LoginWindow(QDialog):
                 with open(file_path, "rb") as f:
                     photo_bytes = f.read()
                 
+                # Heure de capture : celle du nom du fichier en attente (voir _save_temp_photo)
+                try:
+                    captured_at = datetime.datetime.strptime(filename[len("pending_"):-len(".jpg")], '%Y%m%d_%H%M%S')
+                except ValueError:
+                    captured_at = None
                 # Utiliser le security_manager authentifié (avec la clé du coffre)
-                enc_filename = self.security_manager.save_encrypted_photo(photo_bytes)
+                enc_filename = self.security_manager.save_encrypted_photo(photo_bytes, captured_at)
                 if enc_filename:
                     self.security_manager.log_event(LOG_EVENT_PHOTO_CAPTURE, {"status": "success", "filename": enc_filename})
                     print(f"✅ Photo en attente traitée et chiffrée : {enc_filename}")
@@ -416,26 +511,36 @@ class LoginWindow(QDialog):
             QMessageBox.warning(self, "Mot de passe trop faible", f"Sécurité insuffisante :\n{val['feedback']}")
             return
 
-        try:
-            recovery_key = VaultManager.create_vault(config.VAULT_DB_FILE, master_password)
-            
-            msg = QMessageBox(self)
-            msg.setWindowTitle("⚠️ Clé de Récupération - IMPORTANT")
-            msg.setText("Votre coffre-fort a été créé avec succès.")
-            msg.setInformativeText(
-                "Voici votre CLÉ DE RÉCUPÉRATION.\n\n"
-                f"<h2 style='color:#ff7b72; text-align:center;'>{recovery_key}</h2>\n\n"
-                "Copiez-la et conservez-la en lieu sûr (hors de cet ordinateur).\n"
-                "Elle sera **INDISPENSABLE** pour transférer votre coffre sur un autre appareil."
-            )
-            msg.setTextInteractionFlags(Qt.TextSelectableByMouse)
-            msg.setIcon(QMessageBox.Warning)
-            msg.exec()
-            
-            self._check_vault_exists()
-            self.password_input.clear()
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de créer le coffre-fort: {e}")
+        self._set_busy(True, "Création du coffre-fort...")
+        run_with_progress(
+            self, "Création du coffre-fort...",
+            VaultManager.create_vault, config.VAULT_DB_FILE, master_password,
+            on_success=self._on_vault_created,
+            on_error=self._on_vault_creation_failed,
+            on_cancel=lambda: self._set_busy(False)
+        )
+
+    def _on_vault_created(self, recovery_key):
+        self._set_busy(False)
+        msg = QMessageBox(self)
+        msg.setWindowTitle("⚠️ Clé de Récupération - IMPORTANT")
+        msg.setText("Votre coffre-fort a été créé avec succès.")
+        msg.setInformativeText(
+            "Voici votre CLÉ DE RÉCUPÉRATION.\n\n"
+            f"<h2 style='color:#ff7b72; text-align:center;'>{recovery_key}</h2>\n\n"
+            "Copiez-la et conservez-la en lieu sûr (hors de cet ordinateur).\n"
+            "Elle sera **INDISPENSABLE** pour transférer votre coffre sur un autre appareil."
+        )
+        msg.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        msg.setIcon(QMessageBox.Warning)
+        msg.exec()
+
+        self._check_vault_exists()
+        self.password_input.clear()
+
+    def _on_vault_creation_failed(self, e):
+        self._set_busy(False)
+        QMessageBox.critical(self, "Erreur", f"Impossible de créer le coffre-fort: {e}")
 
     def import_vault(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Sélectionner une sauvegarde ou un coffre", "", "Thanos Files (*.enc *.db)")
@@ -462,14 +567,32 @@ class LoginWindow(QDialog):
                     layout.addWidget(btn)
                     
                     if dialog.exec():
-                        VaultManager.restore_vault(file_path, config.VAULT_DB_FILE, pw_input.text(), rk_input.text().strip())
-                        QMessageBox.information(self, "Succès", "Coffre restauré et migré avec succès.")
-                        self._check_vault_exists()
+                        self._set_busy(True, "Restauration du coffre...")
+                        # Le fichier va être remplacé : aucune connexion ne doit rester ouverte dessus
+                        self.db_manager.close()
+                        run_with_progress(
+                            self, "Restauration du coffre...",
+                            VaultManager.restore_vault, file_path, config.VAULT_DB_FILE, pw_input.text(), rk_input.text().strip(),
+                            on_success=self._on_vault_restored,
+                            on_error=self._on_import_failed,
+                            on_cancel=lambda: self._set_busy(False)
+                        )
                 else:
                     # Import simple (copie)
                     import shutil
+                    self.db_manager.close()
+                    remove_wal_files(config.VAULT_DB_FILE)
                     shutil.copy2(file_path, config.VAULT_DB_FILE)
                     QMessageBox.information(self, "Importation", "Fichier importé. Veuillez vous connecter pour lancer la migration.")
                     self._check_vault_exists()
             except Exception as e:
-                QMessageBox.critical(self, "Erreur", f"Impossible d'importer le fichier : {e}")
\ No newline at end of file
+                self._on_import_failed(e)
+
+    def _on_vault_restored(self, _result):
+        self._set_busy(False)
+        QMessageBox.information(self, "Succès", "Coffre restauré et migré avec succès.")
+        self._check_vault_exists()
+
+    def _on_import_failed(self, e):
+        self._set_busy(False)
+        QMessageBox.critical(self, "Erreur", f"Impossible d'importer le fichier : {e}")
@@ -1,20 +1,30 @@
 # thanos_app/gui/main_window.py
 from PySide6.QtWidgets import (
     QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QTableView,
-    QPushButton, QAbstractItemView, QHeaderView, QMessageBox, QLineEdit, QComboBox, QFrame, QLabel
+    QPushButton, QAbstractItemView, QHeaderView, QMessageBox, QLineEdit, QComboBox, QFrame, QLabel,
+    QToolButton, QMenu
 )
-from PySide6.QtCore import QModelIndex, Qt, QSize, QSortFilterProxyModel
+from PySide6.QtCore import QModelIndex, Qt, QSize, QTimer
 from PySide6.QtGui import QIcon, QFont, QPixmap, QColor
 import os
+from datetime import datetime, timedelta
 from .styles.dark_theme import apply_dark_theme
 from thanos_app.core.vault import Vault
+from thanos_app.core.database import ACCOUNT_SEARCH_LIMIT
 from .account_table_model import AccountTableModel
+from .account_filter_proxy import AccountFilterProxy, normalized_search_terms, refines
 from .account_dialog import AccountDialog
 from .account_detail_dialog import AccountDetailDialog
 from .security_log_dialog import SecurityLogDialog
 from .settings_dialog import SettingsDialog
+from .task_runner import TaskRunner
 from thanos_app.core.security_manager import SecurityManager
-from thanos_app.core.definitions import CATEGORIES, IMPORTANCE_LEVELS
+from thanos_app.core.definitions import CATEGORIES, IMPORTANCE_LEVELS, SECURITY_ALERT_EVENTS, SECURITY_ALERT_DAYS
+
+# Lignes de la liste des comptes lues par appel à fetchMore (et taille de page de la source)
+ACCOUNT_FETCH_SIZE = 100
+# Délai sans frappe avant d'appliquer la saisie de recherche
+SEARCH_DEBOUNCE_MS = 200
 
 class MainWindow(QMainWindow):
     def __init__(self, vault: Vault, parent=None):
@@ -22,7 +32,6 @@ class MainWindow(QMainWindow):
         self.vault = vault
         # Créer une instance unique du SecurityManager
         self.security_manager = SecurityManager(self.vault.db, self.vault.key)
-        self.all_accounts = [] # Cache pour le filtrage
         self.setWindowTitle("Thanos - Votre Coffre-fort")
         self.setMinimumSize(1000, 700)
         self.setStyleSheet("background-color: #0d1117; color: #c9d1d9;")
@@ -118,6 +127,14 @@ class MainWindow(QMainWindow):
         
         toolbar_layout.addStretch()
 
+        # Verrouillage explicite : ferme le coffre et le retire de l'agent de déverrouillage
+        self.lock_btn = QPushButton("Verrouiller")
+        self.lock_btn.setIcon(lock_icon)
+        self.lock_btn.setCursor(Qt.PointingHandCursor)
+        self.lock_btn.setStyleSheet(self.security_btn.styleSheet())
+        self.lock_btn.clicked.connect(self.lock_vault)
+        toolbar_layout.addWidget(self.lock_btn)
+
         # --- STATS CARDS ---
         stats_layout = QHBoxLayout()
         stats_layout.setSpacing(20)
@@ -153,7 +170,7 @@ class MainWindow(QMainWindow):
         # Zone de recherche et filtres
         filter_layout = QHBoxLayout()
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("🔍 Rechercher (Nom, Tags)...")
+        self.search_input.setPlaceholderText("🔍 Rechercher (Nom, Identifiant, URL, Notes, Tags)...")
         self.search_input.setStyleSheet("""
             QLineEdit {
                 background-color: #0d1117;
@@ -164,7 +181,11 @@ class MainWindow(QMainWindow):
             }
             QLineEdit:focus { border: 1px solid #58a6ff; }
         """)
-        self.search_input.textChanged.connect(self.filter_accounts)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search_text)
+        self.search_input.textChanged.connect(self.search_timer.start)
         
         self.cat_filter = QComboBox()
         self.cat_filter.addItem("Toutes les catégories")
@@ -174,10 +195,25 @@ class MainWindow(QMainWindow):
             QComboBox::drop-down { border: none; }
             QComboBox::down-arrow { image: none; border-left: 5px solid transparent; border-right: 5px solid transparent; border-top: 5px solid #8b949e; margin-right: 10px; }
         """)
-        self.cat_filter.currentTextChanged.connect(self.filter_accounts)
+        # Le filtre de catégorie est appliqué en SQL (index) : changer de catégorie recharge la liste
+        self.cat_filter.currentTextChanged.connect(self.load_accounts)
         
+        # Filtre multi-tags : le menu affiche chaque tag avec son nombre de comptes
+        self.selected_tags = set()
+        self.tag_menu = QMenu(self)
+        self.tag_menu.aboutToShow.connect(self.populate_tag_menu)
+        self.tag_filter = QToolButton()
+        self.tag_filter.setText("🏷 Tags")
+        self.tag_filter.setMenu(self.tag_menu)
+        self.tag_filter.setPopupMode(QToolButton.InstantPopup)
+        self.tag_filter.setStyleSheet("""
+            QToolButton { background-color: #21262d; border: 1px solid #30363d; border-radius: 6px; padding: 5px 10px; color: white; }
+            QToolButton::menu-indicator { image: none; }
+        """)
+
         filter_layout.addWidget(self.search_input)
         filter_layout.addWidget(self.cat_filter)
+        filter_layout.addWidget(self.tag_filter)
 
         self.add_button.clicked.connect(self.add_account)
 
@@ -227,42 +263,126 @@ class MainWindow(QMainWindow):
 
         self.add_test_data_if_empty()
         self.load_accounts()
+        # Index aveugle des événements journalisés avant son introduction (une seule fois par coffre)
+        TaskRunner.instance().submit(lambda progress: self.security_manager.index_logs(),
+                                     on_success=lambda count: count and self.update_stats(),
+                                     cancellable=False)
+        # Index de recherche approchée construit dès l'ouverture, hors du thread GUI
+        TaskRunner.instance().submit(lambda progress: self.vault.build_search_index(),
+                                     on_success=lambda index: self._search_index_ready(), cancellable=False)
 
     def setup_model(self):
         self.model = AccountTableModel()
-        self.table_view.setModel(self.model)
+        self.proxy = AccountFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.table_view.setModel(self.proxy)
+        # Catégorie de la liste triée affichée (set_source) ; False pour une recherche ou un filtre par tags
+        self._sorted_list_category = False
+        # Les résultats de recherche affichés sont-ils complets (sous la limite de la requête) ?
+        self._search_complete = False
 
     def load_accounts(self):
-        self.all_accounts = self.vault.get_all_accounts()
         self.filter_accounts()
         self.update_stats()
 
     def update_stats(self):
-        total = len(self.all_accounts)
-        critical = len([a for a in self.all_accounts if a.get('importance') == 3])
-        self.stats_labels["Total Comptes"].setText(str(total))
-        self.stats_labels["Critiques"].setText(str(critical))
-        # Pour les alertes, on met un placeholder ou on connecte au security manager plus tard
-        self.stats_labels["Alertes Sécurité"].setText("0")
+        stats = self.vault.get_account_stats()
+        self.stats_labels["Total Comptes"].setText(str(stats["total"]))
+        self.stats_labels["Critiques"].setText(str(stats["critical"]))
+        # Compté en SQL sur l'index aveugle des types d'événements : aucun déchiffrement
+        alerts = self.security_manager.count_events(list(SECURITY_ALERT_EVENTS),
+                                                    since=datetime.now() - timedelta(days=SECURITY_ALERT_DAYS))
+        self.stats_labels["Alertes Sécurité"].setText(str(alerts))
+
+    def _search_index_ready(self):
+        """Une recherche sans résultat faite pendant la construction de l'index est relancée."""
+        if self.search_input.text().strip() and self.model.rowCount() == 0:
+            self.filter_accounts()
+
+    def apply_search_text(self):
+        """Saisie stabilisée : une recherche qui prolonge la précédente est affinée sans requête."""
+        terms = normalized_search_terms(self.search_input.text())
+        if terms == self.proxy.search_terms():
+            return
+        if self._search_complete and refines(self.proxy.search_terms(), terms):
+            self.proxy.narrow_search(terms)
+        else:
+            self.filter_accounts()
 
     def filter_accounts(self):
-        search_text = self.search_input.text().lower()
+        self.search_timer.stop()
         cat_text = self.cat_filter.currentText()
-        
-        filtered = []
-        for acc in self.all_accounts:
-            # Filtre Catégorie
-            if cat_text != "Toutes les catégories" and acc.get('category') != cat_text:
-                continue
-            
-            # Filtre Recherche (Nom ou Tags)
-            name_match = search_text in acc.get('name', '').lower()
-            tags_match = search_text in acc.get('tags', '').lower()
-            
-            if not search_text or name_match or tags_match:
-                filtered.append(acc)
-                
-        self.model.refresh_data(filtered)
+        category = None if cat_text == "Toutes les catégories" else cat_text
+        search_text = self.search_input.text().strip()
+        if search_text:
+            # Une seule requête sur l'index plein texte, résultats classés par pertinence
+            results = self.vault.search_accounts(search_text, category)
+            self._search_complete = len(results) < ACCOUNT_SEARCH_LIMIT
+            if not results:
+                # Aucun mot ne commence ainsi : comptes approchants (faute de frappe, domaine partiel),
+                # que le proxy ne sait pas affiner localement
+                results = self.vault.fuzzy_search_accounts(search_text, category)
+                self._search_complete = False
+            self.proxy.set_search_terms(normalized_search_terms(search_text))
+            if self.selected_tags:
+                tagged_ids = self.vault.get_account_ids_with_tags(list(self.selected_tags))
+                results = [acc for acc in results if acc['id'] in tagged_ids]
+            self.model.refresh_data(results)
+            self._sorted_list_category = False
+        elif self.selected_tags:
+            self.proxy.clear_search()
+            self.model.refresh_data(self.vault.get_accounts_with_tags(list(self.selected_tags), category))
+            self._sorted_list_category = False
+        else:
+            self.proxy.clear_search()
+            # Liste paginée et paresseuse : la vue ne charge que les lignes qu'elle affiche.
+            # Pages de la taille des lots du modèle : la source ne garde aucune ligne lue d'avance.
+            self.model.set_source(self.vault.iter_account_summaries(category, ACCOUNT_FETCH_SIZE), ACCOUNT_FETCH_SIZE)
+            self._sorted_list_category = category
+
+    def _account_changed(self, account_id: int):
+        """Après un ajout ou une modification : seule la ligne du compte est mise à jour."""
+        if self._sorted_list_category is False:
+            # Recherche ou tags : l'appartenance dépend du contenu, nouveau résultat appliqué par différence
+            self.filter_accounts()
+        else:
+            account = self.vault.get_account_summary(account_id)
+            if account and self._sorted_list_category in (None, account['category']):
+                self.model.upsert_sorted(account)
+            else:
+                self.model.remove_account(account_id)
+        self.update_stats()
+
+    def populate_tag_menu(self):
+        self.tag_menu.clear()
+        facets = self.vault.get_tag_facets()
+        if not facets:
+            self.tag_menu.addAction("Aucun tag").setEnabled(False)
+        for facet in facets:
+            action = self.tag_menu.addAction(f"{facet['name']} ({facet['count']})")
+            action.setCheckable(True)
+            action.setChecked(facet['name'].casefold() in self.selected_tags)
+            action.toggled.connect(lambda checked, name=facet['name']: self.toggle_tag_filter(name, checked))
+        if self.selected_tags:
+            self.tag_menu.addSeparator()
+            self.tag_menu.addAction("Effacer le filtre", self.clear_tag_filter)
+
+    def toggle_tag_filter(self, name: str, checked: bool):
+        if checked:
+            self.selected_tags.add(name.casefold())
+        else:
+            self.selected_tags.discard(name.casefold())
+        self._update_tag_filter_label()
+        self.filter_accounts()
+
+    def clear_tag_filter(self):
+        self.selected_tags.clear()
+        self._update_tag_filter_label()
+        self.filter_accounts()
+
+    def _update_tag_filter_label(self):
+        count = len(self.selected_tags)
+        self.tag_filter.setText(f"🏷 Tags ({count})" if count else "🏷 Tags")
 
     def on_selection_changed(self):
         has_selection = self.table_view.selectionModel().hasSelection()
@@ -270,10 +390,12 @@ class MainWindow(QMainWindow):
         self.delete_button.setEnabled(has_selection)
 
     def add_test_data_if_empty(self):
-        if not self.vault.get_all_accounts():
+        if not self.vault.get_account_stats()["total"]:
             try:
-                self.vault.add_account("Google", "very-strong-password-123", "test@gmail.com", "https://google.com", "", "Sensible", 3, "email, pro")
-                self.vault.add_account("GitHub", "another-secure-password", "dev", "https://github.com", "", "Travail", 2, "code, git")
+                self.vault.add_accounts([
+                    {"name": "Google", "password": "very-strong-password-123", "username": "test@gmail.com", "url": "https://google.com", "category": "Sensible", "importance": 3, "tags": "email, pro"},
+                    {"name": "GitHub", "password": "another-secure-password", "username": "dev", "url": "https://github.com", "category": "Travail", "importance": 2, "tags": "code, git"},
+                ])
             except Exception as e:
                 print(f"Erreur test data: {e}")
 
@@ -282,12 +404,12 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             data = dialog.get_data()
             try:
-                self.vault.add_account(
+                account_id = self.vault.add_account(
                     data['name'], data['password'], data['username'], 
                     data['url'], data['notes'],
                     data['category'], data['importance'], data['tags']
                 )
-                self.load_accounts()
+                self._account_changed(account_id)
             except Exception as e:
                 QMessageBox.critical(self, "Erreur", str(e))
 
@@ -295,8 +417,7 @@ class MainWindow(QMainWindow):
         if not index.isValid():
             return
         
-        row = index.row()
-        account_id = self.model.get_account_id_for_row(row)
+        account_id = self.model.get_account_id_for_row(self.proxy.mapToSource(index).row())
         if not account_id: return
         
         try:
@@ -310,8 +431,7 @@ class MainWindow(QMainWindow):
         if not index.isValid():
             return
         
-        row = index.row()
-        account_id = self.model.get_account_id_for_row(row)
+        account_id = self.model.get_account_id_for_row(self.proxy.mapToSource(index).row())
         if not account_id: return
 
         try:
@@ -331,7 +451,7 @@ class MainWindow(QMainWindow):
                     data['username'], data['url'], data['notes'],
                     data['category'], data['importance'], data['tags']
                 )
-                self.load_accounts()
+                self._account_changed(account_id)
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Impossible de modifier le compte : {e}")
 
@@ -339,8 +459,7 @@ class MainWindow(QMainWindow):
         index = self.table_view.currentIndex()
         if not index.isValid(): return
         
-        row = index.row()
-        account_id = self.model.get_account_id_for_row(row)
+        account_id = self.model.get_account_id_for_row(self.proxy.mapToSource(index).row())
         acc_name = index.siblingAtColumn(1).data() # Colonne nom
         
         confirm = QMessageBox.question(self, "Confirmer suppression",
@@ -348,16 +467,25 @@ class MainWindow(QMainWindow):
             QMessageBox.Yes | QMessageBox.No)
         if confirm == QMessageBox.Yes:
             self.vault.delete_account(account_id)
-            self.load_accounts()
+            self.model.remove_account(account_id)
+            self.update_stats()
 
     def show_security_logs(self):
         dialog = SecurityLogDialog(self.security_manager, self)
         dialog.exec()
+        self.update_stats()
 
     def show_settings(self):
         dialog = SettingsDialog(self.security_manager, self)
         dialog.exec()
 
+    def lock_vault(self):
+        self.vault.lock()
+        self.close()
+
     def closeEvent(self, event):
+        # Valide les événements de sécurité en attente
+        if not self.security_manager.close():
+            print(f"Événements de sécurité non enregistrés : {self.security_manager.log_error}")
         self.vault.close()
         super().closeEvent(event)
@@ -1,10 +1,20 @@
-from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, 
-                               QPushButton, QLabel, QMessageBox, QDialogButtonBox, QWidget, QFrame)
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QListView, QAbstractItemView,
+                               QLabel, QMessageBox, QDialogButtonBox, QComboBox)
 from PySide6.QtGui import QPixmap, QImage
 from PySide6.QtCore import Qt
-import json
 from datetime import datetime, timedelta
 from .styles.dark_theme import apply_dark_theme
+from .security_log_model import SecurityLogModel, SecurityLogDelegate, LOG_ROLE, log_photo_filename
+
+# Entrées lues et déchiffrées par appel à fetchMore, au fil du défilement
+LOG_FETCH_SIZE = 50
+# Périodes proposées : (libellé, durée en arrière depuis maintenant ; None = tout le journal)
+LOG_PERIODS = (
+    ("Tout le journal", None),
+    ("Dernières 24 heures", timedelta(hours=24)),
+    ("7 derniers jours", timedelta(days=7)),
+    ("30 derniers jours", timedelta(days=30)),
+)
 
 class SecurityLogDialog(QDialog):
     def __init__(self, security_manager, parent=None):
@@ -17,120 +27,70 @@ class SecurityLogDialog(QDialog):
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
-        
-        self.list_widget = QListWidget()
-        self.list_widget.setStyleSheet("QListWidget { background-color: #0d1117; border: none; } QListWidget::item { background: transparent; }")
-        self.list_widget.setSpacing(10)
-        layout.addWidget(self.list_widget)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Période :"))
+        self.period_combo = QComboBox()
+        for label, _ in LOG_PERIODS:
+            self.period_combo.addItem(label)
+        self.period_combo.currentIndexChanged.connect(self.load_logs)
+        filter_layout.addWidget(self.period_combo)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        # Vue virtualisée : seules les lignes visibles sont peintes, aucun widget par événement
+        self.model = SecurityLogModel(self.security_manager, self)
+        self.delegate = SecurityLogDelegate(self)
+        self.delegate.delete_requested.connect(lambda index: self.try_delete_log(index.row()))
+        self.delegate.view_requested.connect(
+            lambda index: self.view_photo(log_photo_filename(index.data(LOG_ROLE))))
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(self.delegate)
+        self.list_view.setSpacing(5)
+        self.list_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.list_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.list_view.setStyleSheet("QListView { background-color: #0d1117; border: none; }")
+        layout.addWidget(self.list_view)
+
+        self.empty_label = QLabel("Aucun événement de sécurité enregistré.")
+        self.empty_label.setAlignment(Qt.AlignCenter)
+        self.empty_label.setStyleSheet("color: #8b949e; padding: 20px; font-style: italic;")
+        layout.addWidget(self.empty_label)
+        self.model.modelReset.connect(self._update_empty_state)
+        self.model.rowsInserted.connect(self._update_empty_state)
+        self.model.rowsRemoved.connect(self._update_empty_state)
         
         btn_box = QDialogButtonBox(QDialogButtonBox.Close)
         btn_box.rejected.connect(self.accept)
         layout.addWidget(btn_box)
 
     def load_logs(self):
-        self.list_widget.clear()
-        logs = self.security_manager.get_decrypted_logs()
-        
-        if not logs:
-            item = QListWidgetItem(self.list_widget)
-            lbl = QLabel("Aucun événement de sécurité enregistré.")
-            lbl.setAlignment(Qt.AlignCenter)
-            lbl.setStyleSheet("color: #8b949e; padding: 20px; font-style: italic;")
-            item.setSizeHint(lbl.sizeHint())
-            self.list_widget.setItemWidget(item, lbl)
-            return
-        
-        for log in logs:
-            # Create Item
-            item = QListWidgetItem(self.list_widget)
-            
-            # Create Widget for Item
-            widget = QFrame()
-            widget.setObjectName("LogCard")
-            widget.setStyleSheet("""
-                #LogCard {
-                    background-color: #161b22;
-                    border: 1px solid #30363d;
-                    border-radius: 8px;
-                }
-            """)
-            
-            h_layout = QHBoxLayout(widget)
-            h_layout.setContentsMargins(15, 15, 15, 15)
-            
-            # Left: Info
-            v_info = QVBoxLayout()
-            
-            # Format date
-            ts_str = log.get("timestamp", "")
-            try:
-                dt = datetime.fromisoformat(ts_str)
-                display_date = dt.strftime("%d/%m/%Y %H:%M:%S")
-            except ValueError:
-                display_date = ts_str
-            
-            lbl_date = QLabel(f"🕒 {display_date}")
-            lbl_date.setStyleSheet("color: #8b949e; font-size: 9pt;")
-            
-            lbl_type = QLabel(log.get("event_type", "UNKNOWN"))
-            lbl_type.setStyleSheet("font-weight: bold; font-size: 11pt; color: #58a6ff;")
-            
-            details = log.get("details", {})
-            try:
-                details_str = json.dumps(details, indent=2, ensure_ascii=False)
-            except:
-                details_str = str(details)
-            
-            lbl_details = QLabel(details_str)
-            lbl_details.setWordWrap(True)
-            lbl_details.setStyleSheet("color: #c9d1d9; font-family: Consolas; margin-top: 5px;")
-            
-            v_info.addWidget(lbl_type)
-            v_info.addWidget(lbl_date)
-            
-            h_layout.addLayout(v_info, stretch=1)
-            
-            # Middle: Image Preview (if any)
-            if log.get("event_type") == "PHOTO_CAPTURE" and details.get("status") == "success":
-                filename = details.get("filename")
-                try:
-                    image_data = self.security_manager.get_decrypted_photo(filename)
-                    img = QImage.fromData(image_data)
-                    if not img.isNull():
-                        pix = QPixmap.fromImage(img).scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                        lbl_img = QLabel()
-                        lbl_img.setPixmap(pix)
-                        lbl_img.setStyleSheet("border: 1px solid #30363d; border-radius: 4px;")
-                        h_layout.addWidget(lbl_img)
-                        
-                        # Click to enlarge
-                        btn_view = QPushButton("🔍")
-                        btn_view.clicked.connect(lambda c, f=filename: self.view_photo(f))
-                        h_layout.addWidget(btn_view)
-                except Exception:
-                    pass
+        span = LOG_PERIODS[self.period_combo.currentIndex()][1]
+        since = datetime.now() - span if span else None
+        self.model.set_source(self.security_manager.iter_decrypted_logs(since=since), LOG_FETCH_SIZE)
 
-            # Right: Delete Action
-            del_btn = QPushButton("🗑️")
-            del_btn.setCursor(Qt.PointingHandCursor)
-            del_btn.setFixedSize(40, 40)
-            del_btn.setStyleSheet("background-color: #2b1414; color: #ff7b72; border: 1px solid #da3633; border-radius: 20px;")
-            del_btn.clicked.connect(lambda checked, lid=log.get("id"), ts=log.get("timestamp"): self.try_delete_log(lid, ts))
-            
-            h_layout.addWidget(del_btn)
+    def _update_empty_state(self):
+        empty = self.model.rowCount() == 0
+        self.empty_label.setVisible(empty)
+        self.list_view.setVisible(not empty)
 
-            item.setSizeHint(widget.sizeHint())
-            self.list_widget.setItemWidget(item, widget)
+    def done(self, result):
+        self.model.shutdown()
+        super().done(result)
 
-    def try_delete_log(self, log_id, timestamp_str):
+    def try_delete_log(self, row):
+        log = self.model.index(row).data(LOG_ROLE)
+        if not log:
+            return
         reply = QMessageBox.question(self, "Confirmer suppression", 
                                    "Voulez-vous vraiment supprimer cet événement de sécurité ?",
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
             # Accès direct à la DB via le manager pour garantir la suppression
-            self.security_manager.db.delete_log(log_id)
-            self.load_logs()
+            self.security_manager.db.delete_log(log.get("id"))
+            self.model.remove_row(row)
 
     def view_photo(self, filename):
         try:
@@ -0,0 +1,266 @@
+# thanos_app/gui/security_log_model.py
+import json
+from datetime import datetime
+from itertools import islice
+from typing import List, Dict, Any, Iterator
+from PySide6.QtCore import (QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool,
+                            QRect, QSize, Qt, Signal)
+from PySide6.QtGui import QColor, QFont, QImage, QPainter, QPen
+from PySide6.QtWidgets import QStyle, QStyledItemDelegate
+from thanos_app.core.definitions import LOG_EVENT_PHOTO_CAPTURE
+
+LOG_ROLE = Qt.UserRole           # Entrée complète (dict)
+THUMBNAIL_ROLE = Qt.UserRole + 1  # QImage de la miniature, ou None tant qu'elle n'est pas chargée
+
+THUMBNAIL_SIZE = 100
+THUMBNAIL_WORKERS = 2
+
+def log_photo_filename(log: Dict[str, Any]) -> str | None:
+    """Fichier de la photo associée à l'événement, s'il y en a une."""
+    details = log.get("details")
+    if log.get("event_type") != LOG_EVENT_PHOTO_CAPTURE or not isinstance(details, dict):
+        return None
+    return details.get("filename") if details.get("status") == "success" else None
+
+def display_date(timestamp: str) -> str:
+    try:
+        return datetime.fromisoformat(timestamp).strftime("%d/%m/%Y %H:%M:%S")
+    except (TypeError, ValueError):
+        return timestamp or ""
+
+def photo_tooltip(metadata: Dict[str, Any]) -> str:
+    captured = display_date(metadata.get("captured_at")) or "?"
+    return (f"{metadata.get('width', '?')} × {metadata.get('height', '?')} px, "
+            f"{metadata.get('size', 0) / 1024:.0f} Kio\nCapturée le {captured}")
+
+class _ThumbnailSignals(QObject):
+    loaded = Signal(str, QImage, object)
+
+class _ThumbnailJob(QRunnable):
+    """Déchiffre et décode une miniature hors du thread GUI (QImage, jamais QPixmap, hors GUI)."""
+    def __init__(self, security_manager, filename: str, signals: _ThumbnailSignals):
+        super().__init__()
+        self.security_manager = security_manager
+        self.filename = filename
+        self.signals = signals
+
+    def run(self):
+        image, metadata = QImage(), None
+        try:
+            thumbnail = self.security_manager.get_photo_thumbnail(self.filename)
+            if thumbnail:
+                image, metadata = QImage.fromData(thumbnail[0]), thumbnail[1]
+            else:
+                # Photo antérieure aux miniatures : image complète réduite ici
+                image = QImage.fromData(self.security_manager.get_decrypted_photo(self.filename))
+            if not image.isNull():
+                image = image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        except Exception as e:
+            print(f"Error loading photo thumbnail: {e}")
+        self.signals.loaded.emit(self.filename, image, metadata)
+
+class SecurityLogModel(QAbstractListModel):
+    """
+    Journal de sécurité chargé à la demande (canFetchMore/fetchMore) depuis
+    SecurityManager.iter_decrypted_logs. Les miniatures ne sont demandées que pour
+    les lignes réellement peintes, puis déchiffrées sur un pool de threads.
+    """
+    def __init__(self, security_manager, parent=None):
+        super().__init__(parent)
+        self.security_manager = security_manager
+        self._logs: List[Dict[str, Any]] = []
+        self._source = None  # Itérateur des entrées restantes
+        self._fetch_size = 100
+        self._thumbnails = {}  # filename -> (QImage, métadonnées) ; QImage nulle si illisible
+        self._photo_rows = {}  # filename -> lignes des événements qui montrent cette photo
+        self._pending = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(THUMBNAIL_WORKERS)
+        self._signals = _ThumbnailSignals(self)
+        self._signals.loaded.connect(self._on_thumbnail_loaded)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._logs)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        log = self._logs[index.row()]
+        if role == Qt.DisplayRole:
+            return log.get("event_type", "UNKNOWN")
+        if role == LOG_ROLE:
+            return log
+        filename = log_photo_filename(log)
+        if role == THUMBNAIL_ROLE and filename:
+            if filename not in self._thumbnails:
+                self._request_thumbnail(filename)
+                return None
+            image = self._thumbnails[filename][0]
+            return None if image.isNull() else image
+        if role == Qt.ToolTipRole and filename and self._thumbnails.get(filename, (None, None))[1]:
+            return photo_tooltip(self._thumbnails[filename][1])
+        return None
+
+    def set_source(self, logs: Iterator[Dict[str, Any]], fetch_size: int = 100):
+        """Remplace le contenu par un itérateur paresseux : la vue appelle fetchMore() en défilant."""
+        self.beginResetModel()
+        self._logs = []
+        self._photo_rows = {}
+        self._source = iter(logs)
+        self._fetch_size = fetch_size
+        self.endResetModel()
+        self.fetchMore()
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self._source is not None
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if parent.isValid() or self._source is None:
+            return
+        batch = list(islice(self._source, self._fetch_size))
+        if len(batch) < self._fetch_size:
+            self._source = None  # Source épuisée
+        if batch:
+            self.beginInsertRows(QModelIndex(), len(self._logs), len(self._logs) + len(batch) - 1)
+            for row, log in enumerate(batch, len(self._logs)):
+                filename = log_photo_filename(log)
+                if filename:
+                    self._photo_rows.setdefault(filename, []).append(row)
+            self._logs.extend(batch)
+            self.endInsertRows()
+
+    def remove_row(self, row: int):
+        if 0 <= row < len(self._logs):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._logs[row]
+            # Les lignes suivantes remontent d'un cran (seules les lignes avec photo sont suivies)
+            photo_rows = {}
+            for filename, rows in self._photo_rows.items():
+                rows = [r - (r > row) for r in rows if r != row]
+                if rows:
+                    photo_rows[filename] = rows
+            self._photo_rows = photo_rows
+            self.endRemoveRows()
+
+    def shutdown(self):
+        """Abandonne les miniatures en file et attend celles en cours (à la fermeture de la vue)."""
+        self._pool.clear()
+        self._pool.waitForDone()
+
+    def _request_thumbnail(self, filename: str):
+        if filename in self._pending:
+            return
+        self._pending.add(filename)
+        self._pool.start(_ThumbnailJob(self.security_manager, filename, self._signals))
+
+    def _on_thumbnail_loaded(self, filename: str, image: QImage, metadata):
+        self._pending.discard(filename)
+        self._thumbnails[filename] = (image, metadata)
+        for row in self._photo_rows.get(filename, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [THUMBNAIL_ROLE, Qt.ToolTipRole])
+
+class SecurityLogDelegate(QStyledItemDelegate):
+    """
+    Carte d'un événement peinte directement (aucun widget par ligne) : type, date,
+    détails, miniature éventuelle et boutons d'agrandissement et de suppression.
+    """
+    delete_requested = Signal(QModelIndex)
+    view_requested = Signal(QModelIndex)
+
+    MARGIN = 15
+    BUTTON_SIZE = 40
+    ROW_HEIGHT = 90
+    PHOTO_ROW_HEIGHT = THUMBNAIL_SIZE + 2 * MARGIN
+
+    def sizeHint(self, option, index: QModelIndex) -> QSize:
+        log = index.data(LOG_ROLE) or {}
+        return QSize(option.rect.width(), self.PHOTO_ROW_HEIGHT if log_photo_filename(log) else self.ROW_HEIGHT)
+
+    def _button_rects(self, rect: QRect, has_photo: bool) -> tuple[QRect, QRect | None]:
+        top = rect.center().y() - self.BUTTON_SIZE // 2
+        delete_rect = QRect(rect.right() - self.MARGIN - self.BUTTON_SIZE, top, self.BUTTON_SIZE, self.BUTTON_SIZE)
+        view_rect = delete_rect.translated(-(self.BUTTON_SIZE + 10), 0) if has_photo else None
+        return delete_rect, view_rect
+
+    def paint(self, painter: QPainter, option, index: QModelIndex):
+        log = index.data(LOG_ROLE) or {}
+        has_photo = log_photo_filename(log) is not None
+        rect = option.rect.adjusted(0, 0, -1, -1)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        border = "#58a6ff" if option.state & QStyle.State_Selected else "#30363d"
+        painter.setPen(QPen(QColor(border), 1))
+        painter.setBrush(QColor("#161b22"))
+        painter.drawRoundedRect(rect, 8, 8)
+
+        delete_rect, view_rect = self._button_rects(rect, has_photo)
+        text_right = (view_rect or delete_rect).left() - self.MARGIN
+        thumbnail = index.data(THUMBNAIL_ROLE) if has_photo else None
+        if has_photo:
+            thumb_rect = QRect(text_right - THUMBNAIL_SIZE, rect.top() + self.MARGIN, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+            if thumbnail is not None:
+                target = thumbnail.size().scaled(thumb_rect.size(), Qt.KeepAspectRatio)
+                image_rect = QRect(0, 0, target.width(), target.height())
+                image_rect.moveCenter(thumb_rect.center())
+                painter.drawImage(image_rect, thumbnail)
+            else:
+                painter.setPen(QColor("#30363d"))
+                painter.setBrush(Qt.NoBrush)
+                painter.drawRoundedRect(thumb_rect, 4, 4)
+            text_right = thumb_rect.left() - self.MARGIN
+
+        text_rect = QRect(rect.left() + self.MARGIN, rect.top() + self.MARGIN,
+                          max(0, text_right - rect.left() - self.MARGIN), rect.height() - 2 * self.MARGIN)
+        font = QFont(option.font)
+        font.setPointSize(11)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor("#58a6ff"))
+        line_height = painter.fontMetrics().height()
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignTop, log.get("event_type", "UNKNOWN"))
+
+        font.setPointSize(9)
+        font.setBold(False)
+        painter.setFont(font)
+        painter.setPen(QColor("#8b949e"))
+        date_rect = text_rect.adjusted(0, line_height + 2, 0, 0)
+        painter.drawText(date_rect, Qt.AlignLeft | Qt.AlignTop, f"🕒 {display_date(log.get('timestamp', ''))}")
+
+        details = log.get("details", {})
+        try:
+            details_str = json.dumps(details, ensure_ascii=False)
+        except (TypeError, ValueError):
+            details_str = str(details)
+        painter.setPen(QColor("#c9d1d9"))
+        details_rect = date_rect.adjusted(0, painter.fontMetrics().height() + 4, 0, 0)
+        painter.drawText(details_rect, Qt.AlignLeft | Qt.AlignTop,
+                         painter.fontMetrics().elidedText(details_str, Qt.ElideRight, details_rect.width()))
+
+        if view_rect is not None:
+            painter.setPen(QPen(QColor("#30363d"), 1))
+            painter.setBrush(QColor("#21262d"))
+            painter.drawRoundedRect(view_rect, 6, 6)
+            painter.setPen(QColor("#c9d1d9"))
+            painter.drawText(view_rect, Qt.AlignCenter, "🔍")
+        painter.setPen(QPen(QColor("#da3633"), 1))
+        painter.setBrush(QColor("#2b1414"))
+        painter.drawEllipse(delete_rect)
+        painter.setPen(QColor("#ff7b72"))
+        painter.drawText(delete_rect, Qt.AlignCenter, "🗑️")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index: QModelIndex) -> bool:
+        if event.type() == event.Type.MouseButtonRelease and event.button() == Qt.LeftButton:
+            log = index.data(LOG_ROLE) or {}
+            delete_rect, view_rect = self._button_rects(option.rect.adjusted(0, 0, -1, -1),
+                                                        log_photo_filename(log) is not None)
+            position = event.position().toPoint()
+            if delete_rect.contains(position):
+                self.delete_requested.emit(index)
+                return True
+            if view_rect is not None and view_rect.contains(position):
+                self.view_requested.emit(index)
+                return True
+        return super().editorEvent(event, model, option, index)
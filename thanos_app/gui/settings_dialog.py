@@ -10,6 +10,8 @@ from .styles.dark_theme import apply_dark_theme
 from .styles import theme_manager
 from .change_password_dialog import ChangePasswordDialog
 from thanos_app.core.vault import VaultManager
+from thanos_app.core import unlock_agent
+from .task_runner import run_with_progress
 
 class EmailTestWorker(QThread):
     """
@@ -28,6 +30,9 @@ class EmailTestWorker(QThread):
             self.result.emit(True, "Email de test envoyé avec succès !")
         except Exception as e:
             self.result.emit(False, f"Échec de l'envoi de l'email :\n\n{e}")
+        finally:
+            # Connexion ouverte pour ce thread par le pool (journal de l'envoi)
+            self.security_manager.db.release()
 
 class SettingsDialog(QDialog):
     def __init__(self, security_manager, parent=None):
@@ -95,6 +100,17 @@ class SettingsDialog(QDialog):
         self.max_attempts.setValue(config.MAX_INCORRECT_ATTEMPTS_BEFORE_SECURITY_EVENTS)
         form.addRow("Seuil tentatives avant alerte :", self.max_attempts)
 
+        self.unlock_agent_cb = QCheckBox("Garder le coffre déverrouillé entre deux ouvertures (agent)")
+        self.unlock_agent_cb.setChecked(getattr(config, 'UNLOCK_AGENT_ENABLED', False))
+        self.unlock_agent_cb.setEnabled(unlock_agent.is_supported())
+        form.addRow(self.unlock_agent_cb)
+
+        self.unlock_agent_ttl = QSpinBox()
+        self.unlock_agent_ttl.setRange(1, 480)
+        self.unlock_agent_ttl.setSuffix(" min")
+        self.unlock_agent_ttl.setValue(max(1, config.UNLOCK_AGENT_TTL_SECONDS // 60))
+        form.addRow("Verrouillage après inactivité :", self.unlock_agent_ttl)
+
         # Change password button
         self.change_master_btn = QPushButton("Changer le mot de passe principal")
         self.change_master_btn.clicked.connect(self.open_change_password_dialog)
@@ -206,6 +222,10 @@ class SettingsDialog(QDialog):
                 pass
             config.SECURITY_PHOTO_ENABLED = bool(self.security_photo_cb.isChecked())
             config.EMAIL_ALERTS_ENABLED = bool(self.email_alerts_cb.isChecked())
+            if config.UNLOCK_AGENT_ENABLED and not self.unlock_agent_cb.isChecked():
+                unlock_agent.stop()  # Option désactivée : l'agent oublie immédiatement les clés
+            config.UNLOCK_AGENT_ENABLED = bool(self.unlock_agent_cb.isChecked())
+            config.UNLOCK_AGENT_TTL_SECONDS = self.unlock_agent_ttl.value() * 60
 
 
             # Sauvegarde persistante des options supplémentaires
@@ -221,7 +241,11 @@ class SettingsDialog(QDialog):
                         "smtp_password": config.SMTP_PASSWORD,
                         "theme": config.THEME,
                         "security_photo_enabled": config.SECURITY_PHOTO_ENABLED,
-                        "email_alerts_enabled": config.EMAIL_ALERTS_ENABLED
+                        "email_alerts_enabled": config.EMAIL_ALERTS_ENABLED,
+                        "kdf_target_unlock_seconds": config.KDF_TARGET_UNLOCK_SECONDS,
+                        "kdf_max_memory_kib": config.KDF_MAX_MEMORY_KIB,
+                        "unlock_agent_enabled": config.UNLOCK_AGENT_ENABLED,
+                        "unlock_agent_ttl_seconds": config.UNLOCK_AGENT_TTL_SECONDS
                     }
                     json.dump(data, f, indent=4)
             except Exception:
@@ -282,8 +306,19 @@ class SettingsDialog(QDialog):
                 
             file_path, _ = QFileDialog.getSaveFileName(self, "Enregistrer la sauvegarde", "thanos_backup.enc", "Thanos Backup (*.enc)")
             if file_path:
-                try:
-                    VaultManager.backup_vault(config.VAULT_DB_FILE, file_path, mp, rk)
-                    QMessageBox.information(self, "Succès", "Sauvegarde chiffrée créée avec succès.")
-                except Exception as e:
-                    QMessageBox.critical(self, "Erreur", f"Échec de la sauvegarde : {e}")
\ No newline at end of file
+                self.backup_btn.setEnabled(False)
+                run_with_progress(
+                    self, "Création de la sauvegarde chiffrée...",
+                    VaultManager.backup_vault, config.VAULT_DB_FILE, file_path, mp, rk,
+                    on_success=self._on_backup_finished,
+                    on_error=self._on_backup_failed,
+                    on_cancel=lambda: self.backup_btn.setEnabled(True)
+                )
+
+    def _on_backup_finished(self, _result):
+        self.backup_btn.setEnabled(True)
+        QMessageBox.information(self, "Succès", "Sauvegarde chiffrée créée avec succès.")
+
+    def _on_backup_failed(self, error):
+        self.backup_btn.setEnabled(True)
+        QMessageBox.critical(self, "Erreur", f"Échec de la sauvegarde : {error}")
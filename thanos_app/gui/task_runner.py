@@ -0,0 +1,205 @@
+# thanos_app/gui/task_runner.py
+import threading
+from typing import Any, Callable
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot, Qt
+from PySide6.QtWidgets import QProgressDialog
+
+
+class TaskCancelled(Exception):
+    """Levée dans le thread de travail lorsqu'une tâche annulée atteint un point d'arrêt sûr."""
+
+
+class VaultTask(QObject):
+    """
+    Tâche d'arrière-plan sur le coffre.
+
+    La fonction exécutée reçoit un callback `progress(percent, message)` :
+    chaque appel publie l'avancement vers l'interface et constitue un point
+    d'annulation sûr (TaskCancelled y est levée si l'utilisateur a annulé).
+    Les callbacks utilisateur sont toujours appelés dans le thread GUI.
+    """
+    progress = Signal(int, str)
+    finished = Signal(object)
+    failed = Signal(object)
+    cancelled = Signal()
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, cancellable: bool = True):
+        super().__init__()
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self.cancellable = cancellable
+        self._cancel_event = threading.Event()
+        self._on_success = None
+        self._on_error = None
+        self._on_progress = None
+        self._on_cancel = None
+        self._on_done = None
+
+        # Connexions vers nos propres slots : l'objet vit dans le thread GUI,
+        # les émissions depuis le thread de travail sont donc mises en file.
+        self.progress.connect(self._handle_progress)
+        self.finished.connect(self._handle_finished)
+        self.failed.connect(self._handle_failed)
+        self.cancelled.connect(self._handle_cancelled)
+
+    def cancel(self):
+        if self.cancellable:
+            self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def report(self, percent: int, message: str = ""):
+        """Appelé depuis le thread de travail."""
+        if self._cancel_event.is_set():
+            raise TaskCancelled()
+        self.progress.emit(int(percent), message)
+
+    def run(self):
+        """Exécuté dans le thread de travail."""
+        if self._cancel_event.is_set():
+            self.cancelled.emit()
+            return
+        try:
+            result = self._fn(*self._args, progress=self.report, **self._kwargs)
+        except TaskCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(e)
+        else:
+            self.finished.emit(result)
+
+    @Slot(int, str)
+    def _handle_progress(self, percent, message):
+        if self._on_progress:
+            self._on_progress(percent, message)
+
+    @Slot(object)
+    def _handle_finished(self, result):
+        self._complete()
+        if self._on_success:
+            self._on_success(result)
+
+    @Slot(object)
+    def _handle_failed(self, error):
+        self._complete()
+        if self._on_error:
+            self._on_error(error)
+        else:
+            print(f"Background task error: {error}")
+
+    @Slot()
+    def _handle_cancelled(self):
+        self._complete()
+        if self._on_cancel:
+            self._on_cancel()
+
+    def _complete(self):
+        if self._on_done:
+            self._on_done(self)
+
+
+class _TaskRunnable(QRunnable):
+    def __init__(self, task: VaultTask):
+        super().__init__()
+        self.task = task
+
+    def run(self):
+        self.task.run()
+
+
+class TaskRunner(QObject):
+    """
+    File d'exécution partagée pour toutes les opérations bloquantes du coffre
+    (dérivation Argon2id, bcrypt, chiffrement de fichiers complets).
+
+    Les tâches sont exécutées une par une, dans l'ordre de soumission, sur un
+    unique thread de travail : deux opérations ne partagent donc jamais
+    simultanément la même connexion DatabaseManager.
+    """
+    _instance = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._tasks = set()  # Références conservées jusqu'à la fin de chaque tâche
+
+    @classmethod
+    def instance(cls) -> "TaskRunner":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def submit(self, fn: Callable, *args,
+               on_success: Callable[[Any], None] | None = None,
+               on_error: Callable[[Exception], None] | None = None,
+               on_progress: Callable[[int, str], None] | None = None,
+               on_cancel: Callable[[], None] | None = None,
+               cancellable: bool = True, **kwargs) -> VaultTask:
+        """Met `fn(*args, progress=..., **kwargs)` en file et retourne la tâche."""
+        task = VaultTask(fn, args, kwargs, cancellable)
+        task._on_success = on_success
+        task._on_error = on_error
+        task._on_progress = on_progress
+        task._on_cancel = on_cancel
+        task._on_done = self._tasks.discard
+        self._tasks.add(task)
+        self._pool.start(_TaskRunnable(task))
+        return task
+
+    def has_pending_tasks(self) -> bool:
+        return bool(self._tasks)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+
+def run_with_progress(parent, label: str, fn: Callable, *args,
+                      on_success: Callable[[Any], None] | None = None,
+                      on_error: Callable[[Exception], None] | None = None,
+                      on_cancel: Callable[[], None] | None = None,
+                      cancellable: bool = True, **kwargs) -> VaultTask:
+    """
+    Soumet une tâche au TaskRunner en affichant une boîte de progression modale.
+    Le bouton « Annuler » demande l'arrêt au prochain point sûr de la tâche.
+    """
+    dialog = QProgressDialog(label, "Annuler", 0, 100, parent)
+    dialog.setWindowTitle("Thanos")
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(0)
+    dialog.setAutoClose(False)
+    dialog.setAutoReset(False)
+    dialog.setValue(0)
+    if not cancellable:
+        dialog.setCancelButton(None)
+
+    def handle_progress(percent, message):
+        dialog.setValue(percent)
+        if message:
+            dialog.setLabelText(message)
+
+    def finish(callback, *cb_args):
+        dialog.close()
+        dialog.deleteLater()
+        if callback:
+            callback(*cb_args)
+
+    task = TaskRunner.instance().submit(
+        fn, *args,
+        on_success=lambda result: finish(on_success, result),
+        on_error=lambda error: finish(on_error, error),
+        on_progress=handle_progress,
+        on_cancel=lambda: finish(on_cancel),
+        cancellable=cancellable, **kwargs
+    )
+
+    def request_cancel():
+        task.cancel()
+        dialog.setLabelText("Annulation en cours...")
+
+    dialog.canceled.connect(request_cancel)
+    dialog.show()
+    return task